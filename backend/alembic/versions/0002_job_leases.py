@@ -0,0 +1,47 @@
+"""Job leases and run history
+
+Revision ID: 0002_job_leases
+Revises: 0001_initial
+Create Date: 2026-10-19 09:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_job_leases"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_leases",
+        sa.Column("name", sa.String(length=128), primary_key=True),
+        sa.Column("owner", sa.String(length=255), nullable=False),
+        sa.Column("acquired_at", sa.DateTime(), nullable=False),
+        sa.Column("heartbeat_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+
+    op.create_table(
+        "job_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_name", sa.String(length=128), nullable=False),
+        sa.Column("slot", sa.DateTime(), nullable=False),
+        sa.Column("owner", sa.String(length=255), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="running"),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.UniqueConstraint("job_name", "slot", name="uq_job_run_slot"),
+    )
+    op.create_index("ix_job_runs_job_name", "job_runs", ["job_name"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_runs_job_name", table_name="job_runs")
+    op.drop_table("job_runs")
+    op.drop_table("job_leases")
@@ -0,0 +1,23 @@
+"""Index users.tz for per-timezone nightly batches
+
+Revision ID: 0003_user_tz_index
+Revises: 0002_job_leases
+Create Date: 2026-10-19 10:00:00
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_user_tz_index"
+down_revision = "0002_job_leases"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_users_tz", "users", ["tz"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_tz", table_name="users")
@@ -0,0 +1,26 @@
+"""Generation counter on day plans
+
+Revision ID: 0004_dayplan_generation
+Revises: 0003_user_tz_index
+Create Date: 2026-10-19 11:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_dayplan_generation"
+down_revision = "0003_user_tz_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("day_plans") as batch:
+        batch.add_column(sa.Column("generation", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("day_plans") as batch:
+        batch.drop_column("generation")
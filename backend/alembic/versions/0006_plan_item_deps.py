@@ -0,0 +1,123 @@
+"""Plan-local dependency edges and remaining-dependency counters
+
+Plans still in use when this runs get their dependency rows and counters
+from the current edges, as the scheduler would have written them, so their
+items keep unlocking without a regeneration.
+
+Revision ID: 0006_plan_item_deps
+Revises: 0005_plan_item_versions
+Create Date: 2026-10-19 13:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_plan_item_deps"
+down_revision = "0005_plan_item_versions"
+branch_labels = None
+depends_on = None
+
+RESOLVED = ("DONE", "SKIPPED")
+DEPENDENCY_RELATIONS = ("TRIGGERS", "FOLLOWS", "SUPPORTS")
+
+plan_items = sa.table(
+    "plan_items",
+    sa.column("id"),
+    sa.column("dayplan_id"),
+    sa.column("node_type"),
+    sa.column("node_id"),
+    sa.column("status"),
+    sa.column("remaining_deps"),
+)
+day_plans = sa.table("day_plans", sa.column("id"), sa.column("user_id"))
+edges = sa.table(
+    "edges",
+    sa.column("user_id"),
+    sa.column("from_type"),
+    sa.column("from_id"),
+    sa.column("to_type"),
+    sa.column("to_id"),
+    sa.column("relation"),
+)
+plan_item_deps = sa.table(
+    "plan_item_deps", sa.column("dayplan_id"), sa.column("parent_item_id"), sa.column("child_item_id")
+)
+
+
+def _backfill() -> None:
+    """Dependency rows, counters and unlocked children for plans with unresolved items."""
+    # SQLite stores the enum member names; PostgreSQL's enums still have the
+    # lower-case labels from 0001 here (0012 renames them).
+    postgres = op.get_bind().dialect.name == "postgresql"
+
+    # Inlined rather than bound: a VARCHAR parameter does not compare with an enum.
+    def labels(*names: str) -> list[sa.ColumnElement]:
+        return [sa.literal_column(f"'{name.lower() if postgres else name}'") for name in names]
+
+    pending = plan_items.alias("pending")
+    open_plans = sa.select(pending.c.dayplan_id).where(pending.c.status.notin_(labels(*RESOLVED)))
+    parent, child = plan_items.alias("parent"), plan_items.alias("child")
+    op.execute(
+        plan_item_deps.insert().from_select(
+            ["dayplan_id", "parent_item_id", "child_item_id"],
+            sa.select(parent.c.dayplan_id, parent.c.id, child.c.id)
+            .select_from(parent)
+            .join(child, child.c.dayplan_id == parent.c.dayplan_id)
+            .join(day_plans, day_plans.c.id == parent.c.dayplan_id)
+            .join(
+                edges,
+                sa.and_(
+                    edges.c.user_id == day_plans.c.user_id,
+                    edges.c.from_type == parent.c.node_type,
+                    edges.c.from_id == parent.c.node_id,
+                    edges.c.to_type == child.c.node_type,
+                    edges.c.to_id == child.c.node_id,
+                ),
+            )
+            .where(edges.c.relation.in_(labels(*DEPENDENCY_RELATIONS)), parent.c.dayplan_id.in_(open_plans)),
+        )
+    )
+
+    unmet = (
+        sa.select(sa.func.count())
+        .select_from(plan_item_deps)
+        .join(parent, parent.c.id == plan_item_deps.c.parent_item_id)
+        .where(plan_item_deps.c.child_item_id == plan_items.c.id, parent.c.status.notin_(labels(*RESOLVED)))
+        .scalar_subquery()
+    )
+    op.execute(plan_items.update().where(plan_items.c.dayplan_id.in_(open_plans)).values(remaining_deps=unmet))
+
+    # Children whose parents were all skipped stayed PLANNED under the old unlock.
+    planned, ready = labels("PLANNED", "READY")
+    has_parents = sa.exists().where(plan_item_deps.c.child_item_id == plan_items.c.id)
+    op.execute(
+        plan_items.update()
+        .where(plan_items.c.status == planned, plan_items.c.remaining_deps == 0, has_parents)
+        .values(status=ready)
+    )
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("plan_items") as batch:
+        batch.add_column(sa.Column("remaining_deps", sa.Integer(), nullable=False, server_default="0"))
+
+    op.create_table(
+        "plan_item_deps",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("dayplan_id", sa.Integer(), sa.ForeignKey("day_plans.id"), nullable=False),
+        sa.Column("parent_item_id", sa.Integer(), sa.ForeignKey("plan_items.id"), nullable=False),
+        sa.Column("child_item_id", sa.Integer(), sa.ForeignKey("plan_items.id"), nullable=False),
+    )
+    op.create_index("ix_plan_item_deps_dayplan_id", "plan_item_deps", ["dayplan_id"])
+    op.create_index("ix_plan_item_deps_parent_item_id", "plan_item_deps", ["parent_item_id"])
+    _backfill()
+
+
+def downgrade() -> None:
+    op.drop_index("ix_plan_item_deps_parent_item_id", table_name="plan_item_deps")
+    op.drop_index("ix_plan_item_deps_dayplan_id", table_name="plan_item_deps")
+    op.drop_table("plan_item_deps")
+    with op.batch_alter_table("plan_items") as batch:
+        batch.drop_column("remaining_deps")
@@ -0,0 +1,34 @@
+"""Per-user topological ranks for cycle-safe edge creation
+
+Revision ID: 0007_node_ranks
+Revises: 0006_plan_item_deps
+Create Date: 2026-10-19 14:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007_node_ranks"
+down_revision = "0006_plan_item_deps"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "node_ranks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("node_type", sa.Enum("goal", "system", "habit", "task", name="nodetype", create_type=False), nullable=False),
+        sa.Column("node_id", sa.Integer(), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("user_id", "node_type", "node_id", name="uq_node_rank"),
+    )
+    op.create_index("ix_node_ranks_user_rank", "node_ranks", ["user_id", "rank"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_node_ranks_user_rank", table_name="node_ranks")
+    op.drop_table("node_ranks")
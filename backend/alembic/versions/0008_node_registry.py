@@ -0,0 +1,52 @@
+"""Unified node registry with labels and owner
+
+Revision ID: 0008_node_registry
+Revises: 0007_node_ranks
+Create Date: 2026-10-19 15:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008_node_registry"
+down_revision = "0007_node_ranks"
+branch_labels = None
+depends_on = None
+
+# The ORM stores NodeType members by name, so the backfill does too.
+_SOURCES = (
+    ("GOAL", "goals", "title"),
+    ("SYSTEM", "systems", "title"),
+    ("HABIT", "habits", "name"),
+    ("TASK", "tasks", "title"),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "nodes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("node_type", sa.Enum("goal", "system", "habit", "task", name="nodetype", create_type=False), nullable=False),
+        sa.Column("ref_id", sa.Integer(), nullable=False),
+        sa.Column("label", sa.String(length=255), nullable=False),
+        sa.UniqueConstraint("node_type", "ref_id", name="uq_node_ref"),
+    )
+    op.create_index("ix_nodes_user_id", "nodes", ["user_id"])
+
+    # SQLite stores the enum member names; PostgreSQL's nodetype still has the
+    # lower-case labels from 0001 here (0012 renames them).
+    postgres = op.get_bind().dialect.name == "postgresql"
+    for node_type, table, label in _SOURCES:
+        node_type = node_type.lower() if postgres else node_type
+        op.execute(
+            f"INSERT INTO nodes (user_id, node_type, ref_id, label) "
+            f"SELECT user_id, '{node_type}', id, {label} FROM {table}"
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_nodes_user_id", table_name="nodes")
+    op.drop_table("nodes")
@@ -0,0 +1,35 @@
+"""Time-decayed failure scores
+
+Revision ID: 0009_failure_scores
+Revises: 0008_node_registry
+Create Date: 2026-10-19 16:00:00
+
+Run ``python -m app.manage backfill-failure-scores`` afterwards to score
+existing nodes from the event log.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0009_failure_scores"
+down_revision = "0008_node_registry"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("failure_stats") as batch:
+        batch.add_column(sa.Column("score", sa.Float(), nullable=False, server_default="0"))
+        batch.add_column(sa.Column("score_updated_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("score_key", sa.Float(), nullable=True))
+    op.create_index("ix_failure_stats_user_score_key", "failure_stats", ["user_id", "score_key"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_failure_stats_user_score_key", table_name="failure_stats")
+    with op.batch_alter_table("failure_stats") as batch:
+        batch.drop_column("score_key")
+        batch.drop_column("score_updated_at")
+        batch.drop_column("score")
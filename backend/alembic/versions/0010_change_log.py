@@ -0,0 +1,40 @@
+"""Per-user change sequence and change log for delta sync
+
+Revision ID: 0010_change_log
+Revises: 0009_failure_scores
+Create Date: 2026-10-19 17:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0010_change_log"
+down_revision = "0009_failure_scores"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("change_seq", sa.Integer(), nullable=False, server_default="0"))
+
+    op.create_table(
+        "change_log",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("entity", sa.String(length=16), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(length=8), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_change_log_user_seq", "change_log", ["user_id", "seq"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_change_log_user_seq", table_name="change_log")
+    op.drop_table("change_log")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("change_seq")
@@ -0,0 +1,26 @@
+"""Mark pre-warmed day plans with the change sequence their graph was read at
+
+Revision ID: 0011_dayplan_prewarm
+Revises: 0010_change_log
+Create Date: 2026-10-19 18:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0011_dayplan_prewarm"
+down_revision = "0010_change_log"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("day_plans") as batch:
+        batch.add_column(sa.Column("prewarmed_seq", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("day_plans") as batch:
+        batch.drop_column("prewarmed_seq")
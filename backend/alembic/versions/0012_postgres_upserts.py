@@ -0,0 +1,81 @@
+"""One review per user, type and date range; JSONB event payloads on PostgreSQL
+
+Revision ID: 0012_postgres_upserts
+Revises: 0011_dayplan_prewarm
+Create Date: 2026-10-19 20:00:00
+
+Reviews are now upserted on (user_id, type, date_range_start, date_range_end),
+so earlier duplicates are collapsed to the most recent row first.
+
+On PostgreSQL the enum types from 0001 are also relabelled to the member
+names the ORM writes (``GOAL`` rather than ``goal``).
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0012_postgres_upserts"
+down_revision = "0011_dayplan_prewarm"
+branch_labels = None
+depends_on = None
+
+_ENUM_LABELS = {
+    "nodetype": ("goal", "system", "habit", "task"),
+    "relationtype": ("supports", "triggers", "follows"),
+    "planstatus": ("planned", "ready", "in_progress", "done", "skipped"),
+    "plananchor": ("time", "habit", "task"),
+    "reviewtype": ("daily", "weekly"),
+}
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM reviews
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM reviews
+            GROUP BY user_id, type, date_range_start, date_range_end
+        )
+        """
+    )
+    with op.batch_alter_table("reviews") as batch:
+        batch.create_unique_constraint(
+            "uq_review_range", ["user_id", "type", "date_range_start", "date_range_end"]
+        )
+
+    if op.get_bind().dialect.name == "postgresql":
+        for enum_name, labels in _ENUM_LABELS.items():
+            for label in labels:
+                op.execute(f"ALTER TYPE {enum_name} RENAME VALUE '{label}' TO '{label.upper()}'")
+        op.alter_column(
+            "event_logs",
+            "payload_json",
+            type_=postgresql.JSONB(),
+            postgresql_using="payload_json::jsonb",
+        )
+        op.create_index(
+            "ix_event_logs_payload",
+            "event_logs",
+            ["payload_json"],
+            postgresql_using="gin",
+            postgresql_ops={"payload_json": "jsonb_path_ops"},
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_event_logs_payload", table_name="event_logs")
+        op.alter_column(
+            "event_logs",
+            "payload_json",
+            type_=sa.JSON(),
+            postgresql_using="payload_json::json",
+        )
+        for enum_name, labels in _ENUM_LABELS.items():
+            for label in labels:
+                op.execute(f"ALTER TYPE {enum_name} RENAME VALUE '{label.upper()}' TO '{label}'")
+    with op.batch_alter_table("reviews") as batch:
+        batch.drop_constraint("uq_review_range", type_="unique")
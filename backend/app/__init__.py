@@ -2,3 +2,8 @@
 Backend application package initialization.
 """
 
+from time import perf_counter
+
+# Taken as the package is first imported, normally right before ``app.main``,
+# so the startup log can report what importing the app cost.
+_import_started = perf_counter()
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from .routes import auth, coach, edges, gamification, graph, habits, plan, review, tasks
+from .routes import admin, auth, coach, edges, gamification, graph, habits, plan, review, sync, tasks, today
 
 api_router = APIRouter()
 
@@ -10,6 +10,9 @@ api_router.include_router(habits.router, prefix="/habit", tags=["habits"])
 api_router.include_router(tasks.router, prefix="/task", tags=["tasks"])
 api_router.include_router(edges.router, prefix="/edges", tags=["edges"])
 api_router.include_router(plan.router, prefix="/plan", tags=["plan"])
+api_router.include_router(today.router, prefix="/today", tags=["today"])
 api_router.include_router(review.router, prefix="/review", tags=["review"])
 api_router.include_router(gamification.router, prefix="/gamification", tags=["gamification"])
 api_router.include_router(coach.router, prefix="/coach", tags=["coach"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
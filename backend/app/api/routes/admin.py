@@ -0,0 +1,176 @@
+import secrets
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.routing import APIRoute
+
+from ... import profiling, tracing
+from ...config import settings
+from ...schemas import (
+    MemoryAllocation,
+    MemoryCapture,
+    MemoryConfig,
+    MemoryStatus,
+    ProfileSummary,
+    ProfilingConfig,
+    ProfilingStatus,
+    TraceSpan,
+    TraceSummary,
+)
+
+
+def require_admin(x_admin_token: str = Header(default="")) -> None:
+    """Admin endpoints exist only when ``admin_token`` is set."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(x_admin_token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def _profiling_status() -> ProfilingStatus:
+    config = profiling.request_config()
+    return ProfilingStatus(
+        config=None
+        if config is None
+        else ProfilingConfig(
+            mode=config.mode,
+            sample_rate=config.sample_rate,
+            routes=sorted(config.routes),
+            keep=config.keep,
+            interval=config.interval,
+        ),
+        profiles=[
+            ProfileSummary(
+                id=profile.id,
+                route=profile.route,
+                mode=profile.mode,
+                started_at=profile.started_at,
+                duration_ms=profile.duration_ms,
+            )
+            for profile in profiling.profiles()
+        ],
+    )
+
+
+@router.get("/profiling", response_model=ProfilingStatus)
+def get_profiling() -> ProfilingStatus:
+    """Current request profiling settings and captured profiles, slowest first."""
+    return _profiling_status()
+
+
+@router.put("/profiling", response_model=ProfilingStatus)
+def start_profiling(payload: ProfilingConfig, request: Request) -> ProfilingStatus:
+    known = {route.path for route in request.app.routes if isinstance(route, APIRoute)}
+    unknown = sorted(set(payload.routes) - known)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown routes: {', '.join(unknown)}")
+    profiling.configure_requests(payload.mode, payload.sample_rate, payload.routes, payload.keep, payload.interval)
+    return _profiling_status()
+
+
+@router.delete("/profiling", status_code=204)
+def stop_profiling() -> None:
+    """Stop profiling requests and drop the captured profiles."""
+    profiling.stop_requests()
+
+
+@router.get("/profiling/{profile_id}")
+def download_profile(
+    profile_id: int,
+    format: Literal["pstats", "collapsed", "text"] = Query(default="text"),
+) -> Response:
+    """One profile as pstats data, collapsed stacks (for flamegraph tools) or a text report."""
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        try:
+            content = profile.pstats_bytes()
+        except ValueError as exc:
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+        return Response(
+            content,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'},
+        )
+    if format == "collapsed":
+        return PlainTextResponse(
+            profile.collapsed(),
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+        )
+    return PlainTextResponse(profile.text())
+
+
+def _memory_status() -> MemoryStatus:
+    return MemoryStatus(
+        targets=profiling.memory_targets(),
+        captures=[
+            MemoryCapture(
+                id=capture.id,
+                target=capture.target,
+                started_at=capture.started_at,
+                duration_ms=capture.duration_ms,
+                peak_bytes=capture.peak_bytes,
+                top=[
+                    MemoryAllocation(location=location, size_diff=size, count_diff=count)
+                    for location, size, count in capture.top
+                ],
+            )
+            for capture in profiling.memory_captures()
+        ],
+    )
+
+
+@router.get("/memory", response_model=MemoryStatus)
+def get_memory() -> MemoryStatus:
+    return _memory_status()
+
+
+@router.put("/memory", response_model=MemoryStatus)
+def start_memory(payload: MemoryConfig) -> MemoryStatus:
+    """Take tracemalloc snapshots around the next calls to the given service functions."""
+    try:
+        profiling.configure_memory(payload.targets, payload.captures)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return _memory_status()
+
+
+@router.delete("/memory", status_code=204)
+def stop_memory() -> None:
+    """Unwrap the service functions, stop tracemalloc and drop the captures."""
+    profiling.stop_memory()
+
+
+@router.get("/traces", response_model=list[TraceSummary])
+def list_traces(
+    min_ms: float = Query(default=0.0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+) -> list[TraceSummary]:
+    """Recently finished traces, newest first; empty unless tracing is enabled."""
+    return [
+        TraceSummary(
+            trace_id=root.trace_id,
+            name=root.name,
+            start=root.start,
+            duration_ms=root.duration_ms,
+            status=root.status,
+            span_count=len(spans),
+            sql_ms=round(sum(span.duration_ms for span in spans if span.name.startswith("sql ")), 3),
+        )
+        for spans in tracing.traces(min_ms, limit)
+        for root in spans[:1]
+    ]
+
+
+@router.get("/traces/{trace_id}", response_model=list[TraceSpan])
+def get_trace(trace_id: str) -> list[TraceSpan]:
+    """Every span of one trace, root first; follow ``parent_id`` for the tree."""
+    spans = tracing.get_trace(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return [TraceSpan.model_validate(span, from_attributes=True) for span in spans]
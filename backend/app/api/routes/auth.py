@@ -1,21 +1,38 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter
 
-from ...database import get_db
+from ...database import get_shards, session_scope
 from ...models import User
 from ...schemas import User as UserSchema, UserCreate
 
 router = APIRouter()
 
 
+def _sharded_login(tz: str) -> UserSchema:
+    """Find the user on any shard, or create one on the shard its new id hashes to."""
+    shards = get_shards()
+    for session_factory in shards.sessions:
+        with session_factory() as db:
+            user = db.query(User).filter(User.tz == tz).first()
+            if user:
+                return UserSchema.model_validate(user)
+    user_id = shards.ids.next_id(User.__tablename__)
+    with session_scope(user_id) as db:
+        user = User(id=user_id, tz=tz)
+        db.add(user)
+        db.flush()
+        return UserSchema.model_validate(user)
+
+
 @router.post("/devlogin", response_model=UserSchema)
-def dev_login(payload: UserCreate | None = None, db: Session = Depends(get_db)) -> UserSchema:
+def dev_login(payload: UserCreate | None = None) -> UserSchema:
     """Development-only login that ensures a user record exists."""
     tz = payload.tz if payload else "America/Argentina/Buenos_Aires"
-    user = db.query(User).filter(User.tz == tz).first()
-    if not user:
-        user = User(tz=tz)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    return UserSchema.model_validate(user)
+    if get_shards() is not None:
+        return _sharded_login(tz)
+    with session_scope() as db:
+        user = db.query(User).filter(User.tz == tz).first()
+        if not user:
+            user = User(tz=tz)
+            db.add(user)
+            db.flush()
+        return UserSchema.model_validate(user)
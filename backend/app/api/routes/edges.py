@@ -1,21 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from ...database import get_db
 from ...models import Edge
 from ...schemas import Edge as EdgeSchema, EdgeCreate
+from ...services import topology
+from ..serialization import dump_rows, json_response, schema_columns
 
 router = APIRouter()
 
 
-@router.get("/{user_id}", response_model=list[EdgeSchema])
-def list_edges(user_id: int, db: Session = Depends(get_db)) -> list[EdgeSchema]:
-    edges = db.query(Edge).filter(Edge.user_id == user_id).all()
-    return [EdgeSchema.model_validate(edge) for edge in edges]
+@router.get("/{user_id}", response_model=list[EdgeSchema], response_class=ORJSONResponse)
+def list_edges(user_id: int, db: Session = Depends(get_db)) -> ORJSONResponse:
+    rows = db.query(*schema_columns(Edge, EdgeSchema)).filter(Edge.user_id == user_id)
+    return json_response(dump_rows(rows, EdgeSchema))
 
 
 @router.post("", response_model=EdgeSchema)
 def create_edge(payload: EdgeCreate, db: Session = Depends(get_db)) -> EdgeSchema:
+    try:
+        topology.link(
+            db,
+            payload.user_id,
+            (payload.from_type, payload.from_id),
+            (payload.to_type, payload.to_id),
+        )
+    except topology.CycleError as exc:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": str(exc),
+                "path": [{"type": node_type, "id": node_id} for node_type, node_id in exc.path],
+            },
+        ) from exc
     edge = Edge(**payload.model_dump())
     db.add(edge)
     db.commit()
@@ -1,17 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from ...database import get_db
 from ...models import Habit
 from ...schemas import Habit as HabitSchema, HabitCreate
+from ..serialization import dump_rows, json_response, schema_columns
 
 router = APIRouter()
 
 
-@router.get("/{user_id}", response_model=list[HabitSchema])
-def list_habits(user_id: int, db: Session = Depends(get_db)) -> list[HabitSchema]:
-    habits = db.query(Habit).filter(Habit.user_id == user_id).all()
-    return [HabitSchema.model_validate(habit) for habit in habits]
+@router.get("/{user_id}", response_model=list[HabitSchema], response_class=ORJSONResponse)
+def list_habits(user_id: int, db: Session = Depends(get_db)) -> ORJSONResponse:
+    rows = db.query(*schema_columns(Habit, HabitSchema)).filter(Habit.user_id == user_id)
+    return json_response(dump_rows(rows, HabitSchema))
 
 
 @router.post("", response_model=HabitSchema)
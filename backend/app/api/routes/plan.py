@@ -1,170 +1,127 @@
-from datetime import date, datetime
+from datetime import date
+from typing import Callable, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from ...database import get_db
-from ...models import DayPlan, Edge, EventLog, FailureStats, PlanItem, PlanStatus
 from ...schemas import (
     DayPlan as DayPlanSchema,
+    PlanBatchRequest,
+    PlanBatchResponse,
     PlanCompleteRequest,
     PlanGenerateResponse,
+    PlanSimulationRequest,
+    PlanSimulationResponse,
     PlanSkipRequest,
 )
-from ...services import flow, scheduler
+from ...services import idempotency, plan_cache, progress, simulation
+from ..serialization import json_response
 
 router = APIRouter()
 
 
-@router.get("", response_model=DayPlanSchema)
+@router.get("", response_model=DayPlanSchema, response_class=ORJSONResponse)
 def get_plan(user_id: int = Query(...), plan_date: date = Query(...), db: Session = Depends(get_db)):
-    plan = (
-        db.query(DayPlan)
-        .filter(DayPlan.user_id == user_id, DayPlan.date == plan_date)
-        .first()
-    )
-    if not plan:
+    content = plan_cache.load_plan(db, user_id, plan_date)
+    if content is None:
         raise HTTPException(status_code=404, detail="Plan not found")
-    return DayPlanSchema.model_validate(plan)
+    return json_response(content)
 
 
-@router.post("/generate", response_model=PlanGenerateResponse)
+@router.post("/generate", response_model=PlanGenerateResponse, response_class=ORJSONResponse)
 def generate_plan(user_id: int = Query(...), plan_date: date = Query(...), db: Session = Depends(get_db)):
-    plan = scheduler.generate_day_plan(db, user_id=user_id, target_date=plan_date)
-    return PlanGenerateResponse(plan=DayPlanSchema.model_validate(plan))
+    return json_response({"plan": plan_cache.generate_plan(db, user_id, plan_date)})
+
+
+@router.post("/simulate", response_model=PlanSimulationResponse)
+def simulate_plan(payload: PlanSimulationRequest, db: Session = Depends(get_db)):
+    try:
+        results = simulation.simulate_plans(db, user_id=payload.user_id, alternatives=payload.alternatives)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return PlanSimulationResponse(results=results)
+
+
+def _apply(
+    db: Session,
+    endpoint: str,
+    user_id: int,
+    idempotency_key: Optional[str],
+    action: Callable[[], dict],
+) -> dict:
+    try:
+        if idempotency_key:
+            replay = idempotency.lookup(db, user_id, idempotency_key, endpoint)
+            if replay is not None:
+                return replay
+        return action()
+    except idempotency.KeyReused as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    except progress.VersionConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
 
 
 @router.post("/complete")
 def complete_plan_item(
     payload: PlanCompleteRequest,
     user_id: int = Query(...),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
 ) -> dict[str, str]:
-    plan_item = (
-        db.query(PlanItem)
-        .join(DayPlan)
-        .filter(
-            PlanItem.id == payload.plan_item_id,
-            DayPlan.user_id == user_id,
-        )
-        .first()
-    )
-    if not plan_item:
-        raise HTTPException(status_code=404, detail="Plan item not found")
-
-    plan_item.status = PlanStatus.DONE
-    completion_ts = payload.ts or datetime.utcnow()
-
-    db.add(
-        EventLog(
-            user_id=user_id,
-            ts=completion_ts,
-            event_type="plan_complete",
-            payload_json={
-                "plan_item_id": plan_item.id,
-                "node_type": plan_item.node_type,
-                "node_id": plan_item.node_id,
-            },
-        )
-    )
-
-    # Reset failure stats on completion
-    failure = (
-        db.query(FailureStats)
-        .filter(
-            FailureStats.user_id == user_id,
-            FailureStats.node_type == plan_item.node_type,
-            FailureStats.node_id == plan_item.node_id,
-        )
-        .first()
-    )
-    if failure:
-        failure.rolling_fail_count = 0
-        failure.last_failed_at = None
-
-    # Unlock dependent items
-    dependents = (
-        db.query(Edge)
-        .filter(
-            Edge.user_id == user_id,
-            Edge.from_type == plan_item.node_type,
-            Edge.from_id == plan_item.node_id,
-        )
-        .all()
+    return _apply(
+        db,
+        "plan_complete",
+        user_id,
+        idempotency_key,
+        lambda: progress.complete_item(
+            db,
+            user_id,
+            payload.plan_item_id,
+            ts=payload.ts,
+            expected_version=payload.version,
+            idempotency_key=idempotency_key,
+        ),
     )
-    db.flush()
-    db.refresh(plan_item.dayplan)
-    for edge in dependents:
-        dependent = next(
-            (
-                item
-                for item in plan_item.dayplan.items
-                if item.node_type == edge.to_type and item.node_id == edge.to_id
-            ),
-            None,
-        )
-        if dependent and dependent.status == PlanStatus.PLANNED:
-            dependent.status = PlanStatus.READY
-
-    db.commit()
-    flow.update_flow_score(db, plan_item.dayplan)
-    return {"status": "ok"}
 
 
 @router.post("/skip")
 def skip_plan_item(
     payload: PlanSkipRequest,
     user_id: int = Query(...),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
 ) -> dict[str, str]:
-    plan_item = (
-        db.query(PlanItem)
-        .join(DayPlan)
-        .filter(
-            PlanItem.id == payload.plan_item_id,
-            DayPlan.user_id == user_id,
-        )
-        .first()
-    )
-    if not plan_item:
-        raise HTTPException(status_code=404, detail="Plan item not found")
-
-    plan_item.status = PlanStatus.SKIPPED
-    db.add(
-        EventLog(
-            user_id=user_id,
-            ts=datetime.utcnow(),
-            event_type="plan_skip",
-            payload_json={
-                "plan_item_id": plan_item.id,
-                "node_type": plan_item.node_type,
-                "node_id": plan_item.node_id,
-                "reason": payload.reason,
-            },
-        )
+    return _apply(
+        db,
+        "plan_skip",
+        user_id,
+        idempotency_key,
+        lambda: progress.skip_item(
+            db,
+            user_id,
+            payload.plan_item_id,
+            reason=payload.reason,
+            expected_version=payload.version,
+            idempotency_key=idempotency_key,
+        ),
     )
 
-    failure = (
-        db.query(FailureStats)
-        .filter(
-            FailureStats.user_id == user_id,
-            FailureStats.node_type == plan_item.node_type,
-            FailureStats.node_id == plan_item.node_id,
-        )
-        .first()
+
+@router.post("/batch", response_model=PlanBatchResponse)
+def apply_plan_batch(
+    payload: PlanBatchRequest,
+    user_id: int = Query(...),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+) -> dict:
+    return _apply(
+        db,
+        "plan_batch",
+        user_id,
+        idempotency_key,
+        lambda: progress.apply_batch(db, user_id, payload.changes, idempotency_key=idempotency_key),
     )
-    if not failure:
-        failure = FailureStats(
-            user_id=user_id,
-            node_type=plan_item.node_type,
-            node_id=plan_item.node_id,
-            rolling_fail_count=1,
-        )
-        db.add(failure)
-    else:
-        failure.rolling_fail_count += 1
-        failure.last_failed_at = datetime.utcnow()
-
-    db.commit()
-    flow.update_flow_score(db, plan_item.dayplan)
-    return {"status": "ok"}
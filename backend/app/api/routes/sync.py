@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+
+from ...database import get_db
+from ...models import DayPlan, Edge, Habit, PlanItem, Task
+from ...schemas import (
+    DayPlan as DayPlanSchema,
+    Edge as EdgeSchema,
+    Habit as HabitSchema,
+    PlanItem as PlanItemSchema,
+    SyncResponse,
+    Task as TaskSchema,
+)
+from ...services import sync
+from ..serialization import dump_row, json_response
+
+router = APIRouter()
+
+# Entity name -> (model, fields sent to clients); rows match the list endpoints.
+_ENTITIES = {
+    "habit": (Habit, list(HabitSchema.model_fields)),
+    "task": (Task, list(TaskSchema.model_fields)),
+    "edge": (Edge, list(EdgeSchema.model_fields)),
+    "plan": (DayPlan, [name for name in DayPlanSchema.model_fields if name != "items"]),
+    "plan_item": (PlanItem, [*PlanItemSchema.model_fields, "dayplan_id"]),
+}
+
+
+@router.get("", response_model=SyncResponse, response_class=ORJSONResponse)
+def get_changes(
+    user_id: int = Query(...),
+    since: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db),
+) -> ORJSONResponse:
+    """Rows created, updated or deleted since change sequence ``since``.
+
+    Pass the returned ``seq`` as the next ``since``. When ``reset`` is true
+    the cursor is too old (or unknown) and the client should refetch the
+    full resources, then continue from ``seq``.
+    """
+    if sync.current_seq(db, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    changes = sync.changes_since(db, user_id, since)
+
+    upserted: dict[str, list[dict]] = {}
+    deleted = {entity: list(ids) for entity, ids in changes.deleted.items()}
+    for entity, ids in changes.upserted.items():
+        model, fields = _ENTITIES[entity]
+        rows = db.query(*(getattr(model, name) for name in fields)).filter(model.id.in_(ids)).order_by(model.id)
+        upserted[entity] = [dump_row(row, fields) for row in rows]
+        # Logged as written but gone since (e.g. removed by a bulk delete).
+        missing = set(ids) - {row["id"] for row in upserted[entity]}
+        if missing:
+            deleted.setdefault(entity, []).extend(sorted(missing))
+
+    return json_response({"seq": changes.seq, "reset": changes.reset, "upserted": upserted, "deleted": deleted})
@@ -1,17 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from ...database import get_db
 from ...models import Task
 from ...schemas import Task as TaskSchema, TaskCreate, TaskUpdate
+from ..serialization import dump_rows, json_response, schema_columns
 
 router = APIRouter()
 
 
-@router.get("/{user_id}", response_model=list[TaskSchema])
-def list_tasks(user_id: int, db: Session = Depends(get_db)) -> list[TaskSchema]:
-    tasks = db.query(Task).filter(Task.user_id == user_id).all()
-    return [TaskSchema.model_validate(task) for task in tasks]
+@router.get("/{user_id}", response_model=list[TaskSchema], response_class=ORJSONResponse)
+def list_tasks(user_id: int, db: Session = Depends(get_db)) -> ORJSONResponse:
+    rows = db.query(*schema_columns(Task, TaskSchema)).filter(Task.user_id == user_id)
+    return json_response(dump_rows(rows, TaskSchema))
 
 
 @router.post("", response_model=TaskSchema)
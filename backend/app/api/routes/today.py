@@ -0,0 +1,62 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+
+from ...database import get_db
+from ...models import DayPlan, PlanItem, PlanStatus
+from ...schemas import DayPlan as DayPlanSchema, PlanItem as PlanItemSchema, TodayBundle
+from ...services import coach, failures, gamification, nodes
+from ..serialization import dump_row, dump_rows, json_response, schema_columns
+
+router = APIRouter()
+
+_PLAN_FIELDS = [name for name in DayPlanSchema.model_fields if name != "items"]
+
+
+@router.get("", response_model=TodayBundle, response_class=ORJSONResponse)
+def get_today(
+    user_id: int = Query(...),
+    target_date: date = Query(default_factory=date.today),
+    db: Session = Depends(get_db),
+) -> ORJSONResponse:
+    """Everything the today view needs in one round-trip.
+
+    Plan, items, labels and failure scores are each one batched query on the
+    request's session; suggestions for skipped items are built from the
+    cached coach templates without writing anything.
+    """
+    plan = (
+        db.query(*schema_columns(DayPlan, DayPlanSchema, exclude=["items"]))
+        .filter(DayPlan.user_id == user_id, DayPlan.date == target_date)
+        .first()
+    )
+    content = {
+        "date": target_date,
+        "plan": None,
+        "gamification": gamification.get_snapshot(db, user_id=user_id, target_date=target_date).model_dump(),
+        "suggestions": [],
+    }
+    if not plan:
+        return json_response(content)
+
+    items = dump_rows(
+        db.query(*schema_columns(PlanItem, PlanItemSchema))
+        .filter(PlanItem.dayplan_id == plan.id)
+        .order_by(PlanItem.id),
+        PlanItemSchema,
+    )
+    keys = [(item["node_type"], item["node_id"]) for item in items]
+    labels = nodes.labels(db, user_id, keys)
+    for item, key in zip(items, keys):
+        item["label"] = labels.get(key)
+
+    skipped = list(dict.fromkeys(key for item, key in zip(items, keys) if item["status"] == PlanStatus.SKIPPED))
+    scores = failures.scores_for(db, user_id, skipped)
+    content["suggestions"] = [
+        coach.build_suggestion(key[0], key[1], labels.get(key), scores.get(key, 0.0)).model_dump()
+        for key in skipped
+    ]
+    content["plan"] = {**dump_row(plan, _PLAN_FIELDS), "items": items}
+    return json_response(content)
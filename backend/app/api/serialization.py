@@ -0,0 +1,36 @@
+"""Fast JSON paths for the large read endpoints.
+
+Rows are turned into plain dicts keyed by the response schema's fields and
+encoded with orjson, so a payload is not validated once per ORM object and
+again by ``response_model``. Only use this for rows that come straight from
+the models the schema mirrors; anything user-supplied should still go
+through Pydantic.
+"""
+
+from typing import Any, Iterable
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import InstrumentedAttribute
+
+
+def schema_columns(model: type, schema: type[BaseModel], exclude: Iterable[str] = ()) -> list[InstrumentedAttribute]:
+    """Model columns backing ``schema``'s fields, for column-only queries."""
+    skip = set(exclude)
+    return [getattr(model, name) for name in schema.model_fields if name not in skip]
+
+
+def dump_row(row: Any, fields: Iterable[str]) -> dict[str, Any]:
+    """Dict of ``fields`` read from a result row or ORM object, unvalidated."""
+    return {name: getattr(row, name) for name in fields}
+
+
+def dump_rows(rows: Iterable[Any], schema: type[BaseModel], exclude: Iterable[str] = ()) -> list[dict[str, Any]]:
+    skip = set(exclude)
+    fields = [name for name in schema.model_fields if name not in skip]
+    return [dump_row(row, fields) for row in rows]
+
+
+def json_response(content: Any) -> ORJSONResponse:
+    """Encode ``content`` with orjson; returning a Response skips response_model validation."""
+    return ORJSONResponse(content)
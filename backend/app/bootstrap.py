@@ -0,0 +1,122 @@
+"""Schema check run once at startup.
+
+An up-to-date database costs one uncompiled ``SELECT`` from
+``alembic_version``; tables are only created, and the database stamped at
+the Alembic heads, when it is empty, so a normal boot neither reflects
+tables nor compiles DDL checks. A database with tables but no version is
+only reflected to check it against the models; it is never altered.
+
+The heads are read from the ``revision``/``down_revision`` lines of the
+migration files rather than through Alembic, which would import every
+migration module.
+"""
+
+from __future__ import annotations
+
+import ast
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import Column, MetaData, String, Table, inspect, insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+from . import models  # noqa: F401  (the checks need every table mapped)
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = Path(__file__).resolve().parents[1] / "alembic" / "versions"
+
+CURRENT = "current"
+CREATED = "created"
+UNVERSIONED = "unversioned"
+
+# Alembic's own table, as ``alembic stamp`` writes it.
+alembic_version = Table(
+    "alembic_version",
+    MetaData(),
+    Column("version_num", String(32), primary_key=True),
+)
+
+_REVISION_LINE = re.compile(r"^(revision|down_revision)\s*(?::[^=]+)?=\s*(.+?)\s*$", re.MULTILINE)
+
+
+class SchemaVersionError(RuntimeError):
+    """The database was migrated to other revisions than this code's Alembic heads."""
+
+
+@lru_cache
+def alembic_heads() -> frozenset[str]:
+    """Revisions no other migration revises."""
+    revisions: set[str] = set()
+    revised: set[str] = set()
+    for path in VERSIONS_DIR.glob("*.py"):
+        values = {name: ast.literal_eval(value) for name, value in _REVISION_LINE.findall(path.read_text())}
+        revisions.add(values["revision"])
+        down = values.get("down_revision")
+        revised.update(down if isinstance(down, tuple) else [down] if down else [])
+    return frozenset(revisions - revised)
+
+
+def current_revisions(bind: Engine) -> set[str]:
+    """Revisions recorded in ``alembic_version``; empty when the table is missing."""
+    try:
+        with bind.connect() as connection:
+            return set(connection.exec_driver_sql(f"SELECT version_num FROM {alembic_version.name}").scalars())
+    except DBAPIError:
+        return set()
+
+
+def _missing_schema(connection: Connection) -> list[str]:
+    """Tables and ``table.column`` names of the models the database lacks."""
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    missing: list[str] = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            missing.append(table.name)
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in columns)
+    return missing
+
+
+def ensure_schema(bind: Engine) -> str:
+    """Check ``bind`` is at the Alembic heads, creating the schema if it is empty.
+
+    Returns ``CURRENT``, ``CREATED`` or ``UNVERSIONED``; the last is a
+    database created by ``create_all`` without Alembic whose tables and
+    columns all match the models. Raises :class:`SchemaVersionError` when the
+    recorded revisions differ from the heads, or when an unversioned
+    database lacks any table or column (``create_all`` cannot add columns).
+    """
+    heads = alembic_heads()
+    current = current_revisions(bind)
+    if current == heads:
+        return CURRENT
+    if current:
+        raise SchemaVersionError(
+            f"Database is at {', '.join(sorted(current))} but the code expects "
+            f"{', '.join(sorted(heads))}; run `alembic upgrade head`"
+        )
+    with bind.begin() as connection:
+        if inspect(connection).get_table_names():
+            missing = _missing_schema(connection)
+        else:
+            Base.metadata.create_all(bind=connection)
+            alembic_version.create(connection)
+            connection.execute(insert(alembic_version), [{"version_num": head} for head in sorted(heads)])
+            return CREATED
+    if missing:
+        raise SchemaVersionError(
+            f"Database has no Alembic version and lacks {', '.join(missing)}; "
+            "run `alembic stamp 0001_initial && alembic upgrade head`"
+        )
+    logger.warning(
+        "Database %s has no Alembic version but matches the models; run `alembic stamp head` to record it.",
+        bind.url.render_as_string(hide_password=True),
+    )
+    return UNVERSIONED
@@ -0,0 +1,87 @@
+"""Small in-process caches shared by the service layer."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """Thread-safe mapping whose entries expire ``ttl`` seconds after being set.
+
+    When full, the entry closest to expiry is evicted. Each worker process has
+    its own copy, so callers must tolerate up to ``ttl`` of staleness across
+    processes.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: dict[Hashable, tuple[float, V]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                oldest = min(self._data, key=lambda k: self._data[k][0])
+                del self._data[oldest]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SingleFlight(Generic[V]):
+    """Coalesce concurrent calls for the same key into one computation.
+
+    The first caller runs ``fn``; callers arriving while it is in flight
+    block and receive the same result (or exception). Results are not kept
+    once the call finishes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], V]) -> V:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
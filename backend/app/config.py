@@ -10,11 +10,55 @@ class Settings(BaseSettings):
 
     app_name: str = "Syske Scheduler"
     database_url: str = "sqlite:///./data.db"
+    # connection pool for server databases (PostgreSQL); SQLite ignores these
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
     timezone: str = "America/Argentina/Buenos_Aires"
     enable_scheduler: bool = True
     fail_threshold: int = 3
     # default 9-13 local time
     scheduler_high_energy_window: tuple[int, int] = (9, 13)
+    # worker processes for /plan/simulate alternatives and large plans; <= 1 runs inline
+    simulation_workers: int = 2
+    # graphs with at least this many nodes + edges are planned in the worker pool
+    planning_offload_threshold: int = 5_000
+    # "sync" writes events in the request transaction, "buffered" writes behind
+    event_durability: str = "sync"
+    event_queue_size: int = 10_000
+    event_flush_batch: int = 200
+    event_flush_interval: float = 1.0
+    # seconds a gamification snapshot is served from the in-process cache
+    gamification_cache_ttl: float = 5.0
+    # seconds a scheduled-job lease stays valid without a heartbeat
+    job_lease_ttl: int = 300
+    # local hour (in each user's tz) the daily review runs
+    daily_review_hour: int = 21
+    # seconds a stored Idempotency-Key response can be replayed
+    idempotency_ttl: int = 24 * 3600
+    # rows deleted per transaction by the orphan collector
+    orphan_batch_size: int = 500
+    # days for a node's failure score to halve
+    failure_half_life_days: float = 7.0
+    # days of change log kept for /sync; older cursors get a full reset
+    change_log_retention_days: int = 30
+    # plan responses cached per process; entries are checked against the change sequence
+    plan_cache_ttl: float = 24 * 3600
+    plan_cache_size: int = 10_000
+    # local hour tomorrow's plans are pre-generated for users active in the last N days
+    prewarm_hour: int = 3
+    prewarm_active_days: int = 7
+    # spread users over this many SQLite files by hashing their id; <= 1 keeps one database
+    shard_count: int = 0
+    shard_url_template: str = "sqlite:///./shards/shard-{shard}.db"
+    # X-Admin-Token value for /admin endpoints; empty disables them
+    admin_token: str = ""
+    # spans for requests, service calls and SQL; kept in memory for /admin/traces
+    tracing_enabled: bool = False
+    # also append finished traces here as NDJSON, one span per line
+    trace_file: str = ""
+    trace_buffer_size: int = 200
+    # only keep traces whose root span took at least this long
+    trace_min_duration_ms: float = 0.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -30,11 +74,16 @@ def get_settings() -> Settings:
     # Resolve relative to the backend project directory
     # (this file's parent folder),
     # so running from different CWDs (root vs backend) uses the same DB path.
+    base_dir = Path(__file__).resolve().parents[1]  # backend directory
     if settings.database_url.startswith("sqlite:///./"):
         rel = settings.database_url.replace("sqlite:///./", "")
-        base_dir = Path(__file__).resolve().parents[1]  # backend directory
         db_path = (base_dir / rel).resolve()
         settings.database_url = f"sqlite:///{db_path}"
+    if settings.shard_url_template.startswith("sqlite:///./"):
+        rel = settings.shard_url_template.replace("sqlite:///./", "")
+        settings.shard_url_template = f"sqlite:///{(base_dir / rel).resolve()}"
+    if settings.trace_file.startswith("./"):
+        settings.trace_file = str((base_dir / settings.trace_file[2:]).resolve())
     os.environ.setdefault("TZ", settings.timezone)
     return settings
 
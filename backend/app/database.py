@@ -1,22 +1,112 @@
 from contextlib import contextmanager
-from typing import Generator
+from functools import lru_cache
+from typing import Any, Callable, Generator, Optional, TypeVar
 
-from sqlalchemy import create_engine
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from .config import settings
+from .sharding import ShardRouter
 
-engine = create_engine(
-    settings.database_url, connect_args={"check_same_thread": False}
-)
+T = TypeVar("T")
+
+
+def engine_options(url: str) -> dict[str, Any]:
+    """``create_engine`` keyword arguments suited to the URL's backend."""
+    if make_url(url).get_backend_name() == "postgresql":
+        return {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_pre_ping": True,
+        }
+    return {"connect_args": {"check_same_thread": False}}
+
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Path parameters that identify a row without naming its user.
+ROUTED_IDS = {"habit_id": "habits", "task_id": "tasks", "edge_id": "edges"}
+
+
+@lru_cache
+def get_shards() -> Optional[ShardRouter]:
+    """The shard router when ``shard_count`` > 1, else None (one database)."""
+    if settings.shard_count <= 1:
+        return None
+    from . import models  # noqa: F401  (every table must be mapped before ids are assigned)
+
+    urls = [settings.shard_url_template.format(shard=shard) for shard in range(settings.shard_count)]
+    return ShardRouter(engine, urls, Base.metadata)
+
 
-def get_db() -> Generator[Session, None, None]:
-    """FastAPI dependency yielding a database session."""
-    db = SessionLocal()
+def session_factories() -> list[sessionmaker]:
+    """One session factory per shard, or just ``SessionLocal`` when unsharded."""
+    shards = get_shards()
+    return [SessionLocal] if shards is None else shards.sessions
+
+
+def for_each_shard(fn: Callable[[sessionmaker], T]) -> list[T]:
+    """Run ``fn`` with every shard's session factory, in parallel when sharded."""
+    shards = get_shards()
+    return [fn(SessionLocal)] if shards is None else shards.map(fn)
+
+
+def session_for_user(user_id: int) -> Session:
+    shards = get_shards()
+    return SessionLocal() if shards is None else shards.session_for(user_id)
+
+
+async def _row_shard(shards: ShardRouter, table: str, row_id: str) -> int:
+    try:
+        shard = await run_in_threadpool(shards.locate, table, int(row_id))
+    except ValueError:
+        shard = None
+    if shard is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return shard
+
+
+async def _request_shard(request: Request) -> Optional[int]:
+    """Shard for the request's user, from the path, query string or JSON body.
+
+    Raises 404 for a routed row no shard holds and 400 when the request names
+    neither a user nor a row.
+    """
+    shards = get_shards()
+    if shards is None:
+        return None
+    user_id = request.path_params.get("user_id") or request.query_params.get("user_id")
+    if user_id is None:
+        for param, table in ROUTED_IDS.items():
+            if param in request.path_params:
+                return await _row_shard(shards, table, request.path_params[param])
+        if request.headers.get("content-type", "").startswith("application/json"):
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+            user_id = body.get("user_id") if isinstance(body, dict) else None
+    try:
+        return shards.shard_for(int(user_id))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Sharded requests need a user_id or a known row id") from None
+
+
+def get_db(shard: Optional[int] = Depends(_request_shard)) -> Generator[Session, None, None]:
+    """FastAPI dependency yielding a database session.
+
+    When sharding is on the session is bound to the shard of the request's
+    user (see :func:`_request_shard`).
+    """
+    shards = get_shards()
+    db = SessionLocal() if shards is None else shards.sessions[shard]()
     try:
         yield db
     finally:
@@ -24,9 +114,14 @@ def get_db() -> Generator[Session, None, None]:
 
 
 @contextmanager
-def session_scope() -> Generator[Session, None, None]:
-    """Context manager for scripts/CLI utilities."""
-    session = SessionLocal()
+def session_scope(user_id: Optional[int] = None) -> Generator[Session, None, None]:
+    """Context manager for scripts/CLI utilities.
+
+    With sharding on, ``user_id`` picks the shard and is required.
+    """
+    if user_id is None and get_shards() is not None:
+        raise ValueError("session_scope needs a user_id when sharding is enabled")
+    session = SessionLocal() if user_id is None else session_for_user(user_id)
     try:
         yield session
         session.commit()
@@ -35,3 +130,59 @@ def session_scope() -> Generator[Session, None, None]:
         raise
     finally:
         session.close()
+
+
+def dialect_insert(db: Session, model):
+    """INSERT construct with ``on_conflict_*`` support for the session's dialect."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def _copy_value(column, row: dict):
+    if column.key in row:
+        return row[column.key]
+    default = column.default
+    return default.arg(None) if default.is_callable else default.arg
+
+
+def bulk_insert(db: Session, model, rows: list[dict], *, return_ids: bool = False) -> list[int]:
+    """Insert ``rows`` into ``model``'s table in the session's transaction.
+
+    On PostgreSQL with psycopg 3 the rows are streamed with ``COPY``, after
+    drawing ids from the table's sequence when ``return_ids`` is set; other
+    backends use one executemany INSERT. Scalar and callable column defaults
+    are filled in either way, SQL-expression defaults only by INSERT, and
+    ORM events do not fire. Returns the new ids in row order when
+    ``return_ids`` is set.
+    """
+    if not rows:
+        return []
+    table = model.__table__
+    connection = db.connection()
+    if connection.dialect.name != "postgresql" or connection.dialect.driver != "psycopg":
+        stmt = insert(table)
+        if return_ids:
+            stmt = stmt.returning(table.c.id, sort_by_parameter_order=True)
+            return list(connection.execute(stmt, rows).scalars())
+        connection.execute(stmt, rows)
+        return []
+
+    ids: list[int] = []
+    if return_ids:
+        sequence = connection.scalar(select(func.pg_get_serial_sequence(table.name, "id")))
+        ids = list(connection.scalars(select(func.nextval(sequence)).select_from(func.generate_series(1, len(rows)))))
+        rows = [{**row, "id": row_id} for row, row_id in zip(rows, ids)]
+    columns = [
+        column
+        for column in table.columns
+        if column.key in rows[0]
+        or (column.default is not None and (column.default.is_scalar or column.default.is_callable))
+    ]
+    processors = [column.type.bind_processor(connection.dialect) for column in columns]
+    copy_sql = f"COPY {table.name} ({', '.join(column.name for column in columns)}) FROM STDIN"
+    with connection.connection.driver_connection.cursor() as cursor, cursor.copy(copy_sql) as copy:
+        for row in rows:
+            values = [_copy_value(column, row) for column in columns]
+            copy.write_row([process(value) if process else value for value, process in zip(values, processors)])
+    return ids
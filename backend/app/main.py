@@ -1,15 +1,28 @@
-from datetime import date, datetime, time, timedelta
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager
+from datetime import date, timedelta
+from functools import partial
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Iterator
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from fastapi import Depends, FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
+from . import _import_started, profiling, tracing
 from .api.router import api_router
+from .bootstrap import ensure_schema
 from .config import settings
-from .database import Base, engine, get_db
-from .models import DayPlan, PlanStatus, User
-from .services import review, scheduler as scheduler_service
+from .database import SessionLocal, engine, for_each_shard, get_db, get_shards
+from .services import events, idempotency, jobs, nightly, orphans, scheduler as scheduler_service, sync, workers
+from .sharding import id_blocks
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.app_name)
 app.include_router(api_router)
@@ -21,38 +34,123 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(tracing.TracingMiddleware)
+
+
+@contextmanager
+def _timed(timings: dict[str, float], phase: str) -> Iterator[None]:
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = (perf_counter() - started) * 1000
+
+
+def _ensure_schemas() -> None:
+    """Check (or create) the schema of the database and of every shard."""
+    ensure_schema(engine)
+    shards = get_shards()
+    if shards is not None:
+        id_blocks.create(shards.catalog, checkfirst=True)
+        for shard_engine in shards.engines:
+            ensure_schema(shard_engine)
+
 
+def _start_scheduler() -> BackgroundScheduler:
+    # Imported here so workers running without the scheduler never load it.
+    from apscheduler.schedulers.background import BackgroundScheduler
 
-def _run_daily_jobs():
-    with engine.begin() as connection:
-        Base.metadata.create_all(bind=connection)
+    background = BackgroundScheduler(timezone=settings.timezone)
+    _schedule_daily_review(background)
+    _schedule_prewarm(background)
+    _schedule_maintenance(background)
+    background.start()
+    return background
 
 
 def _schedule_daily_review(background: BackgroundScheduler):
+    background.add_job(
+        for_each_shard,
+        "cron",
+        minute=f"*/{nightly.TICK_MINUTES}",
+        args=[nightly.run_due_reviews],
+    )
+
+
+def _schedule_prewarm(background: BackgroundScheduler):
+    background.add_job(
+        for_each_shard,
+        "cron",
+        minute=f"*/{nightly.TICK_MINUTES}",
+        args=[nightly.run_due_prewarm],
+    )
+
+
+def _leased(
+    name: str,
+    fn: Callable[[Session], None],
+    offset: timedelta,
+    session_factory: jobs.SessionFactory,
+) -> None:
+    """Run ``fn`` in one committed session under the job lease of one shard.
+
+    The jobs fire hourly, ``offset`` past the hour, which also names the slot.
+    """
+
     def job():
-        from .database import session_scope
+        db = session_factory()
+        try:
+            fn(db)
+            db.commit()
+        finally:
+            db.close()
+
+    jobs.run_exclusive(session_factory, name, job, period=timedelta(hours=1), offset=offset)
+
+
+def _schedule_maintenance(background: BackgroundScheduler):
+    def purge_expired(db: Session):
+        idempotency.purge_expired(db)
+        sync.purge_expired(db)
 
-        with session_scope() as db:
-            users = db.query(User).all()
-            today = date.today()
-            for user in users:
-                try:
-                    review.generate_daily_summary(db, user.id, today)
-                except ValueError:
-                    continue
+    background.add_job(
+        for_each_shard,
+        "cron",
+        minute=0,
+        args=[partial(_leased, "purge_expired", purge_expired, timedelta(0))],
+    )
 
-    background.add_job(job, "cron", hour=21, minute=0)
+    def collect_orphans(db: Session):
+        report = orphans.collect_orphans(db)
+        if any(report.values()):
+            logger.info("Removed orphaned rows: %s", report)
+
+    background.add_job(
+        for_each_shard,
+        "cron",
+        minute=30,
+        args=[partial(_leased, "collect_orphans", collect_orphans, timedelta(minutes=30))],
+    )
 
 
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
-    _run_daily_jobs()
+    timings = {"import": _import_ms}
+    with _timed(timings, "schema"):
+        _ensure_schemas()
+    with _timed(timings, "events"):
+        events.start_buffer(SessionLocal)
+    with _timed(timings, "workers"):
+        workers.warm_up()
     if settings.enable_scheduler:
-        background = BackgroundScheduler(timezone=settings.timezone)
-        _schedule_daily_review(background)
-        background.start()
-        app.state.scheduler = background
+        with _timed(timings, "scheduler"):
+            app.state.scheduler = _start_scheduler()
+    app.state.startup_timings = timings
+    logger.info(
+        "Started in %.0f ms (%s)",
+        sum(timings.values()),
+        ", ".join(f"{phase} {ms:.0f} ms" for phase, ms in timings.items()),
+    )
 
 
 @app.on_event("shutdown")
@@ -60,6 +158,8 @@ def on_shutdown():
     background = getattr(app.state, "scheduler", None)
     if background:
         background.shutdown(wait=False)
+    workers.shutdown()
+    events.stop_buffer()
 
 
 @app.get("/healthz")
@@ -72,3 +172,9 @@ def demo_plan(user_id: int = Query(...), db: Session = Depends(get_db)) -> dict:
     today = date.today()
     plan = scheduler_service.generate_day_plan(db, user_id=user_id, target_date=today)
     return {"plan_id": plan.id, "items": len(plan.items)}
+
+
+# After every route is registered, including the ones above.
+profiling.install(app)
+
+_import_ms = (perf_counter() - _import_started) * 1000
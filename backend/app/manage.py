@@ -0,0 +1,70 @@
+"""Maintenance commands: ``python -m app.manage <command>``."""
+
+import argparse
+from typing import Callable, TypeVar
+
+from sqlalchemy.orm import Session
+
+from .database import Base, engine, for_each_shard, get_shards
+from .services import failures, orphans, streaks
+
+T = TypeVar("T")
+
+
+def _on_every_shard(fn: Callable[[Session], T]) -> list[T]:
+    def run(session_factory) -> T:
+        session = session_factory()
+        try:
+            result = fn(session)
+            session.commit()
+            return result
+        finally:
+            session.close()
+
+    return for_each_shard(run)
+
+
+def backfill_streaks() -> None:
+    days = sum(_on_every_shard(streaks.backfill_streaks))
+    print(f"Recomputed streaks across {days} qualifying days.")
+
+
+def backfill_failure_scores() -> None:
+    nodes = sum(_on_every_shard(failures.backfill_scores))
+    print(f"Recomputed failure scores for {nodes} nodes.")
+
+
+def collect_orphans() -> None:
+    reports = _on_every_shard(orphans.collect_orphans)
+    report = {table: sum(shard[table] for shard in reports) for table in reports[0]}
+    print("Removed orphans: " + ", ".join(f"{table}={count}" for table, count in report.items()))
+
+
+def rebalance_shards() -> None:
+    shards = get_shards()
+    if shards is None:
+        print("Sharding is off (shard_count <= 1); nothing to rebalance.")
+        return
+    Base.metadata.create_all(bind=engine)
+    shards.create_all()
+    moved = shards.rebalance(include_catalog=True)
+    print(f"Moved {sum(moved.values())} users: " + ", ".join(f"shard {s}={n}" for s, n in sorted(moved.items())))
+
+
+COMMANDS = {
+    "backfill-failure-scores": backfill_failure_scores,
+    "backfill-streaks": backfill_streaks,
+    "collect-orphans": collect_orphans,
+    "rebalance-shards": rebalance_shards,
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,14 +11,21 @@ from sqlalchemy import (
     Date,
     DateTime,
     Enum,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     Time,
     UniqueConstraint,
+    delete,
+    event,
     func,
+    insert,
+    update,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -60,7 +67,9 @@ class User(Base):
     __tablename__ = "users"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    tz: Mapped[str] = mapped_column(String(64), default="America/Argentina/Buenos_Aires")
+    tz: Mapped[str] = mapped_column(String(64), index=True, default="America/Argentina/Buenos_Aires")
+    # Last change sequence number handed out for this user's synced rows.
+    change_seq: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     goals: Mapped[list["Goal"]] = relationship("Goal", back_populates="user")
     systems: Mapped[list["System"]] = relationship("System", back_populates="user")
@@ -152,6 +161,35 @@ class Edge(Base):
     relation: Mapped[RelationType] = mapped_column(Enum(RelationType), nullable=False)
 
 
+class Node(Base):
+    """Registry row for every goal, system, habit and task, kept in sync by mapper events."""
+
+    __tablename__ = "nodes"
+    __table_args__ = (UniqueConstraint("node_type", "ref_id", name="uq_node_ref"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True, nullable=False)
+    node_type: Mapped[NodeType] = mapped_column(Enum(NodeType), nullable=False)
+    ref_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    label: Mapped[str] = mapped_column(String(255), nullable=False)
+
+
+class NodeRank(Base):
+    """Position of a linked node in the user's incrementally kept topological order."""
+
+    __tablename__ = "node_ranks"
+    __table_args__ = (
+        UniqueConstraint("user_id", "node_type", "node_id", name="uq_node_rank"),
+        Index("ix_node_ranks_user_rank", "user_id", "rank"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    node_type: Mapped[NodeType] = mapped_column(Enum(NodeType), nullable=False)
+    node_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    rank: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
 class DayPlan(Base):
     __tablename__ = "day_plans"
     __table_args__ = (
@@ -164,6 +202,10 @@ class DayPlan(Base):
     generated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     flow_score: Mapped[int] = mapped_column(Integer, default=0)
     notes: Mapped[Optional[str]] = mapped_column(Text, default=None)
+    # Bumped on every regeneration; used as a compare-and-set guard.
+    generation: Mapped[int] = mapped_column(Integer, default=0)
+    # User's change sequence when a pre-warmed plan read the graph; None otherwise.
+    prewarmed_seq: Mapped[Optional[int]] = mapped_column(Integer, default=None)
 
     items: Mapped[list["PlanItem"]] = relationship(
         "PlanItem", back_populates="dayplan", cascade="all, delete-orphan"
@@ -182,22 +224,66 @@ class PlanItem(Base):
     scheduled_window_start: Mapped[Optional[time]] = mapped_column(Time, default=None)
     scheduled_window_end: Mapped[Optional[time]] = mapped_column(Time, default=None)
     anchor: Mapped[Optional[PlanAnchor]] = mapped_column(Enum(PlanAnchor), default=None)
+    # Prerequisites in this plan not yet done or skipped; READY once it hits 0.
+    remaining_deps: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
 
     dayplan: Mapped["DayPlan"] = relationship("DayPlan", back_populates="items")
 
+    # ORM updates become compare-and-set on ``version`` (StaleDataError on conflict).
+    __mapper_args__ = {"version_id_col": version}
+
+
+class PlanItemDependency(Base):
+    """Dependency edge between two items of the same day plan."""
+
+    __tablename__ = "plan_item_deps"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    dayplan_id: Mapped[int] = mapped_column(ForeignKey("day_plans.id"), index=True, nullable=False)
+    parent_item_id: Mapped[int] = mapped_column(ForeignKey("plan_items.id"), index=True, nullable=False)
+    child_item_id: Mapped[int] = mapped_column(ForeignKey("plan_items.id"), nullable=False)
+
+
+class ChangeLog(Base):
+    """One row per synced entity touched by a write, keyed by the user's change sequence."""
+
+    __tablename__ = "change_log"
+    __table_args__ = (Index("ix_change_log_user_seq", "user_id", "seq"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)
+    entity: Mapped[str] = mapped_column(String(16), nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    op: Mapped[str] = mapped_column(String(8), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
+
 
 class EventLog(Base):
     __tablename__ = "event_logs"
+    __table_args__ = (
+        # Containment (``@>``) lookups on the payload; PostgreSQL only.
+        Index(
+            "ix_event_logs_payload",
+            "payload_json",
+            postgresql_using="gin",
+            postgresql_ops={"payload_json": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True, nullable=False)
     ts: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
     event_type: Mapped[str] = mapped_column(String(64), nullable=False)
-    payload_json: Mapped[dict] = mapped_column(JSON, default=dict)
+    payload_json: Mapped[dict] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), default=dict)
 
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        UniqueConstraint("user_id", "type", "date_range_start", "date_range_end", name="uq_review_range"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True, nullable=False)
@@ -226,6 +312,7 @@ class FailureStats(Base):
     __tablename__ = "failure_stats"
     __table_args__ = (
         UniqueConstraint("user_id", "node_type", "node_id", name="uq_failure_node"),
+        Index("ix_failure_stats_user_score_key", "user_id", "score_key"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -234,3 +321,95 @@ class FailureStats(Base):
     node_id: Mapped[int] = mapped_column(Integer, nullable=False)
     rolling_fail_count: Mapped[int] = mapped_column(Integer, default=0)
     last_failed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
+    # Exponentially decayed failure score as of score_updated_at (see services.failures).
+    score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    score_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
+    score_key: Mapped[Optional[float]] = mapped_column(Float, default=None)
+
+
+class JobLease(Base):
+    """Lease that lets exactly one worker process run a scheduled job."""
+
+    __tablename__ = "job_leases"
+
+    name: Mapped[str] = mapped_column(String(128), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(255), nullable=False)
+    acquired_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    __table_args__ = (UniqueConstraint("job_name", "slot", name="uq_job_run_slot"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job_name: Mapped[str] = mapped_column(String(128), index=True, nullable=False)
+    slot: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    owner: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="running")
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
+    error: Mapped[Optional[str]] = mapped_column(Text, default=None)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_key"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    key: Mapped[str] = mapped_column(String(128), nullable=False)
+    endpoint: Mapped[str] = mapped_column(String(64), nullable=False)
+    response_json: Mapped[dict] = mapped_column(JSON, default=dict)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True, nullable=False)
+
+
+# Registry maintenance. ORM writes to the four node models also write the
+# matching ``nodes`` row; deleting a node removes the edges, ranks and
+# failure stats that refer to it. Bulk ``query.update()``/``delete()`` calls
+# bypass these hooks.
+NODE_MODELS = {Goal: NodeType.GOAL, System: NodeType.SYSTEM, Habit: NodeType.HABIT, Task: NodeType.TASK}
+
+
+def _node_label(target) -> str:
+    return target.name if isinstance(target, Habit) else target.title
+
+
+def _register_node(mapper, connection, target) -> None:
+    connection.execute(
+        insert(Node).values(
+            user_id=target.user_id,
+            node_type=NODE_MODELS[type(target)],
+            ref_id=target.id,
+            label=_node_label(target),
+        )
+    )
+
+
+def _refresh_node(mapper, connection, target) -> None:
+    connection.execute(
+        update(Node)
+        .where(Node.node_type == NODE_MODELS[type(target)], Node.ref_id == target.id)
+        .values(user_id=target.user_id, label=_node_label(target))
+    )
+
+
+def _unregister_node(mapper, connection, target) -> None:
+    node_type = NODE_MODELS[type(target)]
+    connection.execute(delete(Node).where(Node.node_type == node_type, Node.ref_id == target.id))
+    connection.execute(
+        delete(Edge).where(
+            (Edge.from_type == node_type) & (Edge.from_id == target.id)
+            | (Edge.to_type == node_type) & (Edge.to_id == target.id)
+        )
+    )
+    for model in (NodeRank, FailureStats):
+        connection.execute(delete(model).where(model.node_type == node_type, model.node_id == target.id))
+
+
+for _model in NODE_MODELS:
+    event.listen(_model, "after_insert", _register_node)
+    event.listen(_model, "after_update", _refresh_node)
+    event.listen(_model, "after_delete", _unregister_node)
@@ -0,0 +1,329 @@
+"""On-demand profiling of live requests and service calls.
+
+Nothing is measured until an admin arms it through ``/admin/profiling``:
+
+* Request profiles: a share of calls to chosen routes run under cProfile or
+  a sampling profiler; the last ``keep`` profiles are held in a ring
+  buffer and can be downloaded as pstats data or collapsed stacks (the
+  input format of flamegraph.pl and speedscope).
+* Memory captures: chosen ``app.services`` functions are wrapped with
+  tracemalloc snapshots taken before and after the call.
+
+Route endpoints are wrapped once by :func:`install`; while profiling is off
+the wrapper costs one attribute read per request.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import importlib
+import inspect
+import io
+import itertools
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+CPROFILE = "cprofile"
+SAMPLING = "sampling"
+MODES = (CPROFILE, SAMPLING)
+
+
+@dataclass
+class RequestProfile:
+    id: int
+    route: str
+    mode: str
+    started_at: datetime
+    duration_ms: float
+    # pstats data for cProfile runs, stack -> samples for sampling runs.
+    stats: Any
+
+    def pstats_bytes(self) -> bytes:
+        """The profile in the file format ``pstats.Stats`` loads."""
+        if self.mode != CPROFILE:
+            raise ValueError("Only cProfile runs have pstats data")
+        return marshal.dumps(self.stats)
+
+    def collapsed(self) -> str:
+        """``frame;frame;frame count`` lines, root first."""
+        if self.mode == SAMPLING:
+            stacks = self.stats
+        else:
+            stacks = _collapse_pstats(self.stats)
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def text(self, limit: int = 40) -> str:
+        if self.mode == SAMPLING:
+            return "".join(f"{count:6d} {stack}\n" for stack, count in Counter(self.stats).most_common(limit))
+        stream = io.StringIO()
+        stats = pstats.Stats(stream=stream)
+        stats.stats = self.stats
+        stats.get_top_level_stats()
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+
+@dataclass
+class MemoryCapture:
+    id: int
+    target: str
+    started_at: datetime
+    duration_ms: float
+    peak_bytes: int
+    # (file:line, size delta in bytes, count delta), largest growth first.
+    top: list[tuple[str, int, int]]
+
+
+@dataclass
+class _RequestConfig:
+    mode: str = CPROFILE
+    sample_rate: float = 0.0
+    routes: frozenset[str] = frozenset()
+    keep: int = 20
+    interval: float = 0.005
+
+
+@dataclass
+class _State:
+    requests: Optional[_RequestConfig] = None
+    profiles: deque[RequestProfile] = field(default_factory=lambda: deque(maxlen=20))
+    memory_targets: dict[str, Callable] = field(default_factory=dict)
+    # Captures still to take, per target.
+    memory_remaining: dict[str, int] = field(default_factory=dict)
+    captures: deque[MemoryCapture] = field(default_factory=lambda: deque(maxlen=20))
+
+
+_state = _State()
+_lock = threading.Lock()
+# Held for the whole of a memory capture: tracemalloc state is process-wide.
+_capture_lock = threading.Lock()
+_ids = itertools.count(1)
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def _collapse_pstats(stats: dict) -> dict[str, int]:
+    """Approximate stacks from cProfile caller edges, weighted by own time in microseconds."""
+    stacks: dict[str, int] = {}
+    for func, (_, _, own_time, _, callers) in stats.items():
+        path = [func]
+        seen = {func}
+        while callers:
+            # Follow the caller that spent the most time in this function.
+            parent = max(callers, key=lambda caller: callers[caller][3])
+            if parent in seen:
+                break
+            path.append(parent)
+            seen.add(parent)
+            callers = stats.get(parent, (0, 0, 0, 0, {}))[4]
+        stack = ";".join(f"{name} ({filename}:{line})" for filename, line, name in reversed(path))
+        stacks[stack] = stacks.get(stack, 0) + int(own_time * 1_000_000)
+    return {stack: weight for stack, weight in stacks.items() if weight}
+
+
+class _Sampler(threading.Thread):
+    """Records the stack of one thread every ``interval`` seconds."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self.stacks: Counter[str] = Counter()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def _profiled_call(route: str, config: _RequestConfig, fn: Callable, args, kwargs):
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    if config.mode == CPROFILE:
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            profiler.create_stats()
+            _store_profile(route, config.mode, started_at, duration, profiler.stats)
+    sampler = _Sampler(threading.get_ident(), config.interval)
+    sampler.start()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        sampler.stop()
+        _store_profile(route, config.mode, started_at, time.perf_counter() - start, dict(sampler.stacks))
+
+
+def _store_profile(route: str, mode: str, started_at: datetime, duration: float, stats: Any) -> None:
+    profile = RequestProfile(next(_ids), route, mode, started_at, round(duration * 1000, 3), stats)
+    with _lock:
+        _state.profiles.append(profile)
+
+
+def _wrap_endpoint(route: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def endpoint(*args, **kwargs):
+        config = _state.requests
+        if config is None or route not in config.routes or random.random() >= config.sample_rate:
+            return fn(*args, **kwargs)
+        return _profiled_call(route, config, fn, args, kwargs)
+
+    endpoint.profiled = True
+    return endpoint
+
+
+def install(app: FastAPI) -> None:
+    """Wrap every synchronous API endpoint so it can be profiled on demand."""
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or inspect.iscoroutinefunction(route.dependant.call):
+            continue
+        if not getattr(route.dependant.call, "profiled", False):
+            route.dependant.call = _wrap_endpoint(route.path, route.dependant.call)
+
+
+def configure_requests(mode: str, sample_rate: float, routes: list[str], keep: int, interval: float) -> None:
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode {mode!r}")
+    with _lock:
+        if keep != _state.profiles.maxlen:
+            _state.profiles = deque(_state.profiles, maxlen=keep)
+        _state.requests = _RequestConfig(mode, sample_rate, frozenset(routes), keep, interval)
+
+
+def stop_requests() -> None:
+    with _lock:
+        _state.requests = None
+        _state.profiles.clear()
+
+
+def request_config() -> Optional[_RequestConfig]:
+    return _state.requests
+
+
+def profiles() -> list[RequestProfile]:
+    """Captured request profiles, slowest first."""
+    with _lock:
+        return sorted(_state.profiles, key=lambda profile: profile.duration_ms, reverse=True)
+
+
+def get_profile(profile_id: int) -> Optional[RequestProfile]:
+    with _lock:
+        return next((profile for profile in _state.profiles if profile.id == profile_id), None)
+
+
+def _resolve(target: str) -> tuple[Any, str]:
+    """``"scheduler.generate_day_plan"`` -> (the services.scheduler module, attribute name)."""
+    module_name, _, attr = target.rpartition(".")
+    if not module_name or not attr:
+        raise ValueError(f"Expected <module>.<function>, got {target!r}")
+    try:
+        module = importlib.import_module(f"app.services.{module_name}")
+    except ImportError as exc:
+        raise ValueError(f"No service module {module_name!r}") from exc
+    if not callable(getattr(module, attr, None)):
+        raise ValueError(f"{target!r} is not a service function")
+    return module, attr
+
+
+def _traced(target: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        with _lock:
+            armed = _state.memory_remaining.get(target, 0) > 0
+            if armed:
+                _state.memory_remaining[target] -= 1
+        if not armed:
+            return fn(*args, **kwargs)
+        with _capture_lock:
+            return _captured_call(target, fn, args, kwargs)
+
+    return call
+
+
+def _captured_call(target: str, fn: Callable, args, kwargs):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(25)
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        duration = time.perf_counter() - start
+        # stop_memory() may have turned tracemalloc off during the call.
+        if tracemalloc.is_tracing():
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            top = [
+                (f"{diff.traceback[0].filename}:{diff.traceback[0].lineno}", diff.size_diff, diff.count_diff)
+                for diff in after.compare_to(before, "lineno")[:25]
+            ]
+            capture = MemoryCapture(next(_ids), target, started_at, round(duration * 1000, 3), peak, top)
+            with _lock:
+                _state.captures.append(capture)
+
+
+def configure_memory(targets: list[str], captures: int) -> None:
+    """Trace the next ``captures`` calls to each of ``targets`` (``module.function`` in app.services).
+
+    Only calls made through the module attribute are seen, which is how the
+    routes and services call each other.
+    """
+    resolved = [(target, *_resolve(target)) for target in targets]
+    stop_memory(clear=False)
+    with _lock:
+        for target, module, attr in resolved:
+            original = getattr(module, attr)
+            _state.memory_targets[target] = original
+            setattr(module, attr, _traced(target, original))
+            _state.memory_remaining[target] = captures
+
+
+def stop_memory(clear: bool = True) -> None:
+    with _lock:
+        for target, original in _state.memory_targets.items():
+            module, attr = _resolve(target)
+            setattr(module, attr, original)
+        _state.memory_targets.clear()
+        _state.memory_remaining.clear()
+        if clear:
+            _state.captures.clear()
+    if clear and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def memory_targets() -> list[str]:
+    return list(_state.memory_targets)
+
+
+def memory_captures() -> list[MemoryCapture]:
+    with _lock:
+        return list(_state.captures)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime, time
-from typing import Optional
+from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -140,6 +140,7 @@ class PlanItemBase(BaseModel):
 
 class PlanItem(PlanItemBase):
     id: int
+    version: int = 1
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -166,11 +167,76 @@ class PlanGenerateResponse(BaseModel):
 class PlanCompleteRequest(BaseModel):
     plan_item_id: int
     ts: Optional[datetime] = None
+    # Optional compare-and-set guard against the item's current version.
+    version: Optional[int] = None
 
 
 class PlanSkipRequest(BaseModel):
     plan_item_id: int
     reason: Optional[str] = None
+    version: Optional[int] = None
+
+
+class PlanBatchChange(BaseModel):
+    plan_item_id: int
+    action: Literal["complete", "skip"]
+    ts: Optional[datetime] = None
+    reason: Optional[str] = None
+    version: Optional[int] = None
+
+
+class PlanBatchRequest(BaseModel):
+    # Applied in list order, e.g. a client's offline queue.
+    changes: list[PlanBatchChange] = Field(max_length=500)
+
+
+class PlanBatchResult(BaseModel):
+    plan_item_id: int
+    status: Literal["ok", "not_found", "conflict"]
+
+
+class PlanBatchResponse(BaseModel):
+    results: list[PlanBatchResult]
+
+
+class EdgeRef(BaseModel):
+    from_type: NodeType
+    from_id: int
+    to_type: NodeType
+    to_id: int
+
+
+class NodeOverride(BaseModel):
+    """Replacement soft window and/or energy tag for one node; omitted fields are kept."""
+
+    node_type: NodeType
+    node_id: int
+    soft_window_start: Optional[time] = None
+    soft_window_end: Optional[time] = None
+    energy_tag: Optional[str] = None
+
+
+class GraphOverlay(BaseModel):
+    label: Optional[str] = None
+    add_edges: list[EdgeBase] = Field(default_factory=list)
+    remove_edges: list[EdgeRef] = Field(default_factory=list)
+    node_overrides: list[NodeOverride] = Field(default_factory=list)
+
+
+class PlanSimulationRequest(BaseModel):
+    user_id: int
+    alternatives: list[GraphOverlay] = Field(default_factory=lambda: [GraphOverlay()], min_length=1)
+
+
+class SimulatedPlan(BaseModel):
+    label: Optional[str] = None
+    items: list[PlanItemBase]
+    projected_flow_score: int
+    has_cycle: bool = False
+
+
+class PlanSimulationResponse(BaseModel):
+    results: list[SimulatedPlan]
 
 
 class ReviewBase(BaseModel):
@@ -214,6 +280,28 @@ class CoachRequest(BaseModel):
     user_id: int
 
 
+class TodayPlanItem(PlanItem):
+    label: Optional[str] = None
+
+
+class TodayPlan(DayPlan):
+    items: list[TodayPlanItem] = []
+
+
+class TodayBundle(BaseModel):
+    date: date
+    plan: Optional[TodayPlan] = None
+    gamification: Gamification
+    suggestions: list[CoachSuggestion] = []
+
+
+class SyncResponse(BaseModel):
+    seq: int
+    reset: bool = False
+    upserted: dict[str, list[dict[str, Any]]] = Field(default_factory=dict)
+    deleted: dict[str, list[int]] = Field(default_factory=dict)
+
+
 class ReviewSummary(BaseModel):
     summary: str
     tweaks: list[CoachSuggestionAction]
@@ -230,3 +318,77 @@ class GraphNode(BaseModel):
 class GraphResponse(BaseModel):
     nodes: list[GraphNode]
     edges: list[Edge]
+
+
+class ProfilingConfig(BaseModel):
+    mode: Literal["cprofile", "sampling"] = "cprofile"
+    # share of matching requests that are profiled
+    sample_rate: float = Field(default=1.0, gt=0, le=1)
+    # route paths as declared, e.g. "/plan/generate"
+    routes: list[str] = Field(min_length=1)
+    # profiles kept, the oldest are dropped first
+    keep: int = Field(default=20, ge=1, le=500)
+    # seconds between stack samples in sampling mode
+    interval: float = Field(default=0.005, ge=0.001, le=1)
+
+
+class ProfileSummary(BaseModel):
+    id: int
+    route: str
+    mode: str
+    started_at: datetime
+    duration_ms: float
+
+
+class ProfilingStatus(BaseModel):
+    config: Optional[ProfilingConfig] = None
+    profiles: list[ProfileSummary] = []
+
+
+class MemoryConfig(BaseModel):
+    # service functions as "<module>.<function>", e.g. "scheduler.generate_day_plan"
+    targets: list[str] = Field(min_length=1)
+    # calls traced per target before capturing stops
+    captures: int = Field(default=1, ge=1, le=100)
+
+
+class MemoryAllocation(BaseModel):
+    location: str
+    size_diff: int
+    count_diff: int
+
+
+class MemoryCapture(BaseModel):
+    id: int
+    target: str
+    started_at: datetime
+    duration_ms: float
+    peak_bytes: int
+    top: list[MemoryAllocation]
+
+
+class MemoryStatus(BaseModel):
+    targets: list[str] = []
+    captures: list[MemoryCapture] = []
+
+
+class TraceSpan(BaseModel):
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    name: str
+    start: float
+    duration_ms: float
+    status: str
+    attributes: dict[str, Any] = Field(default_factory=dict)
+
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    name: str
+    start: float
+    duration_ms: float
+    status: str
+    span_count: int
+    # time in SQL statements directly or indirectly under the root
+    sql_ms: float
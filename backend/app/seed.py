@@ -1,16 +1,37 @@
 from datetime import time
+from typing import Optional
 
-from .database import Base, engine, session_scope
+from sqlalchemy import select
+
+from .database import Base, engine, get_shards, session_scope
 from .models import Edge, Goal, Habit, NodeType, RelationType, System, Task, User
 
 
+def _sharded_user_id() -> Optional[int]:
+    """With sharding on, the first stored user or a newly allocated id; else None."""
+    shards = get_shards()
+    if shards is None:
+        return None
+    for session_factory in shards.sessions:
+        with session_factory() as session:
+            user_id = session.scalar(select(User.id).order_by(User.id).limit(1))
+        if user_id is not None:
+            return user_id
+    return shards.ids.next_id(User.__tablename__)
+
+
 def run() -> None:
-    Base.metadata.create_all(bind=engine)
+    shards = get_shards()
+    if shards is None:
+        Base.metadata.create_all(bind=engine)
+    else:
+        shards.create_all()
+    user_id = _sharded_user_id()
 
-    with session_scope() as session:
-        user = session.query(User).first()
+    with session_scope(user_id) as session:
+        user = session.query(User).first() if user_id is None else session.get(User, user_id)
         if not user:
-            user = User(tz="America/Argentina/Buenos_Aires")
+            user = User(id=user_id, tz="America/Argentina/Buenos_Aires")
             session.add(user)
             session.flush()
 
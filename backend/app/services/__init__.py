@@ -1,5 +1,45 @@
 """Business logic service layer."""
 
-from . import coach, flow, review, scheduler
+from . import (
+    coach,
+    events,
+    failures,
+    flow,
+    gamification,
+    idempotency,
+    jobs,
+    nightly,
+    nodes,
+    orphans,
+    plan_cache,
+    progress,
+    review,
+    scheduler,
+    simulation,
+    streaks,
+    sync,
+    topology,
+    workers,
+)
 
-__all__ = ["coach", "flow", "review", "scheduler"]
+__all__ = [
+    "coach",
+    "events",
+    "failures",
+    "flow",
+    "gamification",
+    "idempotency",
+    "jobs",
+    "nightly",
+    "nodes",
+    "orphans",
+    "plan_cache",
+    "progress",
+    "review",
+    "scheduler",
+    "simulation",
+    "streaks",
+    "sync",
+    "topology",
+    "workers",
+]
@@ -1,37 +1,21 @@
 from __future__ import annotations
 
-from datetime import datetime
+from functools import lru_cache
+from typing import Optional
 
 from sqlalchemy.orm import Session
 
+from .. import tracing
 from ..config import settings
-from ..models import EventLog, FailureStats, Habit, NodeType, Task
+from ..models import FailureStats, NodeType
 from ..schemas import CoachSuggestion, CoachSuggestionAction
+from . import events, failures, nodes
 
 
-def _lookup_node(db: Session, node_type: NodeType, node_id: int):
-    if node_type == NodeType.HABIT:
-        return db.query(Habit).filter(Habit.id == node_id).first()
-    if node_type == NodeType.TASK:
-        return db.query(Task).filter(Task.id == node_id).first()
-    return None
-
-
-def suggest_fixes(db: Session, user_id: int, node_type: NodeType, node_id: int) -> CoachSuggestion:
-    stats = (
-        db.query(FailureStats)
-        .filter(
-            FailureStats.user_id == user_id,
-            FailureStats.node_type == node_type,
-            FailureStats.node_id == node_id,
-        )
-        .first()
-    )
-    node = _lookup_node(db, node_type, node_id)
-
+@lru_cache(maxsize=1024)
+def _actions(node_type: NodeType, label: str, struggling: bool) -> tuple[CoachSuggestionAction, ...]:
     actions: list[CoachSuggestionAction] = []
-    if stats and stats.rolling_fail_count >= settings.fail_threshold:
-        label = getattr(node, "name", None) or getattr(node, "title", "item")
+    if struggling:
         actions.append(
             CoachSuggestionAction(
                 title="Shrink the scope",
@@ -70,14 +54,32 @@ def suggest_fixes(db: Session, user_id: int, node_type: NodeType, node_id: int)
             )
         )
 
-    suggestion = CoachSuggestion(node_type=node_type, node_id=node_id, actions=actions)
-    db.add(
-        EventLog(
-            user_id=user_id,
-            ts=datetime.utcnow(),
-            event_type="coach_suggest",
-            payload_json=suggestion.model_dump(),
+    return tuple(actions)
+
+
+def build_suggestion(
+    node_type: NodeType, node_id: int, label: Optional[str], score: float
+) -> CoachSuggestion:
+    """Suggestion for a node given its label and current failure score; no I/O."""
+    struggling = score >= settings.fail_threshold
+    actions = _actions(node_type, label or "item", struggling)
+    return CoachSuggestion(node_type=node_type, node_id=node_id, actions=list(actions))
+
+
+@tracing.traced("coach.suggest_fixes")
+def suggest_fixes(db: Session, user_id: int, node_type: NodeType, node_id: int) -> CoachSuggestion:
+    stats = (
+        db.query(FailureStats)
+        .filter(
+            FailureStats.user_id == user_id,
+            FailureStats.node_type == node_type,
+            FailureStats.node_id == node_id,
         )
+        .first()
     )
+    score = failures.current_score(stats)
+    label = nodes.label(db, user_id, node_type, node_id) if score >= settings.fail_threshold else None
+    suggestion = build_suggestion(node_type, node_id, label, score)
+    events.record_event(db, user_id, "coach_suggest", suggestion.model_dump())
     db.commit()
     return suggestion
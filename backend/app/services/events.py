@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import bulk_insert, get_shards
+from ..models import EventLog
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_SYNC = "sync"
+DURABILITY_BUFFERED = "buffered"
+
+
+def _by_shard(
+    rows: list[dict], session_factory: Callable[[], Session]
+) -> list[tuple[Callable[[], Session], list[dict]]]:
+    shards = get_shards()
+    if shards is None:
+        return [(session_factory, rows)]
+    grouped: dict[int, list[dict]] = defaultdict(list)
+    for row in rows:
+        grouped[shards.shard_for(row["user_id"])].append(row)
+    return [(shards.sessions[shard], shard_rows) for shard, shard_rows in grouped.items()]
+
+
+class EventBuffer:
+    """Bounded in-process queue of EventLog rows flushed in batches.
+
+    Rows are inserted by a background thread once ``batch_size`` rows are
+    waiting or ``flush_interval`` seconds have passed, whichever comes first.
+    ``flush()`` can also be called directly to drain synchronously. With
+    sharding on, each batch is split across the users' shards.
+
+    Rows whose insert fails are kept and retried ahead of newer ones, with
+    the flusher backing off exponentially up to ``max_backoff`` seconds;
+    only rows still failing when the buffer is stopped are dropped.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        maxsize: int = 10_000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_backoff: float = 30.0,
+    ) -> None:
+        self._session_factory = session_factory
+        self._queue: queue.Queue[dict] = queue.Queue(maxsize=maxsize)
+        self._maxsize = maxsize
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_backoff = max_backoff
+        self._flush_lock = threading.Lock()
+        # Guards the hand-over of rows from the queue to _inflight/_retry, so
+        # pending() sees every unwritten row exactly once.
+        self._rows_lock = threading.Lock()
+        self._inflight: list[dict] = []
+        self._retry: list[dict] = []
+        self._failures = 0
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def offer(self, row: dict) -> bool:
+        """Queue ``row`` for insertion; returns False when the buffer is full."""
+        if self._retry and len(self._retry) + self._queue.qsize() >= self._maxsize:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            return False
+        return True
+
+    def pending(self, user_id: int, event_types: Iterable[str]) -> list[EventLog]:
+        """Unflushed events for ``user_id`` as transient EventLog objects."""
+        wanted = set(event_types)
+        with self._rows_lock:
+            with self._queue.mutex:
+                rows = list(self._queue.queue)
+            rows.extend(self._inflight)
+            rows.extend(self._retry)
+        return [
+            EventLog(**row)
+            for row in rows
+            if row["user_id"] == user_id and row["event_type"] in wanted
+        ]
+
+    def _take_batch(self) -> list[dict]:
+        with self._rows_lock:
+            batch = self._retry[: self._batch_size]
+            del self._retry[: len(batch)]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._inflight = batch
+        return batch
+
+    def _write(self, batch: list[dict]) -> list[dict]:
+        """Insert ``batch`` shard by shard; returns the rows that failed."""
+        failed: list[dict] = []
+        for session_factory, rows in _by_shard(batch, self._session_factory):
+            session = session_factory()
+            try:
+                bulk_insert(session, EventLog, rows)
+                session.commit()
+            except Exception:
+                logger.exception("Failed to write %d buffered events; will retry", len(rows))
+                session.rollback()
+                failed.extend(rows)
+            finally:
+                session.close()
+        return failed
+
+    def flush(self) -> int:
+        """Insert everything queued so far; returns the number of rows written.
+
+        Stops at the first failed batch, which is put back for the next flush.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    self._failures = 0
+                    return written
+                failed = self._write(batch)
+                with self._rows_lock:
+                    self._retry[:0] = failed
+                    self._inflight = []
+                written += len(batch) - len(failed)
+                if failed:
+                    self._failures += 1
+                    backoff = min(self._flush_interval * 2**self._failures, self._max_backoff)
+                    self._retry_at = time.monotonic() + backoff
+                    return written
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stop.is_set():
+            self._stop.wait(min(self._flush_interval, 0.05))
+            now = time.monotonic()
+            if now < self._retry_at:
+                continue
+            if now - last_flush >= self._flush_interval or self._queue.qsize() >= self._batch_size:
+                self.flush()
+                last_flush = time.monotonic()
+        self.flush()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Stop the flusher thread and write out anything still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+        if self._retry:
+            logger.error("Dropping %d buffered events that could not be written", len(self._retry))
+            self._retry = []
+
+
+_buffer: Optional[EventBuffer] = None
+
+
+def start_buffer(session_factory: Callable[[], Session]) -> Optional[EventBuffer]:
+    """Start the write-behind buffer when ``event_durability`` is "buffered"."""
+    global _buffer
+    if settings.event_durability != DURABILITY_BUFFERED:
+        return None
+    if _buffer is None:
+        _buffer = EventBuffer(
+            session_factory,
+            maxsize=settings.event_queue_size,
+            batch_size=settings.event_flush_batch,
+            flush_interval=settings.event_flush_interval,
+        )
+        _buffer.start()
+    return _buffer
+
+
+def stop_buffer() -> None:
+    global _buffer
+    if _buffer is not None:
+        _buffer.stop()
+        _buffer = None
+
+
+def record_event(
+    db: Session,
+    user_id: int,
+    event_type: str,
+    payload: dict,
+    ts: Optional[datetime] = None,
+) -> None:
+    """Log an event, write-behind when buffering is on.
+
+    In sync mode (or when the buffer is full) the row joins the caller's
+    transaction instead.
+    """
+    row = {
+        "user_id": user_id,
+        "ts": ts or datetime.utcnow(),
+        "event_type": event_type,
+        "payload_json": payload,
+    }
+    if _buffer is not None and _buffer.offer(row):
+        return
+    db.add(EventLog(**row))
+
+
+def pending_events(user_id: int, event_types: Iterable[str]) -> list[EventLog]:
+    """Events accepted by :func:`record_event` but not yet in the database."""
+    if _buffer is None:
+        return []
+    return _buffer.pending(user_id, event_types)
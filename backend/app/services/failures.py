@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import tuple_, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import dialect_insert
+from ..models import EventLog, FailureStats, NodeType
+
+# Scores are stored with the time they were last brought up to date; decay
+# is applied lazily. ``score_key`` is log2(score) shifted by the half-lives
+# elapsed since EPOCH, which is the same for every row at any instant, so
+# ordering by it ranks rows by their current score without touching them.
+EPOCH = datetime(2020, 1, 1)
+SKIP_WEIGHT = 1.0
+COMPLETION_CREDIT = 1.0
+
+
+class Outcome(NamedTuple):
+    node_type: NodeType
+    node_id: int
+    skipped: bool
+    ts: datetime
+
+
+class Struggling(NamedTuple):
+    node_type: NodeType
+    node_id: int
+    score: float
+
+
+def _half_lives(ts: datetime) -> float:
+    return (ts - EPOCH).total_seconds() / (settings.failure_half_life_days * 86400)
+
+
+def current_score(stats: Optional[FailureStats], now: Optional[datetime] = None) -> float:
+    if stats is None or not stats.score or stats.score_updated_at is None:
+        return 0.0
+    elapsed = _half_lives(now or datetime.utcnow()) - _half_lives(stats.score_updated_at)
+    return stats.score * 0.5 ** max(elapsed, 0.0)
+
+
+def _apply(stats: FailureStats, delta: float, ts: datetime) -> None:
+    """Add ``delta`` as of ``ts`` in O(1); late events are decayed to the stored time."""
+    updated_at = stats.score_updated_at or ts
+    ref = max(ts, updated_at)
+    score = current_score(stats, ref) + delta * 0.5 ** (_half_lives(ref) - _half_lives(ts))
+    score = max(score, 0.0)
+    stats.score = score
+    stats.score_updated_at = ref
+    stats.score_key = math.log2(score) + _half_lives(ref) if score > 0 else None
+
+
+def _locked(
+    db: Session, user_id: int, keys: Iterable[tuple[NodeType, int]]
+) -> dict[tuple[NodeType, int], FailureStats]:
+    """The nodes' stats rows, locked for update where the backend supports it."""
+    rows = (
+        db.query(FailureStats)
+        .filter(
+            FailureStats.user_id == user_id,
+            tuple_(FailureStats.node_type, FailureStats.node_id).in_(list(keys)),
+        )
+        .with_for_update()
+    )
+    return {(row.node_type, row.node_id): row for row in rows}
+
+
+def _new_stats(user_id: int, node_type: NodeType, node_id: int) -> FailureStats:
+    return FailureStats(user_id=user_id, node_type=node_type, node_id=node_id, rolling_fail_count=0, score=0.0)
+
+
+def _skipped(stats: FailureStats, ts: datetime) -> None:
+    stats.rolling_fail_count += 1
+    stats.last_failed_at = ts
+    _apply(stats, SKIP_WEIGHT, ts)
+
+
+def _completed(stats: FailureStats, ts: datetime) -> None:
+    stats.rolling_fail_count = 0
+    stats.last_failed_at = None
+    _apply(stats, -COMPLETION_CREDIT, ts)
+
+
+def _insert_new(
+    db: Session, user_id: int, fresh: dict[tuple[NodeType, int], FailureStats]
+) -> set[tuple[NodeType, int]]:
+    """Insert rows built in memory; returns the keys another transaction created first."""
+    if not fresh:
+        return set()
+    columns = [column.key for column in FailureStats.__table__.columns if column.key != "id"]
+    inserted = db.execute(
+        dialect_insert(db, FailureStats)
+        .values([{key: getattr(stats, key) for key in columns} for stats in fresh.values()])
+        .on_conflict_do_nothing(index_elements=["user_id", "node_type", "node_id"])
+        .returning(FailureStats.node_type, FailureStats.node_id)
+    )
+    return set(fresh) - set(inserted.tuples())
+
+
+def _fold(
+    user_id: int,
+    outcomes: list[Outcome],
+    rows: dict[tuple[NodeType, int], FailureStats],
+    fresh: Optional[dict[tuple[NodeType, int], FailureStats]],
+) -> None:
+    """Apply ``outcomes`` in order; skips of unknown nodes start rows in ``fresh``."""
+    for outcome in outcomes:
+        key = (outcome.node_type, outcome.node_id)
+        row = rows.get(key)
+        if row is None and fresh is not None:
+            row = fresh.get(key)
+            if row is None and outcome.skipped:
+                row = fresh[key] = _new_stats(user_id, *key)
+        if row is None:
+            continue
+        if outcome.skipped:
+            _skipped(row, outcome.ts)
+        else:
+            _completed(row, outcome.ts)
+
+
+def record_skip(db: Session, user_id: int, node_type: NodeType, node_id: int, ts: Optional[datetime] = None) -> None:
+    record_outcomes(db, user_id, [Outcome(node_type, node_id, True, ts or datetime.utcnow())])
+
+
+def record_completion(
+    db: Session, user_id: int, node_type: NodeType, node_id: int, ts: Optional[datetime] = None
+) -> None:
+    record_outcomes(db, user_id, [Outcome(node_type, node_id, False, ts or datetime.utcnow())])
+
+
+def record_outcomes(db: Session, user_id: int, outcomes: Iterable[Outcome]) -> None:
+    """Apply many skips/completions in order.
+
+    Existing rows are read (and locked on PostgreSQL) in one query; rows for
+    newly failing nodes are inserted with ``ON CONFLICT DO NOTHING``, and if
+    a concurrent writer created one first its outcomes are replayed onto
+    that row instead, so no update is lost and no insert fails.
+    """
+    outcomes = list(outcomes)
+    if not outcomes:
+        return
+    keys = {(outcome.node_type, outcome.node_id) for outcome in outcomes}
+    fresh: dict[tuple[NodeType, int], FailureStats] = {}
+    _fold(user_id, outcomes, _locked(db, user_id, keys), fresh)
+    lost = _insert_new(db, user_id, fresh)
+    if lost:
+        replay = [outcome for outcome in outcomes if (outcome.node_type, outcome.node_id) in lost]
+        _fold(user_id, replay, _locked(db, user_id, lost), None)
+
+
+def scores_for(
+    db: Session, user_id: int, keys: Iterable[tuple[NodeType, int]], now: Optional[datetime] = None
+) -> dict[tuple[NodeType, int], float]:
+    """Current scores for several nodes in one query; nodes without stats are left out."""
+    wanted = list(set(keys))
+    if not wanted:
+        return {}
+    rows = db.query(FailureStats).filter(
+        FailureStats.user_id == user_id,
+        tuple_(FailureStats.node_type, FailureStats.node_id).in_(wanted),
+    )
+    return {(row.node_type, row.node_id): current_score(row, now) for row in rows}
+
+
+def top_struggling(
+    db: Session, user_id: int, limit: int = 5, now: Optional[datetime] = None
+) -> list[Struggling]:
+    """The user's highest current failure scores, read off the (user_id, score_key) index."""
+    rows = (
+        db.query(FailureStats)
+        .filter(FailureStats.user_id == user_id, FailureStats.score_key.isnot(None))
+        .order_by(FailureStats.score_key.desc())
+        .limit(limit)
+    )
+    return [Struggling(row.node_type, row.node_id, current_score(row, now)) for row in rows]
+
+
+def backfill_scores(db: Session) -> int:
+    """Recompute every failure score from the plan skip/complete event history.
+
+    One streaming pass over the log folds events per node in time order;
+    the results are written back with bulk statements. Returns the number
+    of nodes scored.
+    """
+    folded: dict[tuple[int, NodeType, int], FailureStats] = {}
+    events = (
+        db.query(EventLog.user_id, EventLog.ts, EventLog.event_type, EventLog.payload_json)
+        .filter(EventLog.event_type.in_(("plan_skip", "plan_complete")))
+        .order_by(EventLog.ts, EventLog.id)
+        .yield_per(1000)
+    )
+    for user_id, ts, event_type, payload in events:
+        key = (user_id, NodeType(payload["node_type"]), payload["node_id"])
+        stats = folded.get(key)
+        if stats is None:
+            if event_type != "plan_skip":
+                continue
+            stats = folded[key] = FailureStats(score=0.0)
+        _apply(stats, SKIP_WEIGHT if event_type == "plan_skip" else -COMPLETION_CREDIT, ts)
+
+    existing = {
+        (row.user_id, row.node_type, row.node_id): row.id
+        for row in db.query(FailureStats.id, FailureStats.user_id, FailureStats.node_type, FailureStats.node_id)
+    }
+    updates = []
+    for key, stats in folded.items():
+        values = {"score": stats.score, "score_updated_at": stats.score_updated_at, "score_key": stats.score_key}
+        if key in existing:
+            updates.append({"id": existing.pop(key), **values})
+        else:
+            user_id, node_type, node_id = key
+            db.add(FailureStats(user_id=user_id, node_type=node_type, node_id=node_id, rolling_fail_count=0, **values))
+    # Nodes with no skips in the log have nothing to decay.
+    updates.extend({"id": row_id, "score": 0.0, "score_updated_at": None, "score_key": None} for row_id in existing.values())
+    if updates:
+        db.execute(update(FailureStats), updates)
+    db.commit()
+    return len(folded)
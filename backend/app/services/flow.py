@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from typing import Iterable
 
+from sqlalchemy import or_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
 
+from .. import tracing
 from ..models import (
     DayPlan,
     EventLog,
@@ -12,6 +16,9 @@ from ..models import (
     PlanItem,
     PlanStatus,
 )
+from . import events, streaks
+from . import gamification as gamification_service
+from .scheduler import PlannedItem
 
 
 def compute_points(
@@ -49,6 +56,54 @@ def compute_points(
     return points
 
 
+def project_flow_points(
+    items: Iterable[PlannedItem],
+    *,
+    day: date | None = None,
+    day_start: time = time(hour=8),
+    minutes_per_item: int = 30,
+) -> int:
+    """Project the flow score if every item is done in order at its earliest slot.
+
+    ``items`` are scheduler results rather than rows, so no session is needed;
+    each is marked done with ``_replace`` before :func:`compute_points` reads it.
+    """
+    clock = datetime.combine(day or date.today(), day_start)
+    previous_completion: datetime | None = None
+    score = 0
+    for item in items:
+        if item.scheduled_window_start:
+            window_start = datetime.combine(clock.date(), item.scheduled_window_start)
+            clock = max(clock, window_start)
+        clock += timedelta(minutes=minutes_per_item)
+        score += compute_points(
+            item._replace(status=PlanStatus.DONE),
+            clock,
+            previous_completion=previous_completion,
+            anchor_completed_at=None,
+        )
+        previous_completion = clock
+    return score
+
+
+def _item_events(db: Session, user_id: int, item_ids: list[int], event_types: list[str]) -> list[EventLog]:
+    """The user's events of ``event_types`` logged for any of the plan items."""
+    if not item_ids:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        # Containment tests are answered by the GIN index on the payload.
+        payload = type_coerce(EventLog.payload_json, JSONB)
+        for_items = or_(*(payload.contains({"plan_item_id": item_id}) for item_id in item_ids))
+    else:
+        for_items = EventLog.payload_json["plan_item_id"].as_integer().in_(item_ids)
+    return (
+        db.query(EventLog)
+        .filter(EventLog.user_id == user_id, EventLog.event_type.in_(event_types), for_items)
+        .all()
+    )
+
+
+@tracing.traced("flow.update_flow_score")
 def update_flow_score(db: Session, day_plan: DayPlan) -> None:
     """Recompute flow score and update gamification tracker."""
     plan_items = (
@@ -62,16 +117,11 @@ def update_flow_score(db: Session, day_plan: DayPlan) -> None:
     anchor_completion: dict[int, datetime] = {}
     score = 0
 
-    events = (
-        db.query(EventLog)
-        .filter(
-            EventLog.user_id == day_plan.user_id,
-            EventLog.event_type.in_(["plan_complete", "plan_skip"]),
-        )
-        .all()
-    )
+    event_types = ["plan_complete", "plan_skip"]
+    logged = _item_events(db, day_plan.user_id, [item.id for item in plan_items], event_types)
+    logged.extend(events.pending_events(day_plan.user_id, event_types))
     events_by_plan_item: dict[int, list[EventLog]] = {}
-    for evt in events:
+    for evt in logged:
         payload = evt.payload_json or {}
         plan_item_id = payload.get("plan_item_id")
         if plan_item_id:
@@ -97,26 +147,27 @@ def update_flow_score(db: Session, day_plan: DayPlan) -> None:
             anchor_completion[item.node_id] = completed_at
 
     day_plan.flow_score = score
-    gamification = (
-        db.query(Gamification)
-        .filter(Gamification.user_id == day_plan.user_id, Gamification.date == day_plan.date)
-        .first()
-    )
-    if not gamification:
-        gamification = Gamification(
-            user_id=day_plan.user_id,
-            date=day_plan.date,
-            streak_days=0,
-            xp=0,
-            flow_streak=0,
+    has_completion = any(item.status == PlanStatus.DONE for item in plan_items)
+    if score <= 0 and not has_completion:
+        # Nothing earned: only touch an existing row, never create one.
+        gamification = (
+            db.query(Gamification)
+            .filter(Gamification.user_id == day_plan.user_id, Gamification.date == day_plan.date)
+            .first()
         )
-        db.add(gamification)
-
-    if score > 0:
-        gamification.xp += score
-        if score >= 10:
-            gamification.flow_streak += 1
     else:
-        gamification.flow_streak = 0
+        gamification = gamification_service.ensure_row(db, day_plan.user_id, day_plan.date)
+
+    if gamification is not None:
+        if has_completion:
+            streaks.extend_streak(db, gamification)
+
+        if score > 0:
+            gamification.xp += score
+            if score >= 10:
+                gamification.flow_streak += 1
+        else:
+            gamification.flow_streak = 0
 
     db.commit()
+    gamification_service.invalidate(day_plan.user_id, day_plan.date)
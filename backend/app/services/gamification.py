@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from ..cache import TTLCache
+from ..config import settings
+from ..database import dialect_insert
+from ..models import Gamification
+from ..schemas import Gamification as GamificationSchema
+
+_snapshots: TTLCache[GamificationSchema] = TTLCache(ttl=settings.gamification_cache_ttl)
+
+
+def get_snapshot(db: Session, user_id: int, target_date: date) -> GamificationSchema:
+    """Read-only gamification for a day; a zeroed default when no row exists yet."""
+    key = (user_id, target_date)
+    cached = _snapshots.get(key)
+    if cached is not None:
+        return cached
+
+    row = (
+        db.query(Gamification.date, Gamification.streak_days, Gamification.xp, Gamification.flow_streak)
+        .filter(Gamification.user_id == user_id, Gamification.date == target_date)
+        .first()
+    )
+    if row:
+        snapshot = GamificationSchema.model_construct(**row._asdict())
+    else:
+        snapshot = GamificationSchema.model_construct(date=target_date, streak_days=0, xp=0, flow_streak=0)
+    _snapshots.set(key, snapshot)
+    return snapshot
+
+
+def ensure_row(db: Session, user_id: int, target_date: date) -> Gamification:
+    """Return the day's row, creating it if needed, in one upsert round trip."""
+    stmt = dialect_insert(db, Gamification).values(
+        user_id=user_id, date=target_date, streak_days=0, xp=0, flow_streak=0
+    )
+    # The no-op update makes RETURNING yield the row when it already exists.
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "date"], set_={"user_id": stmt.excluded.user_id}
+    ).returning(Gamification)
+    return db.scalars(stmt, execution_options={"populate_existing": True}).one()
+
+
+def invalidate(user_id: int, target_date: date) -> None:
+    _snapshots.pop((user_id, target_date))
+
+
+def clear_cache() -> None:
+    _snapshots.clear()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import IdempotencyKey
+
+
+class KeyReused(Exception):
+    """An Idempotency-Key was replayed against a different endpoint."""
+
+
+def lookup(db: Session, user_id: int, key: str, endpoint: str) -> Optional[dict]:
+    """Stored response for an unexpired key, or None if the request is new."""
+    record = (
+        db.query(IdempotencyKey)
+        .filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at > datetime.utcnow(),
+        )
+        .first()
+    )
+    if record is None:
+        return None
+    if record.endpoint != endpoint:
+        raise KeyReused(f"Idempotency-Key already used for {record.endpoint}")
+    return record.response_json
+
+
+def remember(db: Session, user_id: int, key: str, endpoint: str, response: dict) -> None:
+    """Stage the key with its response in the caller's transaction.
+
+    An expired record for the same key is replaced; a live one makes the
+    commit fail on ``uq_idempotency_key``, which callers treat as a replay.
+    """
+    now = datetime.utcnow()
+    db.execute(
+        delete(IdempotencyKey)
+        .where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at <= now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.add(
+        IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            endpoint=endpoint,
+            response_json=response,
+            created_at=now,
+            expires_at=now + timedelta(seconds=settings.idempotency_ttl),
+        )
+    )
+
+
+def purge_expired(db: Session) -> int:
+    result = db.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.expires_at <= datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import dialect_insert
+from ..models import JobLease, JobRun
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+SessionFactory = Callable[[], Session]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def schedule_slot(now: datetime, period: timedelta, offset: timedelta = timedelta(0)) -> datetime:
+    """The fire time nearest ``now`` of a job run every ``period``, ``offset`` past the boundary.
+
+    Workers whose clocks or scheduler wake-ups straddle the boundary still
+    agree on the slot, up to half a period apart.
+    """
+    base = _EPOCH + offset
+    return base + round((now - base) / period) * period
+
+
+def acquire_lease(db: Session, name: str, owner: str, ttl: timedelta) -> bool:
+    """Take (or renew) the named lease if it is free, expired or already ours."""
+    now = datetime.utcnow()
+    db.execute(
+        dialect_insert(db, JobLease)
+        .values(name=name, owner=owner, acquired_at=now, heartbeat_at=now, expires_at=now + ttl)
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    result = db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, or_(JobLease.owner == owner, JobLease.expires_at < now))
+        .values(owner=owner, heartbeat_at=now, expires_at=now + ttl)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def heartbeat(db: Session, name: str, owner: str, ttl: timedelta) -> bool:
+    """Extend a lease we hold; returns False if it was lost to another worker."""
+    now = datetime.utcnow()
+    result = db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, JobLease.owner == owner)
+        .values(heartbeat_at=now, expires_at=now + ttl)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def release_lease(db: Session, name: str, owner: str) -> None:
+    db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, JobLease.owner == owner)
+        .values(expires_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, session_factory: SessionFactory, name: str, owner: str, ttl: timedelta) -> None:
+        super().__init__(name=f"lease-heartbeat-{name}", daemon=True)
+        self._session_factory = session_factory
+        self._lease = name
+        self._owner = owner
+        self._ttl = ttl
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        interval = self._ttl.total_seconds() / 3
+        while not self._stop_event.wait(interval):
+            session = self._session_factory()
+            try:
+                if not heartbeat(session, self._lease, self._owner, self._ttl):
+                    logger.warning("Lost lease %s while the job was still running", self._lease)
+                    return
+            except Exception:
+                logger.exception("Heartbeat for lease %s failed", self._lease)
+            finally:
+                session.close()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def run_exclusive(
+    session_factory: SessionFactory,
+    name: str,
+    fn: Callable[[], None],
+    *,
+    slot: Optional[datetime] = None,
+    period: timedelta = timedelta(minutes=1),
+    offset: timedelta = timedelta(0),
+    owner: str = WORKER_ID,
+    ttl: Optional[timedelta] = None,
+) -> bool:
+    """Run ``fn`` in at most one worker for the given schedule slot.
+
+    The lease keeps concurrent workers out while the job runs (with a
+    heartbeat so long runs keep it), and the unique ``(job_name, slot)`` run
+    record stops a late worker from repeating a slot that already ran.
+    Without an explicit ``slot`` it is the job's scheduled fire time, from
+    its ``period`` and ``offset`` (see :func:`schedule_slot`). Returns True
+    if this worker ran the job.
+    """
+    ttl = ttl or timedelta(seconds=settings.job_lease_ttl)
+    slot = slot or schedule_slot(datetime.utcnow(), period, offset)
+
+    session = session_factory()
+    try:
+        if not acquire_lease(session, name, owner, ttl):
+            return False
+        run = JobRun(job_name=name, slot=slot, owner=owner, status="running", started_at=datetime.utcnow())
+        session.add(run)
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            release_lease(session, name, owner)
+            return False
+
+        beat = _Heartbeat(session_factory, name, owner, ttl)
+        beat.start()
+        try:
+            fn()
+        except Exception:
+            run.status = "failed"
+            run.error = traceback.format_exc()
+            logger.exception("Scheduled job %s failed", name)
+        else:
+            run.status = "succeeded"
+        finally:
+            beat.stop()
+            run.finished_at = datetime.utcnow()
+            session.commit()
+            release_lease(session, name, owner)
+        return True
+    finally:
+        session.close()
+
+
+def exclusive(
+    session_factory: SessionFactory,
+    name: str,
+    fn: Callable[[], None],
+    period: timedelta,
+    offset: timedelta = timedelta(0),
+) -> Callable[[], None]:
+    """Wrap ``fn`` as a scheduler job, fired every ``period``, that only one worker runs per slot."""
+
+    def job() -> None:
+        run_exclusive(session_factory, name, fn, period=period, offset=offset)
+
+    job.__name__ = f"exclusive_{name}"
+    return job
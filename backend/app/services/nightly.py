@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
+from typing import Callable, Iterable, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import User
+from . import jobs, plan_cache, review
+
+logger = logging.getLogger(__name__)
+
+# The nightly tick fires this often so zones with :30/:45 offsets are covered.
+TICK_MINUTES = 15
+
+
+def _zone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Unknown user timezone %r, using %s", name, settings.timezone)
+        return ZoneInfo(settings.timezone)
+
+
+def due_timezones(timezones: Iterable[str], now: datetime, hour: int) -> list[tuple[str, date]]:
+    """Timezones whose local clock is in the ``hour``:00 tick at ``now`` (UTC-aware).
+
+    Returns each zone with its local date, so per-user dates follow the
+    user's calendar rather than the server's.
+    """
+    due: list[tuple[str, date]] = []
+    for name in timezones:
+        local = now.astimezone(_zone(name))
+        if local.hour == hour and local.minute < TICK_MINUTES:
+            due.append((name, local.date()))
+    return due
+
+
+def run_daily_reviews(db: Session, tz: str, local_date: date) -> int:
+    """Generate the daily review for every user in ``tz``; returns reviews written."""
+    written = 0
+    user_ids = [user_id for (user_id,) in db.query(User.id).filter(User.tz == tz)]
+    for user_id in user_ids:
+        try:
+            review.generate_daily_summary(db, user_id, local_date)
+        except ValueError:
+            continue
+        written += 1
+    return written
+
+
+def _tick_slot(now: datetime) -> datetime:
+    slot = now.astimezone(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+    return slot - timedelta(minutes=slot.minute % TICK_MINUTES)
+
+
+def _run_batch(
+    session_factory: jobs.SessionFactory, fn: Callable[[Session, str, date], int], tz: str, local_date: date
+) -> None:
+    db = session_factory()
+    try:
+        fn(db, tz, local_date)
+    finally:
+        db.close()
+
+
+def _run_due(
+    session_factory: jobs.SessionFactory,
+    job: str,
+    hour: int,
+    fn: Callable[[Session, str, date], int],
+    now: Optional[datetime],
+) -> list[str]:
+    """Run ``fn`` for every timezone whose local clock reaches ``hour`` this tick.
+
+    Each timezone is its own leased job, so batches are spread over the day
+    and only one worker processes a given zone per tick.
+    """
+    now = now or datetime.now(timezone.utc)
+    session = session_factory()
+    try:
+        timezones = [tz for (tz,) in session.query(User.tz).distinct()]
+    finally:
+        session.close()
+
+    ran: list[str] = []
+    for tz, local_date in due_timezones(timezones, now, hour):
+        batch = partial(_run_batch, session_factory, fn, tz, local_date)
+        if jobs.run_exclusive(session_factory, f"{job}:{tz}", batch, slot=_tick_slot(now)):
+            ran.append(tz)
+    return ran
+
+
+def run_due_reviews(session_factory: jobs.SessionFactory, now: Optional[datetime] = None) -> list[str]:
+    """Run the evening review for every timezone whose local evening starts now."""
+    return _run_due(session_factory, "daily_review", settings.daily_review_hour, run_daily_reviews, now)
+
+
+def run_due_prewarm(session_factory: jobs.SessionFactory, now: Optional[datetime] = None) -> list[str]:
+    """Pre-generate tomorrow's plans in every timezone entering its off-peak hour."""
+    return _run_due(session_factory, "plan_prewarm", settings.prewarm_hour, plan_cache.warm_users, now)
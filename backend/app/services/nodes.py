@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from ..models import Node, NodeType
+from .scheduler import NodeKey
+
+
+def labels(db: Session, user_id: int, keys: Iterable[NodeKey]) -> dict[NodeKey, str]:
+    """Labels for any mix of node types in one indexed query; unknown keys are left out."""
+    wanted = list(set(keys))
+    if not wanted:
+        return {}
+    rows = db.query(Node.node_type, Node.ref_id, Node.label).filter(
+        Node.user_id == user_id,
+        tuple_(Node.node_type, Node.ref_id).in_(wanted),
+    )
+    return {(node_type, ref_id): label for node_type, ref_id, label in rows}
+
+
+def label(db: Session, user_id: int, node_type: NodeType, node_id: int) -> Optional[str]:
+    return labels(db, user_id, [(node_type, node_id)]).get((node_type, node_id))
+
+
+def list_nodes(db: Session, user_id: int) -> list[dict]:
+    """All of a user's nodes as ``{"id", "type", "label"}`` dicts, ids being per-type ids."""
+    rows = db.query(Node.ref_id, Node.node_type, Node.label).filter(Node.user_id == user_id).order_by(Node.id)
+    return [{"id": ref_id, "type": node_type, "label": text} for ref_id, node_type, text in rows]
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Select, and_, delete, literal, or_, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from ..config import settings
+from ..models import NODE_MODELS, DayPlan, Edge, FailureStats, Node, NodeRank, PlanItem, PlanItemDependency
+from . import progress, sync
+
+# Rows keyed by a (node_type, node_id) pair, collected the same way.
+_NODE_REFERENCES = (
+    ("plan_items", PlanItem, PlanItem.node_type, PlanItem.node_id),
+    ("failure_stats", FailureStats, FailureStats.node_type, FailureStats.node_id),
+    ("node_ranks", NodeRank, NodeRank.node_type, NodeRank.node_id),
+    ("nodes", Node, Node.node_type, Node.ref_id),
+)
+
+
+def _live_nodes():
+    """Every existing (node_type, id), read from the node tables themselves.
+
+    The registry is not trusted here: it is exactly what a bulk delete or a
+    database created before it existed can leave out of step.
+    """
+    node_type = Node.node_type.type
+    return union_all(
+        *(
+            select(literal(kind, node_type).label("node_type"), model.id.label("ref_id"))
+            for model, kind in NODE_MODELS.items()
+        )
+    ).subquery("live_nodes")
+
+
+def _orphan_edges(live) -> Select:
+    src, dst = aliased(live), aliased(live)
+    return (
+        select(Edge.id)
+        .outerjoin(src, and_(src.c.node_type == Edge.from_type, src.c.ref_id == Edge.from_id))
+        .outerjoin(dst, and_(dst.c.node_type == Edge.to_type, dst.c.ref_id == Edge.to_id))
+        .where(or_(src.c.ref_id.is_(None), dst.c.ref_id.is_(None)))
+    )
+
+
+def _orphan_refs(live, model, type_column, id_column) -> Select:
+    return (
+        select(model.id)
+        .outerjoin(live, and_(live.c.node_type == type_column, live.c.ref_id == id_column))
+        .where(live.c.ref_id.is_(None))
+    )
+
+
+def _orphan_plan_items(live, today: date) -> Select:
+    """Orphaned items of today's and later plans; past plans are history and stay as they are."""
+    return (
+        _orphan_refs(live, PlanItem, PlanItem.node_type, PlanItem.node_id)
+        .join(DayPlan, DayPlan.id == PlanItem.dayplan_id)
+        .where(DayPlan.date >= today)
+    )
+
+
+def _release_removed_items(db: Session, ids: list[int]) -> None:
+    """Count unresolved removed items as met prerequisites, as if they were skipped."""
+    unresolved = db.execute(
+        select(DayPlan.user_id, PlanItem.id)
+        .join(DayPlan, DayPlan.id == PlanItem.dayplan_id)
+        .where(PlanItem.id.in_(ids), PlanItem.status.not_in(progress.RESOLVED))
+    ).all()
+    by_user: dict[int, list[int]] = defaultdict(list)
+    for user_id, item_id in unresolved:
+        by_user[user_id].append(item_id)
+    for user_id, item_ids in by_user.items():
+        progress.release_dependents(db, user_id, item_ids)
+
+
+def _record_deletes(db: Session, model, ids: list[int]) -> None:
+    """Log removed synced rows for ``/sync`` (the flush hook does not see Core deletes)."""
+    if model is Edge:
+        owners = select(Edge.user_id, Edge.id).where(Edge.id.in_(ids))
+    elif model is PlanItem:
+        owners = (
+            select(DayPlan.user_id, PlanItem.id)
+            .join(DayPlan, DayPlan.id == PlanItem.dayplan_id)
+            .where(PlanItem.id.in_(ids))
+        )
+    else:
+        return
+    by_user: dict[int, list[int]] = defaultdict(list)
+    for user_id, row_id in db.execute(owners):
+        by_user[user_id].append(row_id)
+    for user_id, row_ids in by_user.items():
+        sync.record(db, user_id, sync.ENTITIES[model], row_ids, op=sync.DELETE)
+
+
+def _remove(db: Session, model, ids: list[int]) -> None:
+    _record_deletes(db, model, ids)
+    if model is PlanItem:
+        _release_removed_items(db, ids)
+        db.execute(
+            delete(PlanItemDependency).where(
+                or_(PlanItemDependency.parent_item_id.in_(ids), PlanItemDependency.child_item_id.in_(ids))
+            )
+        )
+    db.execute(delete(model).where(model.id.in_(ids)))
+
+
+def _drain(db: Session, model, query: Select, batch_size: int) -> int:
+    """Delete the ``model`` rows ``query`` selects, ``batch_size`` ids per transaction."""
+    removed = 0
+    while True:
+        ids = list(db.scalars(query.limit(batch_size)))
+        if not ids:
+            return removed
+        _remove(db, model, ids)
+        db.commit()
+        removed += len(ids)
+
+
+def collect_orphans(
+    db: Session,
+    batch_size: Optional[int] = None,
+    today: Optional[date] = None,
+) -> dict[str, int]:
+    """Remove rows that point at goals, systems, habits or tasks that no longer exist.
+
+    Orphans are found with anti-joins and deleted in bounded chunks, each in
+    its own short transaction, so a run never holds long write locks and an
+    interrupted run simply resumes next time. Plan items are only removed
+    from plans dated ``today`` or later, after releasing the items that
+    depended on them. Returns rows removed per table.
+    """
+    batch_size = batch_size or settings.orphan_batch_size
+    today = today or date.today()
+    live = _live_nodes()
+    report = {"edges": _drain(db, Edge, _orphan_edges(live), batch_size)}
+    for name, model, type_column, id_column in _NODE_REFERENCES:
+        if model is PlanItem:
+            query = _orphan_plan_items(live, today)
+        else:
+            query = _orphan_refs(live, model, type_column, id_column)
+        report[name] = _drain(db, model, query, batch_size)
+    return report
@@ -0,0 +1,152 @@
+"""Plan response cache and the nightly pre-warm of tomorrow's plans.
+
+Cached responses are tagged with the user's change sequence (see
+:mod:`.sync`) read before the content was loaded, so any later write to
+the user's plans or library turns the entry into a miss; nothing has to be
+invalidated explicitly. Pre-warmed plans remember the sequence their graph
+was read at: if the library changes before the user touches the plan, the
+first read regenerates it.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from ..cache import SingleFlight, TTLCache
+from ..config import settings
+from ..models import DayPlan, PlanItem, PlanStatus, User
+from ..schemas import DayPlan as DayPlanSchema, PlanItem as PlanItemSchema
+from . import scheduler, sync
+
+PLAN_FIELDS = [name for name in DayPlanSchema.model_fields if name != "items"]
+ITEM_FIELDS = list(PlanItemSchema.model_fields)
+LIBRARY_ENTITIES = ("habit", "task", "edge")
+
+logger = logging.getLogger(__name__)
+
+
+class CachedPlan(NamedTuple):
+    seq: int
+    # True when the content is a fresh generation, so /plan/generate may reuse it.
+    generated: bool
+    content: dict
+
+
+_plans: TTLCache[CachedPlan] = TTLCache(ttl=settings.plan_cache_ttl, maxsize=settings.plan_cache_size)
+_generate_flight: SingleFlight[dict] = SingleFlight()
+
+
+def _read_content(db: Session, plan_id: int) -> dict:
+    plan = db.query(*(getattr(DayPlan, name) for name in PLAN_FIELDS)).filter(DayPlan.id == plan_id).one()
+    items = (
+        db.query(*(getattr(PlanItem, name) for name in ITEM_FIELDS))
+        .filter(PlanItem.dayplan_id == plan_id)
+        .order_by(PlanItem.id)
+    )
+    content = {name: getattr(plan, name) for name in PLAN_FIELDS}
+    content["items"] = [{name: getattr(item, name) for name in ITEM_FIELDS} for item in items]
+    return content
+
+
+def _generate(db: Session, user_id: int, plan_date: date, prewarmed_seq: Optional[int] = None) -> dict:
+    plan = scheduler.generate_day_plan(db, user_id=user_id, target_date=plan_date)
+    if prewarmed_seq is not None:
+        # Bookkeeping only: a bulk update, so it does not bump the change sequence.
+        db.execute(update(DayPlan).where(DayPlan.id == plan.id).values(prewarmed_seq=prewarmed_seq))
+        db.commit()
+    seq = sync.current_seq(db, user_id) or 0
+    content = _read_content(db, plan.id)
+    _plans.set((user_id, plan_date), CachedPlan(seq=seq, generated=True, content=content))
+    return content
+
+
+def _generate_once(db: Session, user_id: int, plan_date: date) -> dict:
+    # Concurrent requests for the same plan (double clicks, reloads, reads of
+    # a stale pre-warm) share one generation.
+    return _generate_flight.do((user_id, plan_date), lambda: _generate(db, user_id, plan_date))
+
+
+def _is_stale_prewarm(db: Session, user_id: int, plan_id: int, prewarmed_seq: Optional[int]) -> bool:
+    if prewarmed_seq is None or not sync.changed_since(db, user_id, prewarmed_seq, LIBRARY_ENTITIES):
+        return False
+    acted_on = (
+        db.query(PlanItem.id)
+        .filter(
+            PlanItem.dayplan_id == plan_id,
+            PlanItem.status.in_((PlanStatus.IN_PROGRESS, PlanStatus.DONE, PlanStatus.SKIPPED)),
+        )
+        .first()
+    )
+    return acted_on is None
+
+
+def load_plan(db: Session, user_id: int, plan_date: date) -> Optional[dict]:
+    """The stored plan's response content, or None when there is no plan."""
+    seq = sync.current_seq(db, user_id) or 0
+    cached = _plans.get((user_id, plan_date))
+    if cached is not None and cached.seq == seq:
+        return cached.content
+
+    row = (
+        db.query(DayPlan.id, DayPlan.prewarmed_seq)
+        .filter(DayPlan.user_id == user_id, DayPlan.date == plan_date)
+        .first()
+    )
+    if row is None:
+        return None
+    if _is_stale_prewarm(db, user_id, row.id, row.prewarmed_seq):
+        return _generate_once(db, user_id, plan_date)
+    content = _read_content(db, row.id)
+    _plans.set((user_id, plan_date), CachedPlan(seq=seq, generated=False, content=content))
+    return content
+
+
+def generate_plan(db: Session, user_id: int, plan_date: date) -> dict:
+    """Generate the plan, reusing a cached generation if nothing changed since."""
+    cached = _plans.get((user_id, plan_date))
+    if cached is not None and cached.generated and cached.seq == (sync.current_seq(db, user_id) or 0):
+        return cached.content
+    return _generate_once(db, user_id, plan_date)
+
+
+def warm_users(db: Session, tz: str, local_date: date) -> int:
+    """Generate tomorrow's plan for the recently active users in ``tz``.
+
+    Plans that already exist for tomorrow are left alone, and a user whose
+    plan fails to generate is logged and skipped. Returns plans written.
+    """
+    tomorrow = local_date + timedelta(days=1)
+    active_since = local_date - timedelta(days=settings.prewarm_active_days)
+    user_ids = [
+        user_id
+        for (user_id,) in db.query(User.id)
+        .join(DayPlan, DayPlan.user_id == User.id)
+        .filter(User.tz == tz, DayPlan.date >= active_since)
+        .distinct()
+    ]
+    existing = {
+        user_id
+        for (user_id,) in db.query(DayPlan.user_id).filter(DayPlan.user_id.in_(user_ids), DayPlan.date == tomorrow)
+    }
+    warmed = 0
+    for user_id in user_ids:
+        if user_id in existing:
+            continue
+        try:
+            # The graph is read after this point, so later library edits count as changes.
+            _generate(db, user_id, tomorrow, prewarmed_seq=sync.current_seq(db, user_id) or 0)
+        except Exception:
+            db.rollback()
+            logger.exception("Pre-warming the %s plan of user %d failed", tomorrow, user_id)
+            continue
+        warmed += 1
+    return warmed
+
+
+def clear_cache() -> None:
+    _plans.clear()
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, case, func, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from .. import tracing
+from ..models import DayPlan, PlanItem, PlanItemDependency, PlanStatus
+from ..schemas import PlanBatchChange
+from . import events, failures, flow, idempotency, sync
+
+OK = {"status": "ok"}
+RESOLVED = {PlanStatus.DONE, PlanStatus.SKIPPED}
+
+
+class VersionConflict(Exception):
+    """The plan item changed since the version the caller based its update on."""
+
+
+def _load_item(db: Session, user_id: int, plan_item_id: int) -> PlanItem:
+    plan_item = (
+        db.query(PlanItem)
+        .join(DayPlan)
+        .filter(
+            PlanItem.id == plan_item_id,
+            DayPlan.user_id == user_id,
+        )
+        .first()
+    )
+    if not plan_item:
+        raise ValueError("Plan item not found")
+    return plan_item
+
+
+def _set_status(plan_item: PlanItem, status: PlanStatus, expected_version: Optional[int]) -> None:
+    if expected_version is not None and plan_item.version != expected_version:
+        raise VersionConflict(f"Plan item is at version {plan_item.version}, not {expected_version}")
+    plan_item.status = status
+
+
+@tracing.traced("progress.release_dependents")
+def release_dependents(db: Session, user_id: int, parent_ids: list[int]) -> None:
+    """Decrement the unmet-prerequisite counters of the items' children.
+
+    Callers pass only items moving to DONE or SKIPPED for the first time
+    (or removed while still unresolved), so a later DONE -> SKIPPED change
+    does not count twice. Children whose counter reaches zero become READY.
+    """
+    if not parent_ids:
+        return
+    released = db.execute(
+        select(PlanItemDependency.child_item_id, func.count())
+        .where(PlanItemDependency.parent_item_id.in_(parent_ids))
+        .group_by(PlanItemDependency.child_item_id)
+    ).all()
+    by_count: dict[int, list[int]] = defaultdict(list)
+    for child_id, count in released:
+        by_count[count].append(child_id)
+
+    ready = literal(PlanStatus.READY, PlanItem.status.type)
+    for count, children in by_count.items():
+        db.execute(
+            update(PlanItem)
+            .where(PlanItem.id.in_(children))
+            .values(
+                remaining_deps=PlanItem.remaining_deps - count,
+                status=case(
+                    (and_(PlanItem.remaining_deps <= count, PlanItem.status == PlanStatus.PLANNED), ready),
+                    else_=PlanItem.status,
+                ),
+                version=PlanItem.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+    sync.record(db, user_id, "plan_item", [child_id for child_id, _ in released])
+
+
+def _record_status_event(
+    db: Session, user_id: int, plan_item: PlanItem, status: PlanStatus, ts: datetime, reason: Optional[str] = None
+) -> None:
+    payload = {
+        "plan_item_id": plan_item.id,
+        "node_type": plan_item.node_type,
+        "node_id": plan_item.node_id,
+    }
+    if status == PlanStatus.SKIPPED:
+        payload["reason"] = reason
+    event_type = "plan_complete" if status == PlanStatus.DONE else "plan_skip"
+    events.record_event(db, user_id, event_type, payload, ts=ts)
+
+
+def _flush(db: Session) -> None:
+    """Flush pending item updates, turning a failed version check into VersionConflict."""
+    try:
+        db.flush()
+    except StaleDataError as exc:
+        db.rollback()
+        raise VersionConflict("Plan item was updated concurrently") from exc
+
+
+def _commit(
+    db: Session, user_id: int, idempotency_key: Optional[str], endpoint: str, response: dict = OK
+) -> Optional[dict]:
+    """Commit the status change together with its idempotency record.
+
+    Returns the stored response when a concurrent retry with the same key
+    committed first; raises VersionConflict when the item was changed
+    concurrently (the version check is done by the ORM on flush).
+    """
+    if idempotency_key:
+        idempotency.remember(db, user_id, idempotency_key, endpoint, response)
+    try:
+        db.commit()
+    except StaleDataError as exc:
+        db.rollback()
+        raise VersionConflict("Plan item was updated concurrently") from exc
+    except IntegrityError:
+        db.rollback()
+        replay = idempotency.lookup(db, user_id, idempotency_key, endpoint) if idempotency_key else None
+        if replay is None:
+            raise
+        return replay
+    return None
+
+
+def complete_item(
+    db: Session,
+    user_id: int,
+    plan_item_id: int,
+    *,
+    ts: Optional[datetime] = None,
+    expected_version: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    plan_item = _load_item(db, user_id, plan_item_id)
+    if plan_item.status == PlanStatus.DONE:
+        # Already applied (e.g. a retry without a key): nothing to re-count.
+        return OK
+
+    previous_status = plan_item.status
+    _set_status(plan_item, PlanStatus.DONE, expected_version)
+    completion_ts = ts or datetime.utcnow()
+
+    _record_status_event(db, user_id, plan_item, PlanStatus.DONE, completion_ts)
+    failures.record_completion(db, user_id, plan_item.node_type, plan_item.node_id, ts=completion_ts)
+    if previous_status not in RESOLVED:
+        release_dependents(db, user_id, [plan_item.id])
+
+    replay = _commit(db, user_id, idempotency_key, "plan_complete")
+    if replay is not None:
+        return replay
+    flow.update_flow_score(db, plan_item.dayplan)
+    return OK
+
+
+def skip_item(
+    db: Session,
+    user_id: int,
+    plan_item_id: int,
+    *,
+    reason: Optional[str] = None,
+    expected_version: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    plan_item = _load_item(db, user_id, plan_item_id)
+    if plan_item.status == PlanStatus.SKIPPED:
+        return OK
+
+    previous_status = plan_item.status
+    _set_status(plan_item, PlanStatus.SKIPPED, expected_version)
+    if previous_status not in RESOLVED:
+        release_dependents(db, user_id, [plan_item.id])
+    skip_ts = datetime.utcnow()
+    _record_status_event(db, user_id, plan_item, PlanStatus.SKIPPED, skip_ts, reason=reason)
+    failures.record_skip(db, user_id, plan_item.node_type, plan_item.node_id, ts=skip_ts)
+
+    replay = _commit(db, user_id, idempotency_key, "plan_skip")
+    if replay is not None:
+        return replay
+    flow.update_flow_score(db, plan_item.dayplan)
+    return OK
+
+
+def apply_batch(
+    db: Session,
+    user_id: int,
+    changes: list[PlanBatchChange],
+    *,
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    """Apply queued completions and skips, in order, in one transaction.
+
+    Each change gets its own result (``ok``, ``not_found`` or ``conflict``)
+    instead of failing the batch. Failure stats are updated from one read,
+    dependents are released with set-based updates, and flow is recomputed
+    once per affected day plan after the commit.
+    """
+    items = {
+        item.id: item
+        for item in db.query(PlanItem)
+        .join(DayPlan)
+        .filter(PlanItem.id.in_({change.plan_item_id for change in changes}), DayPlan.user_id == user_id)
+    }
+    initial_status = {item_id: item.status for item_id, item in items.items()}
+    results: list[dict] = []
+    outcomes: list[failures.Outcome] = []
+    for change in changes:
+        plan_item = items.get(change.plan_item_id)
+        if plan_item is None:
+            results.append({"plan_item_id": change.plan_item_id, "status": "not_found"})
+            continue
+        status = PlanStatus.DONE if change.action == "complete" else PlanStatus.SKIPPED
+        if plan_item.status != status:
+            try:
+                _set_status(plan_item, status, change.version)
+            except VersionConflict:
+                results.append({"plan_item_id": change.plan_item_id, "status": "conflict"})
+                continue
+            ts = change.ts or datetime.utcnow()
+            _record_status_event(db, user_id, plan_item, status, ts, reason=change.reason)
+            outcomes.append(
+                failures.Outcome(plan_item.node_type, plan_item.node_id, status == PlanStatus.SKIPPED, ts)
+            )
+        results.append({"plan_item_id": change.plan_item_id, "status": "ok"})
+
+    # Write the items first, so a concurrent change surfaces here as a conflict
+    # and releasing (which bumps children's versions behind the ORM) sees them.
+    _flush(db)
+    failures.record_outcomes(db, user_id, outcomes)
+    changed = [item for item_id, item in items.items() if item.status != initial_status[item_id]]
+    plan_ids = {item.dayplan_id for item in changed}
+    release_dependents(
+        db,
+        user_id,
+        [item.id for item in changed if initial_status[item.id] not in RESOLVED and item.status in RESOLVED],
+    )
+
+    response = {"results": results}
+    replay = _commit(db, user_id, idempotency_key, "plan_batch", response)
+    if replay is not None:
+        return replay
+    for day_plan in db.query(DayPlan).filter(DayPlan.id.in_(plan_ids)).order_by(DayPlan.date):
+        flow.update_flow_score(db, day_plan)
+    return response
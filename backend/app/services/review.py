@@ -3,14 +3,48 @@ from __future__ import annotations
 from datetime import date, datetime, timedelta
 from typing import Optional
 
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from .. import tracing
+from ..database import dialect_insert
 from ..models import DayPlan, EventLog, PlanItem, PlanStatus, Review, ReviewType
 from ..schemas import CoachSuggestionAction, ReviewSummary
-from . import coach
+from . import coach, failures
+
+
+def _save(
+    db: Session,
+    user_id: int,
+    review_type: ReviewType,
+    start: date,
+    end: date,
+    summary: str,
+    tweaks: list[CoachSuggestionAction],
+) -> None:
+    """Store the review, replacing the generated text of an earlier run for the same range.
+
+    One upsert keyed on (user, type, range); a reflection the user already
+    wrote is kept.
+    """
+    stmt = dialect_insert(db, Review).values(
+        user_id=user_id,
+        date_range_start=start,
+        date_range_end=end,
+        type=review_type,
+        reflection_text=None,
+        ai_summary=summary,
+        ai_suggestions_json={"tweaks": [action.model_dump() for action in tweaks]},
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "type", "date_range_start", "date_range_end"],
+            set_={"ai_summary": stmt.excluded.ai_summary, "ai_suggestions_json": stmt.excluded.ai_suggestions_json},
+        )
+    )
+    db.commit()
 
 
+@tracing.traced("review.generate_daily_summary")
 def generate_daily_summary(db: Session, user_id: int, target_date: date) -> ReviewSummary:
     plan = (
         db.query(DayPlan)
@@ -47,18 +81,7 @@ def generate_daily_summary(db: Session, user_id: int, target_date: date) -> Revi
         "Notice skips? Reflect on energy and sequence alignment."
     )
 
-    db.add(
-        Review(
-            user_id=user_id,
-            date_range_start=target_date,
-            date_range_end=target_date,
-            type=ReviewType.DAILY,
-            reflection_text=None,
-            ai_summary=summary,
-            ai_suggestions_json={"tweaks": [action.model_dump() for action in tweaks]},
-        )
-    )
-    db.commit()
+    _save(db, user_id, ReviewType.DAILY, target_date, target_date, summary, tweaks)
 
     return ReviewSummary(
         summary=summary,
@@ -68,6 +91,7 @@ def generate_daily_summary(db: Session, user_id: int, target_date: date) -> Revi
     )
 
 
+@tracing.traced("review.generate_weekly_summary")
 def generate_weekly_summary(db: Session, user_id: int, ending_date: date) -> ReviewSummary:
     start_date = ending_date - timedelta(days=6)
     plans = (
@@ -91,23 +115,8 @@ def generate_weekly_summary(db: Session, user_id: int, ending_date: date) -> Rev
     average_flow = int(aggregate_flow / len(plans)) if plans else 0
 
     tweaks: list[CoachSuggestionAction] = []
-    # Identify nodes with most skips in the week.
-    skipped_counts = (
-        db.query(PlanItem.node_type, PlanItem.node_id, func.count(PlanItem.id))
-        .join(DayPlan)
-        .filter(
-            DayPlan.user_id == user_id,
-            DayPlan.date >= start_date,
-            DayPlan.date <= ending_date,
-            PlanItem.status == PlanStatus.SKIPPED,
-        )
-        .group_by(PlanItem.node_type, PlanItem.node_id)
-        .order_by(func.count(PlanItem.id).desc())
-        .limit(2)
-        .all()
-    )
-
-    for node_type, node_id, _ in skipped_counts:
+    # Coach the nodes with the highest decayed failure scores.
+    for node_type, node_id, _ in failures.top_struggling(db, user_id, limit=2):
         suggestion = coach.suggest_fixes(db, user_id, node_type, node_id)
         tweaks.extend(suggestion.actions[:2])
 
@@ -117,18 +126,7 @@ def generate_weekly_summary(db: Session, user_id: int, ending_date: date) -> Rev
         "Trends: double-down on high-flow windows and redesign the frequent skips."
     )
 
-    db.add(
-        Review(
-            user_id=user_id,
-            date_range_start=start_date,
-            date_range_end=ending_date,
-            type=ReviewType.WEEKLY,
-            reflection_text=None,
-            ai_summary=summary,
-            ai_suggestions_json={"tweaks": [action.model_dump() for action in tweaks]},
-        )
-    )
-    db.commit()
+    _save(db, user_id, ReviewType.WEEKLY, start_date, ending_date, summary, tweaks)
 
     return ReviewSummary(
         summary=summary,
@@ -1,39 +1,61 @@
 from __future__ import annotations
 
-from collections import defaultdict, deque
-from datetime import date, time
-from typing import Iterable
+import heapq
+from array import array
+from datetime import date, datetime, time
+from typing import Iterable, NamedTuple
 
+from sqlalchemy import delete, update
 from sqlalchemy.orm import Session
 
+from .. import tracing
 from ..config import settings
+from ..database import bulk_insert, dialect_insert
 from ..models import (
     DayPlan,
     Edge,
-    EventLog,
-    FailureStats,
     Habit,
     NodeType,
     PlanAnchor,
     PlanItem,
+    PlanItemDependency,
     PlanStatus,
     RelationType,
     Task,
     User,
 )
+from . import sync, workers
 
 # Tunables for heuristics
 DEFAULT_MORNING_WINDOW = (6, 11)
 DEFAULT_AFTERNOON_WINDOW = (11, 17)
 DEFAULT_EVENING_WINDOW = (17, 22)
 
+# Sentinel for "no soft window" in the minute arrays; sorts after any real time.
+NO_TIME = 24 * 60
+
+# Energy class bit flags stored per node.
+ENERGY_NONE = 0
+ENERGY_MORNING = 1
+ENERGY_EVENING = 2
+ENERGY_HIGH = 4
+
+NodeKey = tuple[NodeType, int]
+EdgeTuple = tuple[NodeType, int, NodeType, int, RelationType]
+
 
 def _time_to_minutes(value: time | None) -> int:
     if value is None:
-        return 24 * 60
+        return NO_TIME
     return value.hour * 60 + value.minute
 
 
+def _minutes_to_time(value: int) -> time | None:
+    if value >= NO_TIME:
+        return None
+    return time(hour=value // 60, minute=value % 60)
+
+
 def _preferred_window(energy_tag: str | None) -> tuple[int, int]:
     if not energy_tag:
         return DEFAULT_AFTERNOON_WINDOW
@@ -45,142 +67,355 @@ def _preferred_window(energy_tag: str | None) -> tuple[int, int]:
     return DEFAULT_AFTERNOON_WINDOW
 
 
+def _energy_class(energy_tag: str | None) -> int:
+    if not energy_tag:
+        return ENERGY_NONE
+    tag = energy_tag.lower()
+    energy = ENERGY_NONE
+    if "morning" in tag:
+        energy |= ENERGY_MORNING
+    if "evening" in tag or "night" in tag:
+        energy |= ENERGY_EVENING
+    if "high" in tag:
+        energy |= ENERGY_HIGH
+    return energy
+
+
 def _determine_energy_window(db: Session, user_id: int) -> tuple[int, int]:
     """Derive high-energy window from events or fallback settings."""
     # TODO: derive from EventLog analytics.
     return settings.scheduler_high_energy_window
 
 
-def _ensure_day_plan(db: Session, user_id: int, target_date: date) -> DayPlan:
-    plan = (
-        db.query(DayPlan).filter(DayPlan.user_id == user_id, DayPlan.date == target_date).first()
+def _ensure_day_plan(db: Session, user_id: int, target_date: date) -> tuple[int, int]:
+    """Return ``(plan_id, generation)``, creating the row if needed, in one upsert."""
+    stmt = dialect_insert(db, DayPlan).values(user_id=user_id, date=target_date, generation=0)
+    # The no-op update makes RETURNING yield the row when it already exists.
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "date"], set_={"user_id": stmt.excluded.user_id}
+    ).returning(DayPlan.id, DayPlan.generation)
+    plan_id, generation = db.execute(stmt).one()
+    db.commit()
+    return plan_id, generation
+
+
+def _write_plan(db: Session, user_id: int, plan_id: int, generation: int, result: PlanResult) -> bool:
+    """Replace the plan's items if nobody regenerated it since ``generation`` was read.
+
+    The generation bump is a compare-and-set, so a concurrent duplicate from
+    another process loses here and writes nothing. Items and their
+    dependency edges are written with bulk statements (``COPY`` on
+    PostgreSQL) and logged for ``/sync`` explicitly.
+    """
+    claimed = db.execute(
+        update(DayPlan)
+        .where(DayPlan.id == plan_id, DayPlan.generation == generation)
+        .values(generation=generation + 1, generated_at=datetime.utcnow(), prewarmed_seq=None)
+        .execution_options(synchronize_session=False)
     )
-    if plan:
-        plan.items.clear()
-        return plan
+    if claimed.rowcount != 1:
+        db.rollback()
+        return False
+
+    db.execute(
+        delete(PlanItemDependency)
+        .where(PlanItemDependency.dayplan_id == plan_id)
+        .execution_options(synchronize_session=False)
+    )
+    old_ids = list(
+        db.execute(
+            delete(PlanItem)
+            .where(PlanItem.dayplan_id == plan_id)
+            .returning(PlanItem.id)
+            .execution_options(synchronize_session=False)
+        ).scalars()
+    )
+    item_ids = bulk_insert(
+        db, PlanItem, [{"dayplan_id": plan_id, **entry._asdict()} for entry in result.items], return_ids=True
+    )
+    bulk_insert(
+        db,
+        PlanItemDependency,
+        [
+            {"dayplan_id": plan_id, "parent_item_id": item_ids[parent], "child_item_id": item_ids[child]}
+            for parent, child in result.dependencies
+        ],
+    )
+    sync.record_many(
+        db,
+        user_id,
+        [("plan", plan_id, sync.UPSERT)]
+        + [("plan_item", item_id, sync.DELETE) for item_id in old_ids]
+        + [("plan_item", item_id, sync.UPSERT) for item_id in item_ids],
+    )
+    db.commit()
+    return True
+
+
+class NodeTable:
+    """Columnar node storage addressed by dense integer indices.
+
+    Each attribute lives in its own compact array so ordering only touches
+    machine integers instead of ORM objects.
+    """
+
+    __slots__ = ("keys", "index", "soft_start", "soft_end", "energy", "priority", "parent")
+
+    def __init__(self) -> None:
+        self.keys: list[NodeKey] = []
+        self.index: dict[NodeKey, int] = {}
+        self.soft_start = array("H")
+        self.soft_end = array("H")
+        self.energy = array("B")
+        self.priority = array("i")
+        # Index of the habit a task inherits its soft window from, or -1.
+        self.parent = array("i")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(
+        self,
+        key: NodeKey,
+        soft_start: int = NO_TIME,
+        soft_end: int = NO_TIME,
+        energy: int = ENERGY_NONE,
+        priority: int = 0,
+        parent: int = -1,
+    ) -> int:
+        idx = len(self.keys)
+        self.keys.append(key)
+        self.index[key] = idx
+        self.soft_start.append(soft_start)
+        self.soft_end.append(soft_end)
+        self.energy.append(energy)
+        self.priority.append(priority)
+        self.parent.append(parent)
+        return idx
+
+    def intern(self, key: NodeKey) -> int:
+        """Return the index for ``key``, adding an attribute-less row if unknown."""
+        idx = self.index.get(key)
+        if idx is None:
+            idx = self.add(key)
+        return idx
+
+    def copy(self) -> "NodeTable":
+        clone = NodeTable()
+        clone.keys = list(self.keys)
+        clone.index = dict(self.index)
+        for column in ("soft_start", "soft_end", "energy", "priority", "parent"):
+            setattr(clone, column, array(getattr(self, column).typecode, getattr(self, column)))
+        return clone
+
+
+def _load_node_table(db: Session, user_id: int) -> NodeTable:
+    """Load schedulable nodes with column-only queries (no ORM identity map)."""
+    table = NodeTable()
+    habit_rows = db.query(
+        Habit.id, Habit.soft_window_start, Habit.soft_window_end, Habit.energy_tag
+    ).filter(Habit.user_id == user_id)
+    for habit_id, soft_start, soft_end, energy_tag in habit_rows:
+        table.add(
+            (NodeType.HABIT, habit_id),
+            _time_to_minutes(soft_start),
+            _time_to_minutes(soft_end),
+            _energy_class(energy_tag),
+        )
 
-    plan = DayPlan(user_id=user_id, date=target_date)
-    db.add(plan)
-    return plan
+    task_rows = (
+        db.query(
+            Task.id,
+            Task.habit_id,
+            Task.priority,
+            Task.energy_tag,
+            Habit.soft_window_start,
+            Habit.soft_window_end,
+            Habit.energy_tag,
+        )
+        .outerjoin(Habit, Task.habit_id == Habit.id)
+        .filter(Task.user_id == user_id, Task.active.is_(True))
+    )
+    for task_id, habit_id, priority, energy_tag, soft_start, soft_end, habit_energy in task_rows:
+        table.add(
+            (NodeType.TASK, task_id),
+            _time_to_minutes(soft_start),
+            _time_to_minutes(soft_end),
+            _energy_class(energy_tag or habit_energy),
+            priority or 0,
+            table.index.get((NodeType.HABIT, habit_id), -1),
+        )
+    return table
 
 
-def _collect_nodes(
-    habits: Iterable[Habit], tasks: Iterable[Task]
-) -> dict[tuple[NodeType, int], dict]:
-    nodes: dict[tuple[NodeType, int], dict] = {}
-    for habit in habits:
-        nodes[(NodeType.HABIT, habit.id)] = {
-            "obj": habit,
-            "soft_start": habit.soft_window_start,
-            "soft_end": habit.soft_window_end,
-            "energy_tag": habit.energy_tag,
-        }
-
-    for task in tasks:
-        nodes[(NodeType.TASK, task.id)] = {
-            "obj": task,
-            "soft_start": getattr(task.habit, "soft_window_start", None),
-            "soft_end": getattr(task.habit, "soft_window_end", None),
-            "energy_tag": task.energy_tag or getattr(task.habit, "energy_tag", None),
-        }
-    return nodes
-
-
-def _build_dependency_graph(edges: Iterable[Edge]) -> tuple[dict[tuple[NodeType, int], set], dict[tuple[NodeType, int], int]]:
-    adjacency: dict[tuple[NodeType, int], set] = defaultdict(set)
-    indegree: dict[tuple[NodeType, int], int] = defaultdict(int)
-
-    for edge in edges:
-        key_from = (edge.from_type, edge.from_id)
-        key_to = (edge.to_type, edge.to_id)
-
-        if edge.relation in {RelationType.TRIGGERS, RelationType.FOLLOWS, RelationType.SUPPORTS}:
-            adjacency[key_from].add(key_to)
-            indegree[key_to] += 1
-            indegree.setdefault(key_from, 0)
+def _load_edges(db: Session, user_id: int) -> list[EdgeTuple]:
+    rows = db.query(Edge.from_type, Edge.from_id, Edge.to_type, Edge.to_id, Edge.relation).filter(
+        Edge.user_id == user_id
+    )
+    return [tuple(row) for row in rows]
+
+
+def _build_dependency_graph(
+    table: NodeTable, edges: Iterable[EdgeTuple]
+) -> tuple[list[list[int]], array]:
+    """Build index-based adjacency lists and indegrees.
+
+    Edge endpoints that are not schedulable nodes (goals, systems, inactive
+    tasks) are interned into ``table`` so they still take part in ordering.
+    """
+    adjacency: list[list[int]] = [[] for _ in range(len(table))]
+    indegree = array("i", [0]) * len(table)
+
+    for from_type, from_id, to_type, to_id, relation in edges:
+        if relation not in {RelationType.TRIGGERS, RelationType.FOLLOWS, RelationType.SUPPORTS}:
+            continue
+        src = table.intern((from_type, from_id))
+        dst = table.intern((to_type, to_id))
+        while len(adjacency) < len(table):
+            adjacency.append([])
+            indegree.append(0)
+        adjacency[src].append(dst)
+        indegree[dst] += 1
 
     return adjacency, indegree
 
 
-def generate_day_plan(db: Session, user_id: int, target_date: date) -> DayPlan:
-    """Generate or refresh the day plan for the given user/date."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise ValueError("User not found")
+def _order_nodes(
+    table: NodeTable, adjacency: list[list[int]], indegree: array
+) -> tuple[list[int], int]:
+    """Topologically order node indices, earliest soft start first.
 
-    habits = db.query(Habit).filter(Habit.user_id == user_id).all()
-    tasks = db.query(Task).filter(Task.user_id == user_id, Task.active.is_(True)).all()
-    edges = db.query(Edge).filter(Edge.user_id == user_id).all()
+    Ties break on higher priority, then load order. Nodes stuck in a cycle are
+    appended afterwards in load order; the second return value is the number
+    of nodes placed before that fallback kicked in.
+    """
+    remaining = array("i", indegree)
+    soft_start = table.soft_start
+    priority = table.priority
 
-    nodes = _collect_nodes(habits, tasks)
-    adjacency, indegree = _build_dependency_graph(edges)
+    heap = [(soft_start[idx], -priority[idx], idx) for idx, degree in enumerate(remaining) if degree == 0]
+    heapq.heapify(heap)
 
-    # Ensure nodes exist in indegree even if no edges.
-    for key in nodes:
-        indegree.setdefault(key, 0)
+    order: list[int] = []
+    while heap:
+        _, _, idx = heapq.heappop(heap)
+        order.append(idx)
+        for neighbour in adjacency[idx]:
+            remaining[neighbour] -= 1
+            if remaining[neighbour] == 0:
+                heapq.heappush(heap, (soft_start[neighbour], -priority[neighbour], neighbour))
 
-    initial_ready = {
-        key for key, degree in indegree.items() if degree == 0 and key in nodes
-    }
+    # Fallback for cycles: append remaining nodes in load order.
+    placed = len(order)
+    if placed < len(table):
+        order.extend(idx for idx, degree in enumerate(remaining) if degree > 0)
+    return order, placed
 
-    processing_queue = deque(
-        sorted(
-            [key for key, degree in indegree.items() if degree == 0],
-            key=lambda node_key: _time_to_minutes(nodes.get(node_key, {}).get("soft_start")),
-        )
+
+class PlannedItem(NamedTuple):
+    """Plan item computed by :func:`build_plan`, independent of any session."""
+
+    node_type: NodeType
+    node_id: int
+    status: PlanStatus
+    scheduled_order: int
+    scheduled_window_start: time | None
+    scheduled_window_end: time | None
+    anchor: PlanAnchor | None
+    remaining_deps: int
+
+
+class PlanResult(NamedTuple):
+    items: list[PlannedItem]
+    # (parent, child) positions into ``items`` for every dependency edge.
+    dependencies: list[tuple[int, int]]
+    has_cycle: bool
+
+
+class GraphSnapshot(NamedTuple):
+    """Everything :func:`build_plan` needs, detached from the database."""
+
+    table: NodeTable
+    edges: list[EdgeTuple]
+    high_energy_window: tuple[int, int]
+
+
+def load_graph_snapshot(db: Session, user_id: int) -> GraphSnapshot:
+    user = db.query(User.id).filter(User.id == user_id).first()
+    if not user:
+        raise ValueError("User not found")
+    return GraphSnapshot(
+        table=_load_node_table(db, user_id),
+        edges=_load_edges(db, user_id),
+        high_energy_window=_determine_energy_window(db, user_id),
     )
 
-    order: list[tuple[NodeType, int]] = []
-    while processing_queue:
-        node_key = processing_queue.popleft()
-        order.append(node_key)
-        for neighbour in adjacency.get(node_key, []):
-            indegree[neighbour] -= 1
-            if indegree[neighbour] == 0:
-                processing_queue.append(neighbour)
-        processing_queue = deque(
-            sorted(
-                processing_queue,
-                key=lambda key: _time_to_minutes(nodes.get(key, {}).get("soft_start")),
-            )
-        )
 
-    # Fallback for cycles: append remaining nodes in arbitrary order.
-    remaining = [key for key, degree in indegree.items() if degree > 0]
-    for rem in remaining:
-        if rem not in order:
-            order.append(rem)
+def build_plan(snapshot: GraphSnapshot) -> PlanResult:
+    """Order a graph snapshot into plan items without touching the database.
 
-    plan = _ensure_day_plan(db, user_id, target_date)
-    high_energy_start, high_energy_end = _determine_energy_window(db, user_id)
+    The snapshot itself is left unmodified so it can be reused.
+    """
+    table = snapshot.table.copy()
+    schedulable = len(table)
+    adjacency, indegree = _build_dependency_graph(table, snapshot.edges)
+    order, placed = _order_nodes(table, adjacency, indegree)
+    high_energy_start, high_energy_end = snapshot.high_energy_window
 
-    plan.items.clear()
-    for idx, (node_type, node_id) in enumerate(order, start=1):
-        node_info = nodes.get((node_type, node_id))
-        soft_start = node_info.get("soft_start") if node_info else None
-        soft_end = node_info.get("soft_end") if node_info else None
-        energy_tag = node_info.get("energy_tag") if node_info else None
+    items: list[PlannedItem] = []
+    for position, idx in enumerate(order, start=1):
+        node_type, node_id = table.keys[idx]
+        soft_start = _minutes_to_time(table.soft_start[idx])
+        soft_end = _minutes_to_time(table.soft_end[idx])
 
         anchor = PlanAnchor.TIME if soft_start or soft_end else None
 
         # Heuristic: if item energy matches high energy window, prefer earlier order.
-        if energy_tag and "high" in energy_tag.lower():
+        if table.energy[idx] & ENERGY_HIGH:
             if high_energy_start <= 10:  # simple tweak; TODO more nuance
                 soft_start = soft_start or time(hour=high_energy_start)
                 soft_end = soft_end or time(hour=high_energy_end)
 
-        plan.items.append(
-            PlanItem(
+        items.append(
+            PlannedItem(
                 node_type=node_type,
                 node_id=node_id,
-                status=PlanStatus.READY if (node_type, node_id) in initial_ready else PlanStatus.PLANNED,
-                scheduled_order=idx,
+                status=(
+                    PlanStatus.READY
+                    if indegree[idx] == 0 and idx < schedulable
+                    else PlanStatus.PLANNED
+                ),
+                scheduled_order=position,
                 scheduled_window_start=soft_start,
                 scheduled_window_end=soft_end,
                 anchor=anchor,
+                remaining_deps=indegree[idx],
             )
         )
 
-    db.commit()
+    position_of = array("i", [0]) * len(table)
+    for position, idx in enumerate(order):
+        position_of[idx] = position
+    dependencies = [
+        (position_of[parent], position_of[child])
+        for parent, children in enumerate(adjacency)
+        for child in children
+    ]
+    return PlanResult(items, dependencies, placed < len(order))
+
+
+@tracing.traced("scheduler.generate_day_plan")
+def generate_day_plan(db: Session, user_id: int, target_date: date) -> DayPlan:
+    """Generate or refresh the day plan for the given user/date."""
+    snapshot = load_graph_snapshot(db, user_id)
+    plan_id, generation = _ensure_day_plan(db, user_id, target_date)
+    if len(snapshot.table) + len(snapshot.edges) >= settings.planning_offload_threshold:
+        # Large graphs are ordered in the worker pool so they do not hold this thread.
+        result = workers.run(build_plan, snapshot)
+    else:
+        result = build_plan(snapshot)
+
+    _write_plan(db, user_id, plan_id, generation, result)
+    plan = db.get(DayPlan, plan_id)
     db.refresh(plan)
     return plan
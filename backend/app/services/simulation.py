@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Session
+
+from ..schemas import GraphOverlay, PlanItemBase, SimulatedPlan
+from . import flow, scheduler, workers
+from .scheduler import GraphSnapshot, NodeTable
+
+
+def apply_overlay(snapshot: GraphSnapshot, overlay: GraphOverlay) -> GraphSnapshot:
+    """Return a new snapshot with ``overlay`` applied; ``snapshot`` is untouched."""
+    table: NodeTable = snapshot.table.copy()
+
+    for override in overlay.node_overrides:
+        idx = table.intern((override.node_type, override.node_id))
+        given = override.model_fields_set
+        # Tasks inherit their habit's soft window, and its energy unless they have their own.
+        children = [child for child, parent in enumerate(table.parent) if parent == idx]
+        if "soft_window_start" in given:
+            start = scheduler._time_to_minutes(override.soft_window_start)
+            for node in (idx, *children):
+                table.soft_start[node] = start
+        if "soft_window_end" in given:
+            end = scheduler._time_to_minutes(override.soft_window_end)
+            for node in (idx, *children):
+                table.soft_end[node] = end
+        if "energy_tag" in given:
+            inheriting = [child for child in children if table.energy[child] == table.energy[idx]]
+            energy = scheduler._energy_class(override.energy_tag)
+            for node in (idx, *inheriting):
+                table.energy[node] = energy
+
+    removed = {
+        (edge.from_type, edge.from_id, edge.to_type, edge.to_id) for edge in overlay.remove_edges
+    }
+    edges = [edge for edge in snapshot.edges if edge[:4] not in removed]
+    edges.extend(
+        (edge.from_type, edge.from_id, edge.to_type, edge.to_id, edge.relation)
+        for edge in overlay.add_edges
+    )
+    return GraphSnapshot(table=table, edges=edges, high_energy_window=snapshot.high_energy_window)
+
+
+def _simulate_one(snapshot: GraphSnapshot, overlay: GraphOverlay) -> SimulatedPlan:
+    result = scheduler.build_plan(apply_overlay(snapshot, overlay))
+    return SimulatedPlan(
+        label=overlay.label,
+        items=[PlanItemBase(**entry._asdict()) for entry in result.items],
+        projected_flow_score=flow.project_flow_points(result.items),
+        has_cycle=result.has_cycle,
+    )
+
+
+def simulate_plans(db: Session, user_id: int, alternatives: list[GraphOverlay]) -> list[SimulatedPlan]:
+    """Evaluate what-if overlays against the user's current graph without writing.
+
+    The graph is read once; each alternative is applied to its own copy and
+    planned with the pure scheduler core, on the worker pool when there is
+    more than one alternative.
+    """
+    snapshot = scheduler.load_graph_snapshot(db, user_id)
+    executor = workers.get_executor() if len(alternatives) > 1 else None
+    if executor is None:
+        return [_simulate_one(snapshot, overlay) for overlay in alternatives]
+    futures = [executor.submit(_simulate_one, snapshot, overlay) for overlay in alternatives]
+    return [future.result() for future in futures]
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from sqlalchemy import Date, and_, exists, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models import DayPlan, Gamification, PlanItem, PlanStatus
+from . import gamification as gamification_service
+
+
+def extend_streak(db: Session, gamification: Gamification) -> None:
+    """Count today toward the streak on the day's first qualifying completion.
+
+    Only yesterday's row is read; later completions on the same day are no-ops.
+    """
+    if gamification.streak_days:
+        return
+    yesterday = (
+        db.query(Gamification.streak_days)
+        .filter(
+            Gamification.user_id == gamification.user_id,
+            Gamification.date == gamification.date - timedelta(days=1),
+        )
+        .scalar()
+    )
+    gamification.streak_days = (yesterday or 0) + 1
+
+
+def backfill_streaks(db: Session) -> int:
+    """Recompute ``streak_days`` for every user from plan history.
+
+    A day qualifies when its plan has at least one completed item. One
+    windowed query lists qualifying days with the previous qualifying day
+    per user; streaks are then carried forward in a single ordered pass and
+    written back in bulk. Returns the number of qualifying days.
+    """
+    has_done = exists().where(
+        and_(PlanItem.dayplan_id == DayPlan.id, PlanItem.status == PlanStatus.DONE)
+    )
+    previous_day = func.lag(DayPlan.date, type_=Date).over(
+        partition_by=DayPlan.user_id, order_by=DayPlan.date
+    )
+    rows = db.execute(
+        select(DayPlan.user_id, DayPlan.date, Gamification.id, previous_day)
+        .outerjoin(
+            Gamification,
+            and_(Gamification.user_id == DayPlan.user_id, Gamification.date == DayPlan.date),
+        )
+        .where(has_done)
+        .order_by(DayPlan.user_id, DayPlan.date)
+    ).all()
+
+    updates: list[dict] = []
+    inserts: list[dict] = []
+    streak = 0
+    for user_id, day, gamification_id, previous in rows:
+        streak = streak + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        if gamification_id is None:
+            inserts.append(
+                {"user_id": user_id, "date": day, "streak_days": streak, "xp": 0, "flow_streak": 0}
+            )
+        else:
+            updates.append({"id": gamification_id, "streak_days": streak})
+
+    db.execute(update(Gamification).values(streak_days=0))
+    if updates:
+        db.execute(update(Gamification), updates)
+    if inserts:
+        db.execute(insert(Gamification), inserts)
+    db.commit()
+    gamification_service.clear_cache()
+    return len(rows)
@@ -0,0 +1,162 @@
+"""Per-user change sequence and change log behind ``/sync``.
+
+Every flush that inserts, updates or deletes a synced row (habits, tasks,
+edges, day plans and plan items) bumps the owning user's ``change_seq`` once
+and logs the touched ids under the new number. The bump is a row update on
+the user, so concurrent writers for one user commit their sequence numbers
+in order and a client cursor never skips a change.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import delete, event, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import NODE_MODELS, ChangeLog, DayPlan, Edge, Habit, PlanItem, Task, User
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+ENTITIES = {Habit: "habit", Task: "task", Edge: "edge", DayPlan: "plan", PlanItem: "plan_item"}
+
+_CASCADE_KEY = "sync_cascaded_edges"
+
+
+class Changes(NamedTuple):
+    seq: int
+    reset: bool
+    upserted: dict[str, list[int]]
+    deleted: dict[str, list[int]]
+
+
+def record(db: Session, user_id: int, entity: str, entity_ids: list[int], op: str = UPSERT) -> None:
+    """Log changes made with bulk statements, which the flush hook cannot see."""
+    record_many(db, user_id, [(entity, entity_id, op) for entity_id in entity_ids])
+
+
+def record_many(db: Session, user_id: int, changes: list[tuple[str, int, str]]) -> None:
+    """Like :func:`record` for ``(entity, id, op)`` changes of several kinds, under one sequence number."""
+    if changes:
+        _log(db.connection(), {user_id: changes})
+
+
+def _log(connection, changes: dict[int, list[tuple[str, int, str]]]) -> None:
+    for user_id, rows in changes.items():
+        connection.execute(update(User).where(User.id == user_id).values(change_seq=User.change_seq + 1))
+        seq = connection.scalar(select(User.change_seq).where(User.id == user_id))
+        if seq is None:
+            continue
+        connection.execute(
+            insert(ChangeLog),
+            [
+                {"user_id": user_id, "seq": seq, "entity": entity, "entity_id": entity_id, "op": op}
+                for entity, entity_id, op in rows
+            ],
+        )
+
+
+def _stash_cascaded_edges(session: Session, flush_context, instances) -> None:
+    """Deleting a node removes its edges in a mapper hook; note their ids first."""
+    doomed = [obj for obj in session.deleted if type(obj) in NODE_MODELS]
+    if not doomed:
+        return
+    conditions = []
+    for obj in doomed:
+        node_type = NODE_MODELS[type(obj)]
+        conditions.append((Edge.from_type == node_type) & (Edge.from_id == obj.id))
+        conditions.append((Edge.to_type == node_type) & (Edge.to_id == obj.id))
+    rows = session.connection().execute(select(Edge.id, Edge.user_id).where(or_(*conditions)))
+    session.info.setdefault(_CASCADE_KEY, []).extend(rows)
+
+
+def _capture(session: Session, flush_context) -> None:
+    touched: list[tuple[object, str]] = []
+    touched.extend((obj, UPSERT) for obj in session.new if type(obj) in ENTITIES)
+    touched.extend(
+        (obj, UPSERT) for obj in session.dirty if type(obj) in ENTITIES and session.is_modified(obj)
+    )
+    touched.extend((obj, DELETE) for obj in session.deleted if type(obj) in ENTITIES)
+    cascaded = session.info.pop(_CASCADE_KEY, [])
+    if not touched and not cascaded:
+        return
+
+    connection = session.connection()
+    plan_ids = {obj.dayplan_id for obj, _ in touched if isinstance(obj, PlanItem)}
+    plan_owner = (
+        dict(connection.execute(select(DayPlan.id, DayPlan.user_id).where(DayPlan.id.in_(plan_ids))).all())
+        if plan_ids
+        else {}
+    )
+
+    changes: dict[int, list[tuple[str, int, str]]] = defaultdict(list)
+    seen: set[tuple[str, int]] = set()
+    for obj, op in touched:
+        user_id = plan_owner.get(obj.dayplan_id) if isinstance(obj, PlanItem) else obj.user_id
+        if user_id is None:
+            continue
+        entity = ENTITIES[type(obj)]
+        seen.add((entity, obj.id))
+        changes[user_id].append((entity, obj.id, op))
+    for edge_id, user_id in cascaded:
+        if ("edge", edge_id) not in seen:
+            changes[user_id].append(("edge", edge_id, DELETE))
+    _log(connection, changes)
+
+
+event.listen(Session, "before_flush", _stash_cascaded_edges)
+event.listen(Session, "after_flush", _capture)
+
+
+def current_seq(db: Session, user_id: int) -> Optional[int]:
+    return db.scalar(select(User.change_seq).where(User.id == user_id))
+
+
+def changed_since(db: Session, user_id: int, since: int, entities: Iterable[str]) -> bool:
+    """Whether any of ``entities`` changed after sequence ``since``."""
+    row = (
+        db.query(ChangeLog.id)
+        .filter(ChangeLog.user_id == user_id, ChangeLog.seq > since, ChangeLog.entity.in_(list(entities)))
+        .first()
+    )
+    return row is not None
+
+
+def changes_since(db: Session, user_id: int, since: int) -> Changes:
+    """Ids per entity changed after ``since``, collapsed to each id's latest operation.
+
+    ``reset`` is set when the cursor predates the retained log (or the
+    client's view is otherwise unusable) and the client should refetch.
+    """
+    seq = current_seq(db, user_id) or 0
+    oldest = db.scalar(select(func.min(ChangeLog.seq)).where(ChangeLog.user_id == user_id))
+    if since > seq or (since < seq and (oldest is None or oldest > since + 1)):
+        return Changes(seq=seq, reset=True, upserted={}, deleted={})
+
+    latest: dict[tuple[str, int], str] = {}
+    rows = (
+        db.query(ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+        .filter(ChangeLog.user_id == user_id, ChangeLog.seq > since, ChangeLog.seq <= seq)
+        .order_by(ChangeLog.seq, ChangeLog.id)
+    )
+    for entity, entity_id, op in rows:
+        latest[(entity, entity_id)] = op
+
+    upserted: dict[str, list[int]] = defaultdict(list)
+    deleted: dict[str, list[int]] = defaultdict(list)
+    for (entity, entity_id), op in latest.items():
+        (upserted if op == UPSERT else deleted)[entity].append(entity_id)
+    return Changes(seq=seq, reset=False, upserted=dict(upserted), deleted=dict(deleted))
+
+
+def purge_expired(db: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=settings.change_log_retention_days)
+    result = db.execute(
+        delete(ChangeLog).where(ChangeLog.created_at < cutoff).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
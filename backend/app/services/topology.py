@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from sqlalchemy import and_, func, insert, update
+from sqlalchemy.orm import Session, aliased
+
+from ..models import Edge, NodeRank
+from . import scheduler
+from .scheduler import NodeKey, NodeTable
+
+
+class CycleError(ValueError):
+    """Adding the edge would close a cycle; ``path`` walks it from source back to source."""
+
+    def __init__(self, path: list[NodeKey]) -> None:
+        super().__init__("Edge would create a cycle")
+        self.path = path
+
+
+def _bootstrap(db: Session, user_id: int) -> None:
+    """Rank an existing graph once, for users who had edges before ranks existed."""
+    if db.query(NodeRank.id).filter(NodeRank.user_id == user_id).first():
+        return
+    table = NodeTable()
+    adjacency, indegree = scheduler._build_dependency_graph(table, scheduler._load_edges(db, user_id))
+    if not len(table):
+        return
+    order, _ = scheduler._order_nodes(table, adjacency, indegree)
+    db.execute(
+        insert(NodeRank),
+        [
+            {"user_id": user_id, "node_type": table.keys[idx][0], "node_id": table.keys[idx][1], "rank": rank}
+            for rank, idx in enumerate(order)
+        ],
+    )
+
+
+def _ranks_for(db: Session, user_id: int, keys: list[NodeKey]) -> dict[NodeKey, int]:
+    ranks: dict[NodeKey, int] = {}
+    for node_type, node_id in keys:
+        rank = (
+            db.query(NodeRank.rank)
+            .filter(
+                NodeRank.user_id == user_id,
+                NodeRank.node_type == node_type,
+                NodeRank.node_id == node_id,
+            )
+            .scalar()
+        )
+        if rank is not None:
+            ranks[(node_type, node_id)] = rank
+    return ranks
+
+
+def _place_new_nodes(db: Session, user_id: int, source: NodeKey, target: NodeKey, ranks: dict[NodeKey, int]) -> None:
+    """Give unranked endpoints a rank that keeps ``source`` before ``target`` when possible."""
+    new_keys = [key for key in (source, target) if key not in ranks]
+    if not new_keys:
+        return
+    low, high = (
+        db.query(func.min(NodeRank.rank), func.max(NodeRank.rank))
+        .filter(NodeRank.user_id == user_id)
+        .one()
+    )
+    low = 0 if low is None else low
+    high = -1 if high is None else high
+    if source not in ranks:
+        ranks[source] = low - 1 if target in ranks else high + 1
+    if target not in ranks:
+        ranks[target] = max(high, ranks[source]) + 1
+    db.execute(
+        insert(NodeRank),
+        [{"user_id": user_id, "node_type": key[0], "node_id": key[1], "rank": ranks[key]} for key in new_keys],
+    )
+
+
+def _reorder(db: Session, user_id: int, source: NodeKey, target: NodeKey, lower: int, upper: int) -> None:
+    """Pearce-Kelly repair of the ranks in ``[lower, upper]`` for a back edge.
+
+    Only edges whose endpoints both fall in the affected window are read.
+    Raises CycleError if ``target`` already reaches ``source``.
+    """
+    region = (
+        db.query(NodeRank.id, NodeRank.node_type, NodeRank.node_id, NodeRank.rank)
+        .filter(NodeRank.user_id == user_id, NodeRank.rank.between(lower, upper))
+        .all()
+    )
+    row_id = {(row.node_type, row.node_id): row.id for row in region}
+    rank = {(row.node_type, row.node_id): row.rank for row in region}
+
+    src, dst = aliased(NodeRank), aliased(NodeRank)
+    edges = (
+        db.query(Edge.from_type, Edge.from_id, Edge.to_type, Edge.to_id)
+        .join(src, and_(src.user_id == Edge.user_id, src.node_type == Edge.from_type, src.node_id == Edge.from_id))
+        .join(dst, and_(dst.user_id == Edge.user_id, dst.node_type == Edge.to_type, dst.node_id == Edge.to_id))
+        .filter(Edge.user_id == user_id, src.rank.between(lower, upper), dst.rank.between(lower, upper))
+    )
+    forward: dict[NodeKey, list[NodeKey]] = {}
+    backward: dict[NodeKey, list[NodeKey]] = {}
+    for from_type, from_id, to_type, to_id in edges:
+        forward.setdefault((from_type, from_id), []).append((to_type, to_id))
+        backward.setdefault((to_type, to_id), []).append((from_type, from_id))
+
+    # Forward search from the target; reaching the source means a cycle.
+    parent: dict[NodeKey, NodeKey | None] = {target: None}
+    stack = [target]
+    while stack:
+        node = stack.pop()
+        for nxt in forward.get(node, ()):
+            if nxt in parent:
+                continue
+            parent[nxt] = node
+            if nxt == source:
+                chain = [source]
+                while chain[-1] != target:
+                    chain.append(parent[chain[-1]])
+                raise CycleError([source, *reversed(chain)])
+            stack.append(nxt)
+    reached_forward = list(parent)
+
+    seen = {source}
+    stack = [source]
+    while stack:
+        node = stack.pop()
+        for prev in backward.get(node, ()):
+            if prev not in seen:
+                seen.add(prev)
+                stack.append(prev)
+    reached_backward = list(seen)
+
+    moved = sorted(reached_backward, key=rank.__getitem__) + sorted(reached_forward, key=rank.__getitem__)
+    slots = sorted(rank[key] for key in moved)
+    db.execute(
+        update(NodeRank),
+        [{"id": row_id[key], "rank": slot} for key, slot in zip(moved, slots)],
+    )
+
+
+def link(db: Session, user_id: int, source: NodeKey, target: NodeKey) -> None:
+    """Update the user's topological ranks for a new ``source -> target`` edge.
+
+    Forward edges (source already ranked before target) cost two indexed
+    lookups. Back edges repair only the affected rank window. Raises
+    CycleError, leaving the ranks unchanged, if the edge would close a cycle.
+    Changes are staged in ``db`` for the caller to commit with the edge.
+    """
+    if source == target:
+        raise CycleError([source, target])
+    _bootstrap(db, user_id)
+    ranks = _ranks_for(db, user_id, [source, target])
+    _place_new_nodes(db, user_id, source, target, ranks)
+    if ranks[source] < ranks[target]:
+        return
+    _reorder(db, user_id, source, target, lower=ranks[target], upper=ranks[source])
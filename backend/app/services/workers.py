@@ -0,0 +1,84 @@
+"""Shared process pool for CPU-bound planning work.
+
+Used for what-if simulations and for ordering very large graphs, so a
+heavy plan runs in another process instead of holding a request thread
+and the GIL. With ``simulation_workers <= 1`` everything runs inline.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, TypeVar
+
+from ..config import settings
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[Executor]:
+    """Lazily start the worker pool; None when offloading is disabled."""
+    global _executor
+    if settings.simulation_workers <= 1:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.simulation_workers)
+        return _executor
+
+
+def _discard(executor: Executor) -> None:
+    """Drop a broken pool so the next call starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run(fn: Callable[..., T], *args) -> T:
+    """Run ``fn(*args)`` on the pool and wait for it, or inline without a pool.
+
+    A pool broken by a dying worker (e.g. killed for memory) is replaced
+    and the call retried once on the new pool.
+    """
+    executor = get_executor()
+    if executor is None:
+        return fn(*args)
+    try:
+        return executor.submit(fn, *args).result()
+    except BrokenProcessPool:
+        logger.warning("Worker pool broke while running %s; retrying on a new pool", fn.__qualname__)
+        _discard(executor)
+    return get_executor().submit(fn, *args).result()
+
+
+def _prime() -> None:
+    # Importing and exercising the planner once in each worker keeps the
+    # first real request from paying for module imports.
+    from .scheduler import GraphSnapshot, NodeTable, build_plan
+
+    build_plan(GraphSnapshot(table=NodeTable(), edges=[], high_energy_window=settings.scheduler_high_energy_window))
+
+
+def warm_up() -> None:
+    """Start every worker process now rather than on the first large request."""
+    executor = get_executor()
+    if executor is None:
+        return
+    for future in [executor.submit(_prime) for _ in range(settings.simulation_workers)]:
+        future.result()
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
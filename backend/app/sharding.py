@@ -0,0 +1,260 @@
+"""Optional storage mode spreading users over several SQLite files.
+
+Users are placed on shards by consistent hashing of their id, so each shard
+has its own write lock and growing the shard count only moves the users
+whose ring position changed (see :meth:`ShardRouter.rebalance`). Primary
+keys come from a block allocator in the catalog database (the regular
+``database_url``), which keeps ids unique across shards: rows can be found
+by id alone and keep their ids when a user moves.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence, TypeVar
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    delete,
+    event,
+    func,
+    inspect,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Insert
+from sqlalchemy.sql.elements import ColumnElement
+
+T = TypeVar("T")
+
+# Points per shard on the ring; more points even out the share each shard gets.
+RING_POINTS = 64
+ID_BLOCK_SIZE = 1000
+
+id_blocks = Table(
+    "id_blocks",
+    MetaData(),
+    Column("name", String(64), primary_key=True),
+    Column("next_id", Integer, nullable=False),
+)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring mapping user ids to shard numbers."""
+
+    def __init__(self, shards: Iterable[int], points: int = RING_POINTS) -> None:
+        ring = sorted((_hash(f"shard-{shard}:{point}"), shard) for shard in shards for point in range(points))
+        if not ring:
+            raise ValueError("A hash ring needs at least one shard")
+        self._hashes = [value for value, _ in ring]
+        self._shards = [shard for _, shard in ring]
+
+    def shard_for(self, user_id: int) -> int:
+        idx = bisect.bisect(self._hashes, _hash(f"user-{user_id}")) % len(self._hashes)
+        return self._shards[idx]
+
+
+class IdAllocator:
+    """Hands out ids per table from blocks reserved in the catalog database.
+
+    One catalog write reserves ``block_size`` ids, so shards do not contend
+    on it for every insert. ``seed`` gives the first id for a table the
+    catalog has not seen yet.
+    """
+
+    def __init__(self, catalog: Engine, seed: Callable[[str], int], block_size: int = ID_BLOCK_SIZE) -> None:
+        self._catalog = catalog
+        self._seed = seed
+        self._block_size = block_size
+        self._blocks: dict[str, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def next_id(self, table: str) -> int:
+        with self._lock:
+            current, end = self._blocks.get(table, (0, 0))
+            if current >= end:
+                current, end = self._reserve(table)
+            self._blocks[table] = (current + 1, end)
+            return current
+
+    def _reserve(self, table: str) -> tuple[int, int]:
+        with self._catalog.begin() as connection:
+            known = connection.execute(select(id_blocks.c.next_id).where(id_blocks.c.name == table)).first()
+            if known is None:
+                connection.execute(
+                    sqlite.insert(id_blocks)
+                    .values(name=table, next_id=self._seed(table))
+                    .on_conflict_do_nothing(index_elements=["name"])
+                )
+            # The update takes the write lock, so the read below sees our reservation.
+            connection.execute(
+                update(id_blocks)
+                .where(id_blocks.c.name == table)
+                .values(next_id=id_blocks.c.next_id + self._block_size)
+            )
+            end = connection.execute(select(id_blocks.c.next_id).where(id_blocks.c.name == table)).scalar_one()
+        return end - self._block_size, end
+
+
+def _engine(url: str) -> Engine:
+    database = make_url(url).database
+    if database and database != ":memory:":
+        Path(database).parent.mkdir(parents=True, exist_ok=True)
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def _id_column(table: Table) -> Optional[Column]:
+    columns = list(table.primary_key.columns)
+    if len(columns) == 1 and columns[0].type.python_type is int:
+        return columns[0]
+    return None
+
+
+def _owned_by(table: Table, user_id: int) -> Optional[ColumnElement[bool]]:
+    """Criteria selecting the user's rows in ``table``; None for shared tables."""
+    if table.name == "users":
+        return table.c.id == user_id
+    if "user_id" in table.c:
+        return table.c.user_id == user_id
+    for foreign_key in table.foreign_keys:
+        parent = _owned_by(foreign_key.column.table, user_id)
+        if parent is not None:
+            return foreign_key.parent.in_(select(foreign_key.column).where(parent))
+    return None
+
+
+class ShardRouter:
+    """Engines, sessions and id allocation for a set of shard databases."""
+
+    def __init__(self, catalog: Engine, shard_urls: Sequence[str], metadata: MetaData) -> None:
+        self.catalog = catalog
+        self.metadata = metadata
+        self.engines = [_engine(url) for url in shard_urls]
+        self.sessions = [sessionmaker(autocommit=False, autoflush=False, bind=engine) for engine in self.engines]
+        self.ring = HashRing(range(len(self.engines)))
+        self.ids = IdAllocator(catalog, self._first_id)
+        id_columns = {table: _id_column(table) for table in metadata.sorted_tables}
+        self._id_columns = {table: column for table, column in id_columns.items() if column is not None}
+        for engine in self.engines:
+            event.listen(engine, "before_execute", self._assign_ids, retval=True)
+
+    def _assign_ids(self, connection, statement, multiparams, params, execution_options):
+        """Give rows inserted into a shard an allocated id unless they carry one."""
+        column = self._id_columns.get(statement.table) if isinstance(statement, Insert) else None
+        if column is None:
+            return statement, multiparams, params
+        key, table = column.key, statement.table.name
+        if multiparams:
+            multiparams = [row if key in row else {**row, key: self.ids.next_id(table)} for row in multiparams]
+        elif params:
+            if key not in params:
+                params = {**params, key: self.ids.next_id(table)}
+        elif key not in statement.compile().params:
+            statement = statement.values({key: self.ids.next_id(table)})
+        return statement, multiparams, params
+
+    def _first_id(self, table: str) -> int:
+        """One past the highest id already stored anywhere, e.g. before sharding was enabled."""
+        highest = 0
+        for engine in (self.catalog, *self.engines):
+            if not inspect(engine).has_table(table):
+                continue
+            with engine.connect() as connection:
+                stored = connection.execute(select(func.max(_id_column(self.metadata.tables[table])))).scalar()
+            highest = max(highest, stored or 0)
+        return highest + 1
+
+    def create_all(self) -> None:
+        id_blocks.create(self.catalog, checkfirst=True)
+        for engine in self.engines:
+            self.metadata.create_all(bind=engine)
+
+    def dispose(self) -> None:
+        """Stop assigning ids and close every shard connection."""
+        for engine in self.engines:
+            event.remove(engine, "before_execute", self._assign_ids)
+            engine.dispose()
+
+    def shard_for(self, user_id: int) -> int:
+        return self.ring.shard_for(user_id)
+
+    def session_for(self, user_id: int) -> Session:
+        return self.sessions[self.shard_for(user_id)]()
+
+    def locate(self, table: str, row_id: int) -> Optional[int]:
+        """The shard holding ``table`` row ``row_id``, if any."""
+        column = _id_column(self.metadata.tables[table])
+        for shard, engine in enumerate(self.engines):
+            with engine.connect() as connection:
+                if connection.execute(select(column).where(column == row_id)).first():
+                    return shard
+        return None
+
+    def map(self, fn: Callable[[sessionmaker], T]) -> list[T]:
+        """Run ``fn`` once per shard, in parallel, with that shard's session factory."""
+        with ThreadPoolExecutor(max_workers=len(self.sessions), thread_name_prefix="shard") as pool:
+            return list(pool.map(fn, self.sessions))
+
+    def _move(self, user_id: int, source: Engine, target: Engine) -> None:
+        owned = [
+            (table, criteria)
+            for table in self.metadata.sorted_tables
+            if (criteria := _owned_by(table, user_id)) is not None
+        ]
+        with source.connect() as connection:
+            rows = [
+                (table, connection.execute(select(table).where(criteria)).mappings().all())
+                for table, criteria in owned
+            ]
+        # Clearing the target first makes a move that died half way safe to rerun.
+        with target.begin() as connection:
+            for table, criteria in reversed(owned):
+                connection.execute(delete(table).where(criteria))
+            for table, table_rows in rows:
+                if table_rows:
+                    connection.execute(insert(table), [dict(row) for row in table_rows])
+        with source.begin() as connection:
+            for table, criteria in reversed(owned):
+                connection.execute(delete(table).where(criteria))
+
+    def rebalance(self, include_catalog: bool = False) -> dict[int, int]:
+        """Move every user whose rows are not on their ring shard; returns moves per target shard.
+
+        Run it after changing the shard count and before serving traffic, since
+        requests are routed by the ring alone. ``include_catalog`` also moves
+        users still stored in the catalog database from before sharding.
+        """
+        users = self.metadata.tables["users"]
+        sources = [(shard, engine) for shard, engine in enumerate(self.engines)]
+        if include_catalog:
+            sources.append((None, self.catalog))
+        moved: dict[int, int] = {}
+        for shard, engine in sources:
+            if not inspect(engine).has_table(users.name):
+                continue
+            with engine.connect() as connection:
+                user_ids = connection.execute(select(users.c.id)).scalars().all()
+            for user_id in user_ids:
+                target = self.shard_for(user_id)
+                if target == shard:
+                    continue
+                self._move(user_id, engine, self.engines[target])
+                moved[target] = moved.get(target, 0) + 1
+        return moved
@@ -0,0 +1,230 @@
+"""In-process tracing: nested spans for requests, service calls and SQL.
+
+A request opens a root span (see :class:`TracingMiddleware`); service
+functions decorated with :func:`traced` and every SQL statement run while a
+span is open become its children. When a root span ends, the whole trace is
+kept in a ring buffer for ``/admin/traces`` and, if ``trace_file`` is set,
+appended to it as NDJSON, one span per line.
+
+Tracing is off unless ``tracing_enabled`` is set; disabled, a traced call
+costs one attribute read.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+# Statements longer than this are cut in span attributes.
+MAX_STATEMENT_CHARS = 500
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    # Unix time in seconds.
+    start: float
+    duration_ms: float = 0.0
+    status: str = "ok"
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class _Trace:
+    spans: list[Span] = field(default_factory=list)
+
+
+@dataclass
+class _State:
+    enabled: bool = False
+    path: Optional[Path] = None
+    min_duration_ms: float = 0.0
+    traces: deque[list[Span]] = field(default_factory=lambda: deque(maxlen=200))
+
+
+_state = _State()
+_lock = threading.Lock()
+# (open span, its trace) for the running request or job.
+_current: ContextVar[Optional[tuple[Span, _Trace]]] = ContextVar("current_span", default=None)
+
+
+def configure(
+    enabled: bool,
+    path: Optional[str] = None,
+    buffer_size: int = 200,
+    min_duration_ms: float = 0.0,
+) -> None:
+    """Turn tracing on or off; traces already buffered are dropped."""
+    with _lock:
+        _state.enabled = enabled
+        _state.path = Path(path) if path else None
+        _state.min_duration_ms = min_duration_ms
+        _state.traces = deque(maxlen=buffer_size)
+
+
+def enabled() -> bool:
+    return _state.enabled
+
+
+def _finish(span: Span, trace: _Trace, started: float) -> None:
+    span.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+    trace.spans.append(span)
+    if span.parent_id is None and span.duration_ms >= _state.min_duration_ms:
+        _export(trace.spans)
+
+
+def _export(spans: list[Span]) -> None:
+    # Root last on finish; the buffer and file list it first.
+    spans = [spans[-1], *spans[:-1]]
+    with _lock:
+        _state.traces.append(spans)
+        if _state.path is not None:
+            with _state.path.open("a", encoding="utf-8") as handle:
+                for span in spans:
+                    handle.write(json.dumps(asdict(span), default=str) + "\n")
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the open span, or as a new trace's root.
+
+    Yields the span so callers can add attributes, or None when tracing is off.
+    """
+    if not _state.enabled:
+        yield None
+        return
+    parent = _current.get()
+    if parent is None:
+        trace = _Trace()
+        current = Span(secrets.token_hex(8), secrets.token_hex(4), None, name, time.time(), attributes=attributes)
+    else:
+        parent_span, trace = parent
+        current = Span(
+            parent_span.trace_id, secrets.token_hex(4), parent_span.span_id, name, time.time(), attributes=attributes
+        )
+    token = _current.set((current, trace))
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = "error"
+        current.attributes["error"] = type(exc).__name__
+        raise
+    finally:
+        _current.reset(token)
+        _finish(current, trace, started)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator running the function inside ``span(name)``."""
+
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return call
+
+    return decorate
+
+
+def traces(min_duration_ms: float = 0.0, limit: int = 50) -> list[list[Span]]:
+    """Buffered traces, root span first, most recent first."""
+    with _lock:
+        recent = list(reversed(_state.traces))
+    return [spans for spans in recent if spans[0].duration_ms >= min_duration_ms][:limit]
+
+
+def get_trace(trace_id: str) -> Optional[list[Span]]:
+    with _lock:
+        return next((spans for spans in _state.traces if spans[0].trace_id == trace_id), None)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per HTTP request.
+
+    The span is renamed to the matched route template once routing is done,
+    so ``/habit/12`` and ``/habit/13`` share the name ``PATCH /habit/{habit_id}``.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not _state.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_status(message) -> None:
+            if message["type"] == "http.response.start" and root is not None:
+                root.attributes["http.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    root.status = "error"
+            await send(message)
+
+        with span(f"{scope['method']} {scope['path']}", **{"http.path": scope["path"]}) as root:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if root is not None and route is not None:
+                    root.name = f"{scope['method']} {route.path}"
+
+
+def _statement_name(statement: str) -> str:
+    return "sql " + (statement.split(None, 1)[0].upper() if statement.strip() else "?")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _state.enabled and context is not None and _current.get() is not None:
+        context._trace_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "_trace_started", None)
+    parent = _current.get()
+    if started is None or parent is None:
+        return
+    parent_span, trace = parent
+    attributes = {"db.system": conn.dialect.name, "db.statement": statement[:MAX_STATEMENT_CHARS]}
+    if executemany:
+        attributes["db.executemany"] = True
+    sql_span = Span(
+        parent_span.trace_id,
+        secrets.token_hex(4),
+        parent_span.span_id,
+        _statement_name(statement),
+        time.time() - (time.perf_counter() - started),
+        attributes=attributes,
+    )
+    _finish(sql_span, trace, started)
+
+
+configure(
+    settings.tracing_enabled,
+    settings.trace_file or None,
+    settings.trace_buffer_size,
+    settings.trace_min_duration_ms,
+)
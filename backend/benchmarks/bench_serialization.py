@@ -0,0 +1,81 @@
+"""Serialization cost per 1,000 plan items: Pydantic round trip vs. the orjson fast path.
+
+Run from the backend directory: ``python -m benchmarks.bench_serialization``.
+"""
+
+import time as clock
+from datetime import date, time
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.api.serialization import dump_rows, json_response, schema_columns
+from app.models import DayPlan, NodeType, PlanAnchor, PlanItem, PlanStatus
+from app.schemas import PlanItem as PlanItemSchema
+
+ITEMS = 1_000
+ROUNDS = 20
+
+
+def _seed(session) -> int:
+    plan = DayPlan(user_id=1, date=date.today())
+    session.add(plan)
+    session.flush()
+    session.add_all(
+        PlanItem(
+            dayplan_id=plan.id,
+            node_type=NodeType.TASK,
+            node_id=idx,
+            status=PlanStatus.PLANNED,
+            scheduled_order=idx,
+            scheduled_window_start=time(hour=9),
+            scheduled_window_end=time(hour=10),
+            anchor=PlanAnchor.TIME,
+        )
+        for idx in range(ITEMS)
+    )
+    session.commit()
+    return plan.id
+
+
+def _validated(session, plan_id: int) -> bytes:
+    items = session.query(PlanItem).filter(PlanItem.dayplan_id == plan_id).all()
+    payload = [PlanItemSchema.model_validate(item) for item in items]
+    # FastAPI re-validates against response_model before encoding.
+    revalidated = [PlanItemSchema.model_validate(item.model_dump()) for item in payload]
+    return json_response(jsonable_encoder(revalidated)).body
+
+
+def _fast(session, plan_id: int) -> bytes:
+    rows = session.query(*schema_columns(PlanItem, PlanItemSchema)).filter(PlanItem.dayplan_id == plan_id)
+    return json_response(dump_rows(rows, PlanItemSchema)).body
+
+
+def _measure(fn, session, plan_id: int) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        session.expunge_all()
+        start = clock.perf_counter()
+        fn(session, plan_id)
+        best = min(best, clock.perf_counter() - start)
+    return best * 1000 * (1_000 / ITEMS)
+
+
+def main() -> None:
+    engine = create_engine("sqlite:///:memory:")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    plan_id = _seed(session)
+
+    assert len(_fast(session, plan_id)) > 0
+    validated = _measure(_validated, session, plan_id)
+    fast = _measure(_fast, session, plan_id)
+    print(f"model_validate + response_model: {validated:.2f} ms / 1k items")
+    print(f"column rows + orjson:            {fast:.2f} ms / 1k items")
+    print(f"speed-up:                        {validated / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
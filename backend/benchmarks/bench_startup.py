@@ -0,0 +1,93 @@
+"""Cold-start cost: importing ``app.main``, running the startup hooks, and the schema check.
+
+Each round runs in a fresh interpreter against a scratch SQLite file, as a
+new worker would; set ``BENCH_DATABASE_URL`` to an empty server database to
+compare the schema step there too. Run from the backend directory:
+``python -m benchmarks.bench_startup``.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROUNDS = 5
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Prints the import time and the startup phases, in milliseconds.
+_BOOT = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = (time.perf_counter() - started) * 1000
+asyncio.run(app.router.startup())
+print(json.dumps({"import_wall": imported, **app.state.startup_timings}))
+asyncio.run(app.router.shutdown())
+"""
+
+# The schema step alone, once the models are imported.
+_SCHEMA = """
+import time
+from app.bootstrap import ensure_schema
+from app.database import Base, engine
+started = time.perf_counter()
+if "{mode}" == "create_all":
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        Base.metadata.create_all(bind=connection)
+else:
+    ensure_schema(engine)
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def _run(code: str, env: dict[str, str]) -> str:
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env={**os.environ, **env}, check=True, capture_output=True, text=True
+    ).stdout
+    return output.strip().splitlines()[-1]
+
+
+def _boot(database_url: str, scheduler: bool) -> dict[str, float]:
+    env = {"DATABASE_URL": database_url, "ENABLE_SCHEDULER": str(scheduler).lower(), "SIMULATION_WORKERS": "0"}
+    return json.loads(_run(_BOOT, env))
+
+
+def _median_boot(database_url: str, scheduler: bool) -> dict[str, float]:
+    runs = [_boot(database_url, scheduler) for _ in range(ROUNDS)]
+    return {phase: statistics.median(run.get(phase, 0.0) for run in runs) for phase in runs[0]}
+
+
+def _schema_check(database_url: str, mode: str) -> float:
+    """Median cold cost in ms of the old double ``create_all`` or the version check."""
+    return statistics.median(
+        float(_run(_SCHEMA.format(mode=mode), {"DATABASE_URL": database_url})) for _ in range(ROUNDS)
+    )
+
+
+def _row(label: str, timings: dict[str, float]) -> str:
+    phases = ", ".join(f"{phase} {ms:.0f}" for phase, ms in timings.items() if phase not in ("import_wall", "import"))
+    return f"{label:<22} import {timings['import_wall']:6.0f} ms | startup: {phases} ms"
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as scratch:
+        database_url = f"sqlite:///{Path(scratch) / 'bench.db'}"
+        created = _boot(database_url, scheduler=False)
+        print(f"{'first boot (creates)':<22} schema {created['schema']:6.0f} ms")
+        print(_row("scheduler off", _median_boot(database_url, scheduler=False)))
+        print(_row("scheduler on", _median_boot(database_url, scheduler=True)))
+        urls = {"sqlite": database_url}
+        if os.environ.get("BENCH_DATABASE_URL"):
+            urls["server"] = os.environ["BENCH_DATABASE_URL"]
+            _boot(urls["server"], scheduler=False)
+        for name, url in urls.items():
+            reflect, check = _schema_check(url, "create_all"), _schema_check(url, "check")
+            print(f"{name + ' schema':<22} create_all x2 {reflect:6.1f} ms | version check {check:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,20 @@
 import sys
+from datetime import time
 from pathlib import Path
 
 import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from app import models
+from app.api.router import api_router
+from app.database import get_db
+from app.models import Edge, Goal, Habit, NodeType, RelationType, System, Task, User
 
 
 @pytest.fixture()
@@ -20,3 +27,81 @@ def in_memory_db() -> Session:
         yield session
     finally:
         session.close()
+
+
+@pytest.fixture()
+def api_session() -> Session:
+    """Session on an in-memory database that request threads can share."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture()
+def client(api_session) -> TestClient:
+    """TestClient for the API routes, reading and writing ``api_session``'s database."""
+    factory = sessionmaker(bind=api_session.get_bind())
+
+    def session_per_request():
+        with factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(api_router)
+    app.dependency_overrides[get_db] = session_per_request
+    return TestClient(app)
+
+
+@pytest.fixture()
+def seeded_user(in_memory_db) -> User:
+    """A user with one habit (08:00-09:00) that triggers one task."""
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.flush()
+
+    goal = Goal(user_id=user.id, title="Learn", description="")
+    in_memory_db.add(goal)
+    in_memory_db.flush()
+
+    system = System(user_id=user.id, goal_id=goal.id, title="Study System", description="")
+    in_memory_db.add(system)
+    in_memory_db.flush()
+
+    morning = Habit(
+        user_id=user.id,
+        system_id=system.id,
+        name="Morning Review",
+        soft_window_start=time(hour=8),
+        soft_window_end=time(hour=9),
+        recurrence_rule="daily",
+    )
+    in_memory_db.add(morning)
+    in_memory_db.flush()
+
+    deep_task = Task(
+        user_id=user.id,
+        habit_id=morning.id,
+        title="Deep Work",
+        difficulty=4,
+        priority=2,
+    )
+    in_memory_db.add(deep_task)
+    in_memory_db.flush()
+
+    in_memory_db.add(
+        Edge(
+            user_id=user.id,
+            from_type=NodeType.HABIT,
+            from_id=morning.id,
+            to_type=NodeType.TASK,
+            to_id=deep_task.id,
+            relation=RelationType.TRIGGERS,
+        )
+    )
+    in_memory_db.commit()
+    return user
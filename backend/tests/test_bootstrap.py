@@ -0,0 +1,47 @@
+import pytest
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+
+from app import bootstrap, models
+
+
+def test_heads_match_alembic():
+    scripts = ScriptDirectory(str(bootstrap.VERSIONS_DIR.parent))
+    assert bootstrap.alembic_heads() == set(scripts.get_heads())
+
+
+def test_empty_database_is_created_then_only_checked(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    assert bootstrap.ensure_schema(engine) == bootstrap.CREATED
+    assert set(models.Base.metadata.tables) <= set(inspect(engine).get_table_names())
+    assert bootstrap.ensure_schema(engine) == bootstrap.CURRENT
+
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE alembic_version SET version_num = '0001_initial'"))
+    with pytest.raises(bootstrap.SchemaVersionError, match="alembic upgrade head"):
+        bootstrap.ensure_schema(engine)
+    engine.dispose()
+
+
+def test_unversioned_database_must_match_the_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    assert bootstrap.ensure_schema(engine) == bootstrap.UNVERSIONED
+    assert "alembic_version" not in inspect(engine).get_table_names()
+
+    # As built by an older create_all: the table exists, a later column does not.
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE users DROP COLUMN change_seq"))
+    with pytest.raises(bootstrap.SchemaVersionError, match="users.change_seq.*alembic stamp 0001_initial"):
+        bootstrap.ensure_schema(engine)
+    assert "alembic_version" not in inspect(engine).get_table_names()
+    engine.dispose()
+
+
+def test_unversioned_database_missing_tables_is_refused(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models.User.__table__.create(engine)
+    with pytest.raises(bootstrap.SchemaVersionError, match="plan_items"):
+        bootstrap.ensure_schema(engine)
+    assert inspect(engine).get_table_names() == ["users"]
+    engine.dispose()
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from app.cache import SingleFlight, TTLCache
+
+
+def test_single_flight_shares_one_computation():
+    flight: SingleFlight[int] = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def compute() -> int:
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 42
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", compute)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", compute))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert results == [42, 42, 42, 42]
+    assert len(calls) == 1
+    assert flight.do("key", lambda: 7) == 7
+
+
+def test_ttl_cache_expires_entries():
+    cache: TTLCache[str] = TTLCache(ttl=0.05, maxsize=1)
+    cache.set("a", "x")
+    assert cache.get("a") == "x"
+    cache.set("b", "y")
+    assert cache.get("a") is None
+    time.sleep(0.06)
+    assert cache.get("b") is None
@@ -27,6 +27,8 @@ def test_coach_suggests_actions_when_failures_high(in_memory_db):
         node_id=habit.id,
         rolling_fail_count=5,
         last_failed_at=datetime.utcnow(),
+        score=5.0,
+        score_updated_at=datetime.utcnow(),
     )
     in_memory_db.add(stats)
     in_memory_db.commit()
@@ -35,3 +37,13 @@ def test_coach_suggests_actions_when_failures_high(in_memory_db):
         in_memory_db, user_id=user.id, node_type=NodeType.HABIT, node_id=habit.id
     )
     assert len(suggestion.actions) >= 3
+
+
+def test_build_suggestion_is_pure_and_reuses_templates():
+    struggling = coach.build_suggestion(NodeType.TASK, 1, "Write report", score=10.0)
+    assert "Write report" in struggling.actions[0].description
+    assert all(action.suggestion_type != "automate" for action in struggling.actions)
+
+    calm = coach.build_suggestion(NodeType.TASK, 2, None, score=0.0)
+    assert [action.suggestion_type for action in calm.actions] == ["encourage"]
+    assert coach.build_suggestion(NodeType.TASK, 3, None, score=0.0).actions[0] is calm.actions[0]
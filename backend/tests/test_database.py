@@ -0,0 +1,127 @@
+"""Dialect-specific write paths, run on SQLite and, when ``TEST_DATABASE_URL``
+points at a PostgreSQL database, on PostgreSQL too::
+
+    TEST_DATABASE_URL=postgresql+psycopg://localhost/syske_test pytest tests/test_database.py
+"""
+
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import bulk_insert, engine_options
+from app.models import DayPlan, EventLog, FailureStats, Gamification, NodeType, PlanItem, PlanStatus, Review, User
+from app.services import events, failures, gamification, review, scheduler
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def db(request):
+    if request.param == "sqlite":
+        url = "sqlite:///:memory:"
+    else:
+        url = os.environ.get("TEST_DATABASE_URL")
+        if not url:
+            pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(url, **engine_options(url))
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        if request.param != "sqlite":
+            models.Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def _user(db) -> User:
+    user = User(tz="UTC")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_bulk_insert_returns_ids_in_row_order_and_fills_defaults(db):
+    user = _user(db)
+    plan = DayPlan(user_id=user.id, date=date(2024, 5, 1))
+    db.add(plan)
+    db.flush()
+    rows = [{"dayplan_id": plan.id, "node_type": NodeType.HABIT, "node_id": node_id} for node_id in (3, 1, 2)]
+    ids = bulk_insert(db, PlanItem, rows, return_ids=True)
+    db.commit()
+
+    stored = {item.id: item for item in db.query(PlanItem)}
+    assert [stored[item_id].node_id for item_id in ids] == [3, 1, 2]
+    assert all(item.status == PlanStatus.PLANNED and item.version == 1 for item in stored.values())
+
+
+def test_buffered_events_are_bulk_written(db):
+    user = _user(db)
+    buffer = events.EventBuffer(sessionmaker(bind=db.get_bind()), batch_size=10)
+    for item_id in range(3):
+        buffer.offer(
+            {
+                "user_id": user.id,
+                "ts": datetime(2024, 5, 1),
+                "event_type": "plan_skip",
+                "payload_json": {"plan_item_id": item_id},
+            }
+        )
+    assert buffer.flush() == 3
+    assert sorted(evt.payload_json["plan_item_id"] for evt in db.query(EventLog)) == [0, 1, 2]
+
+
+def test_plan_and_gamification_rows_are_upserted(db):
+    user = _user(db)
+    first = scheduler._ensure_day_plan(db, user.id, date(2024, 5, 1))
+    assert scheduler._ensure_day_plan(db, user.id, date(2024, 5, 1)) == first
+    assert db.query(DayPlan).count() == 1
+
+    row = gamification.ensure_row(db, user.id, date(2024, 5, 1))
+    row.xp = 5
+    db.commit()
+    assert gamification.ensure_row(db, user.id, date(2024, 5, 1)).xp == 5
+    assert db.query(Gamification).count() == 1
+
+
+def test_rerunning_a_review_replaces_it(db):
+    user = _user(db)
+    db.add(DayPlan(user_id=user.id, date=date(2024, 5, 1)))
+    db.commit()
+    review.generate_daily_summary(db, user.id, date(2024, 5, 1))
+    stored = db.query(Review).one()
+    stored.reflection_text = "Tired"
+    db.commit()
+
+    review.generate_daily_summary(db, user.id, date(2024, 5, 1))
+    db.expire_all()
+    assert db.query(Review).one().reflection_text == "Tired"
+
+
+def test_skips_racing_on_a_new_node_are_both_counted(db, monkeypatch):
+    user = _user(db)
+    db.add(failures._new_stats(user.id, NodeType.HABIT, 1))
+    db.commit()
+    # Simulate a concurrent writer creating the row after our read.
+    real_locked = failures._locked
+    calls = []
+
+    def locked(*args):
+        calls.append(args)
+        return {} if len(calls) == 1 else real_locked(*args)
+
+    monkeypatch.setattr(failures, "_locked", locked)
+    failures.record_skip(db, user.id, NodeType.HABIT, 1, ts=datetime(2024, 5, 1))
+    failures.record_skip(db, user.id, NodeType.HABIT, 1, ts=datetime(2024, 5, 1))
+    db.commit()
+    assert db.query(FailureStats.rolling_fail_count).scalar() == 2
+
+
+def test_postgres_event_payloads_have_a_gin_index(db):
+    if db.get_bind().dialect.name != "postgresql":
+        pytest.skip("GIN index is PostgreSQL-only")
+    indexes = {index["name"] for index in inspect(db.get_bind()).get_indexes("event_logs")}
+    assert "ix_event_logs_payload" in indexes
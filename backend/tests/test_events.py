@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.models import EventLog
+from app.services import events
+
+
+def test_event_buffer_defers_writes_until_flush(in_memory_db, monkeypatch):
+    buffer = events.EventBuffer(sessionmaker(bind=in_memory_db.get_bind()), maxsize=2, batch_size=1)
+    monkeypatch.setattr(events, "_buffer", buffer)
+
+    events.record_event(in_memory_db, 1, "plan_complete", {"plan_item_id": 1})
+    events.record_event(in_memory_db, 1, "plan_skip", {"plan_item_id": 2})
+    assert in_memory_db.query(EventLog).count() == 0
+    assert [evt.event_type for evt in events.pending_events(1, ["plan_complete"])] == ["plan_complete"]
+
+    # A full buffer falls back to the caller's transaction.
+    events.record_event(in_memory_db, 1, "coach_suggest", {})
+    in_memory_db.commit()
+    assert in_memory_db.query(EventLog).count() == 1
+
+    assert buffer.flush() == 2
+    assert in_memory_db.query(EventLog).count() == 3
+    assert events.pending_events(1, ["plan_complete", "plan_skip"]) == []
+
+
+def test_failed_batches_are_retried_and_not_counted(in_memory_db, monkeypatch):
+    buffer = events.EventBuffer(sessionmaker(bind=in_memory_db.get_bind()), batch_size=2)
+    for _ in range(3):
+        buffer.offer({"user_id": 1, "ts": datetime(2024, 5, 1), "event_type": "plan_skip", "payload_json": {}})
+
+    real_insert = events.bulk_insert
+
+    def failing_insert(*args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(events, "bulk_insert", failing_insert)
+    assert buffer.flush() == 0
+    assert len(buffer.pending(1, ["plan_skip"])) == 3
+
+    monkeypatch.setattr(events, "bulk_insert", real_insert)
+    assert buffer.flush() == 3
+    assert in_memory_db.query(EventLog).count() == 3
+    assert buffer.pending(1, ["plan_skip"]) == []
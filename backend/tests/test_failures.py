@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import EventLog, FailureStats, NodeType, User
+from app.services import failures
+
+START = datetime(2024, 3, 1, 9, 0)
+
+
+def test_scores_decay_and_rank_by_current_value(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.commit()
+
+    # Two old skips on habit 1, one recent skip on habit 2.
+    failures.record_skip(in_memory_db, user.id, NodeType.HABIT, 1, ts=START)
+    failures.record_skip(in_memory_db, user.id, NodeType.HABIT, 1, ts=START)
+    failures.record_skip(in_memory_db, user.id, NodeType.HABIT, 2, ts=START + timedelta(days=14))
+    in_memory_db.commit()
+
+    now = START + timedelta(days=14)
+    ranked = failures.top_struggling(in_memory_db, user.id, now=now)
+    assert [(row.node_type, row.node_id) for row in ranked] == [(NodeType.HABIT, 2), (NodeType.HABIT, 1)]
+    assert ranked[0].score == pytest.approx(1.0)
+    assert ranked[1].score == pytest.approx(0.5)
+
+    # A completion takes credit off instead of wiping the history.
+    failures.record_completion(in_memory_db, user.id, NodeType.HABIT, 2, ts=now)
+    in_memory_db.commit()
+    assert [row.node_id for row in failures.top_struggling(in_memory_db, user.id, now=now)] == [1]
+
+
+def test_backfill_matches_incremental_updates(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.commit()
+
+    history = [("plan_skip", 0), ("plan_skip", 3), ("plan_complete", 5), ("plan_skip", 9)]
+    for event_type, day in history:
+        ts = START + timedelta(days=day)
+        in_memory_db.add(
+            EventLog(
+                user_id=user.id,
+                ts=ts,
+                event_type=event_type,
+                payload_json={"node_type": "task", "node_id": 7},
+            )
+        )
+        record = failures.record_skip if event_type == "plan_skip" else failures.record_completion
+        record(in_memory_db, user.id, NodeType.TASK, 7, ts=ts)
+    in_memory_db.commit()
+    expected = in_memory_db.query(FailureStats).one().score
+
+    in_memory_db.query(FailureStats).update({"score": 0.0, "score_key": None, "score_updated_at": None})
+    in_memory_db.commit()
+
+    assert failures.backfill_scores(in_memory_db) == 1
+    in_memory_db.expire_all()
+    stats = in_memory_db.query(FailureStats).one()
+    assert stats.score == pytest.approx(expected)
+    assert stats.score_updated_at == START + timedelta(days=9)
@@ -0,0 +1,29 @@
+from datetime import date
+
+from app.models import DayPlan, Gamification, NodeType, PlanItem, PlanStatus
+from app.services import flow, gamification
+
+
+def test_snapshot_is_read_only_until_points_are_earned(in_memory_db):
+    gamification.clear_cache()
+    today = date(2024, 5, 1)
+    snapshot = gamification.get_snapshot(in_memory_db, 1, today)
+    assert (snapshot.xp, snapshot.streak_days) == (0, 0)
+    assert in_memory_db.query(Gamification).count() == 0
+
+    plan = DayPlan(user_id=1, date=today)
+    plan.items.append(
+        PlanItem(node_type=NodeType.HABIT, node_id=1, status=PlanStatus.SKIPPED, scheduled_order=1)
+    )
+    in_memory_db.add(plan)
+    in_memory_db.commit()
+    flow.update_flow_score(in_memory_db, plan)
+    assert in_memory_db.query(Gamification).count() == 0
+
+    plan.items.append(
+        PlanItem(node_type=NodeType.HABIT, node_id=2, status=PlanStatus.DONE, scheduled_order=2)
+    )
+    in_memory_db.commit()
+    flow.update_flow_score(in_memory_db, plan)
+    assert in_memory_db.query(Gamification).count() == 1
+    assert gamification.get_snapshot(in_memory_db, 1, today).streak_days == 1
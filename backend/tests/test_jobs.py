@@ -0,0 +1,56 @@
+import multiprocessing
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.models import JobRun
+from app.services import jobs
+
+SLOT = datetime(2024, 5, 1, 21, 0)
+
+
+def test_lease_is_exclusive_until_expiry(in_memory_db):
+    ttl = timedelta(minutes=5)
+    assert jobs.acquire_lease(in_memory_db, "daily_review", "a", ttl)
+    assert not jobs.acquire_lease(in_memory_db, "daily_review", "b", ttl)
+    assert jobs.acquire_lease(in_memory_db, "daily_review", "a", ttl)
+
+    jobs.release_lease(in_memory_db, "daily_review", "a")
+    assert jobs.acquire_lease(in_memory_db, "daily_review", "b", timedelta(seconds=-1))
+    assert jobs.acquire_lease(in_memory_db, "daily_review", "a", ttl)
+    assert not jobs.heartbeat(in_memory_db, "daily_review", "b", ttl)
+
+
+def _worker(url: str, owner: str) -> None:
+    factory = sessionmaker(bind=create_engine(url))
+    jobs.run_exclusive(factory, "daily_review", lambda: None, slot=SLOT, owner=owner)
+
+
+def test_only_one_process_runs_each_slot(tmp_path):
+    url = f"sqlite:///{tmp_path / 'jobs.db'}"
+    models.Base.metadata.create_all(bind=create_engine(url))
+
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_worker, args=(url, f"worker-{idx}")) for idx in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    assert [worker.exitcode for worker in workers] == [0] * len(workers)
+    _worker(url, "late-worker")
+
+    session = sessionmaker(bind=create_engine(url))()
+    runs = session.query(JobRun).all()
+    assert [(run.slot, run.status) for run in runs] == [(SLOT, "succeeded")]
+
+
+def test_workers_straddling_a_boundary_share_the_slot():
+    hour = timedelta(hours=1)
+    early, late = datetime(2024, 5, 1, 10, 59, 58), datetime(2024, 5, 1, 11, 0, 3)
+    assert jobs.schedule_slot(early, hour) == jobs.schedule_slot(late, hour) == datetime(2024, 5, 1, 11)
+
+    half_past = timedelta(minutes=30)
+    assert jobs.schedule_slot(datetime(2024, 5, 1, 11, 29, 59), hour, half_past) == datetime(2024, 5, 1, 11, 30)
+    assert jobs.schedule_slot(datetime(2024, 5, 1, 11, 30, 2), hour, half_past) == datetime(2024, 5, 1, 11, 30)
@@ -0,0 +1,72 @@
+from datetime import date
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+
+from app import bootstrap
+from app.config import settings
+
+
+def _upgrade(revision: str) -> None:
+    config = Config()
+    config.set_main_option("script_location", str(bootstrap.VERSIONS_DIR.parent))
+    command.upgrade(config, revision)
+
+
+def test_plan_item_deps_are_backfilled_for_open_plans(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    monkeypatch.setattr(settings, "database_url", url)
+    _upgrade("0005_plan_item_versions")
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, tz) VALUES (1, 'UTC')"))
+        for from_id, to_id, relation in [(1, 1, "TRIGGERS"), (2, 1, "FOLLOWS"), (3, 2, "TRIGGERS"), (1, 3, "SUPPORTS")]:
+            connection.execute(
+                text(
+                    "INSERT INTO edges (user_id, from_type, from_id, to_type, to_id, relation) "
+                    "VALUES (1, 'HABIT', :from_id, 'TASK', :to_id, :relation)"
+                ),
+                {"from_id": from_id, "to_id": to_id, "relation": relation},
+            )
+        for plan_id, plan_date in [(1, date(2024, 5, 1)), (2, date(2024, 4, 30))]:
+            connection.execute(
+                text("INSERT INTO day_plans (id, user_id, date, flow_score) VALUES (:id, 1, :date, 0)"),
+                {"id": plan_id, "date": plan_date},
+            )
+        # (id, plan, node type, node id, status): task 1 waits on habits 1 (done) and 2 (ready);
+        # task 2's only parent, habit 3, was skipped before skips unlocked anything.
+        items = [
+            (1, 1, "HABIT", 1, "DONE"),
+            (2, 1, "HABIT", 2, "READY"),
+            (3, 1, "TASK", 1, "PLANNED"),
+            (4, 1, "HABIT", 3, "SKIPPED"),
+            (5, 1, "TASK", 2, "PLANNED"),
+            (6, 2, "HABIT", 1, "DONE"),
+            (7, 2, "TASK", 1, "DONE"),
+        ]
+        for item_id, plan_id, node_type, node_id, status in items:
+            connection.execute(
+                text(
+                    "INSERT INTO plan_items (id, dayplan_id, node_type, node_id, status) "
+                    "VALUES (:id, :plan, :node_type, :node_id, :status)"
+                ),
+                {"id": item_id, "plan": plan_id, "node_type": node_type, "node_id": node_id, "status": status},
+            )
+
+    _upgrade("0006_plan_item_deps")
+
+    with engine.connect() as connection:
+        deps = set(connection.execute(text("SELECT dayplan_id, parent_item_id, child_item_id FROM plan_item_deps")))
+        items = {
+            item_id: (status, remaining)
+            for item_id, status, remaining in connection.execute(
+                text("SELECT id, status, remaining_deps FROM plan_items")
+            )
+        }
+    assert deps == {(1, 1, 3), (1, 2, 3), (1, 4, 5)}
+    assert items[3] == ("PLANNED", 1)
+    assert items[5] == ("READY", 0)
+    assert items[7] == ("DONE", 0)
+    engine.dispose()
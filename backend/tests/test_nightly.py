@@ -0,0 +1,37 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy.orm import sessionmaker
+
+from app.models import DayPlan, Review, User
+from app.services import nightly
+
+
+def test_due_timezones_use_local_evening_and_date():
+    now = datetime(2024, 5, 1, 12, 5, tzinfo=timezone.utc)
+    due = nightly.due_timezones(["Asia/Tokyo", "UTC", "Asia/Kolkata"], now, hour=21)
+    assert due == [("Asia/Tokyo", date(2024, 5, 1))]
+
+    half_hour = datetime(2024, 5, 1, 15, 35, tzinfo=timezone.utc)
+    assert nightly.due_timezones(["Asia/Kolkata"], half_hour, hour=21) == [("Asia/Kolkata", date(2024, 5, 1))]
+
+
+def test_run_due_reviews_only_touches_due_timezone(in_memory_db):
+    tokyo, lisbon = User(tz="Asia/Tokyo"), User(tz="Europe/Lisbon")
+    in_memory_db.add_all([tokyo, lisbon])
+    in_memory_db.flush()
+    in_memory_db.add_all(
+        [
+            DayPlan(user_id=tokyo.id, date=date(2024, 5, 2)),
+            DayPlan(user_id=lisbon.id, date=date(2024, 5, 1)),
+        ]
+    )
+    in_memory_db.commit()
+
+    # 21:00 on May 2nd in Tokyo is still May 1st in Lisbon.
+    now = datetime(2024, 5, 2, 12, 0, tzinfo=timezone.utc)
+    factory = sessionmaker(bind=in_memory_db.get_bind())
+    assert nightly.run_due_reviews(factory, now) == ["Asia/Tokyo"]
+    assert nightly.run_due_reviews(factory, now) == []
+
+    reviews = in_memory_db.query(Review.user_id, Review.date_range_start).all()
+    assert reviews == [(tokyo.id, date(2024, 5, 2))]
@@ -0,0 +1,51 @@
+from app.models import Edge, FailureStats, Goal, Habit, Node, NodeType, RelationType, System, Task, User
+from app.services import nodes
+
+
+def test_registry_tracks_writes_and_cascades_deletes(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.flush()
+    goal = Goal(user_id=user.id, title="Goal")
+    in_memory_db.add(goal)
+    in_memory_db.flush()
+    system = System(user_id=user.id, goal_id=goal.id, title="System")
+    in_memory_db.add(system)
+    in_memory_db.flush()
+    habit = Habit(user_id=user.id, system_id=system.id, name="Stretch")
+    task = Task(user_id=user.id, title="Write")
+    in_memory_db.add_all([habit, task])
+    in_memory_db.commit()
+
+    keys = [(NodeType.GOAL, goal.id), (NodeType.HABIT, habit.id), (NodeType.TASK, task.id), (NodeType.TASK, 999)]
+    assert nodes.labels(in_memory_db, user.id, keys) == {
+        (NodeType.GOAL, goal.id): "Goal",
+        (NodeType.HABIT, habit.id): "Stretch",
+        (NodeType.TASK, task.id): "Write",
+    }
+
+    habit.name = "Long stretch"
+    in_memory_db.commit()
+    assert nodes.label(in_memory_db, user.id, NodeType.HABIT, habit.id) == "Long stretch"
+
+    in_memory_db.add_all(
+        [
+            Edge(
+                user_id=user.id,
+                from_type=NodeType.HABIT,
+                from_id=habit.id,
+                to_type=NodeType.TASK,
+                to_id=task.id,
+                relation=RelationType.TRIGGERS,
+            ),
+            FailureStats(user_id=user.id, node_type=NodeType.TASK, node_id=task.id, rolling_fail_count=2),
+        ]
+    )
+    in_memory_db.commit()
+
+    in_memory_db.delete(task)
+    in_memory_db.commit()
+    assert in_memory_db.query(Edge).count() == 0
+    assert in_memory_db.query(FailureStats).count() == 0
+    assert in_memory_db.query(Node).count() == 3
+    assert [node["label"] for node in nodes.list_nodes(in_memory_db, user.id)] == ["Goal", "System", "Long stretch"]
@@ -0,0 +1,147 @@
+from datetime import date
+
+from app.models import (
+    DayPlan,
+    Edge,
+    FailureStats,
+    Goal,
+    Habit,
+    Node,
+    NodeType,
+    PlanItem,
+    PlanItemDependency,
+    PlanStatus,
+    RelationType,
+    System,
+    Task,
+    User,
+)
+from app.services import orphans, sync
+
+
+def test_collect_orphans_removes_rows_left_by_bulk_deletes(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.flush()
+    goal = Goal(user_id=user.id, title="Goal")
+    in_memory_db.add(goal)
+    in_memory_db.flush()
+    system = System(user_id=user.id, goal_id=goal.id, title="System")
+    in_memory_db.add(system)
+    in_memory_db.flush()
+    habit = Habit(user_id=user.id, system_id=system.id, name="Stretch")
+    tasks = [Task(user_id=user.id, title=f"Task {idx}") for idx in range(3)]
+    in_memory_db.add_all([habit, *tasks])
+    in_memory_db.flush()
+
+    plan = DayPlan(user_id=user.id, date=date(2024, 1, 1))
+    in_memory_db.add(plan)
+    in_memory_db.flush()
+    habit_item = PlanItem(dayplan_id=plan.id, node_type=NodeType.HABIT, node_id=habit.id)
+    task_items = [PlanItem(dayplan_id=plan.id, node_type=NodeType.TASK, node_id=task.id) for task in tasks]
+    in_memory_db.add_all([habit_item, *task_items])
+    in_memory_db.flush()
+    for task, item in zip(tasks, task_items):
+        in_memory_db.add_all(
+            [
+                Edge(
+                    user_id=user.id,
+                    from_type=NodeType.HABIT,
+                    from_id=habit.id,
+                    to_type=NodeType.TASK,
+                    to_id=task.id,
+                    relation=RelationType.TRIGGERS,
+                ),
+                PlanItemDependency(dayplan_id=plan.id, parent_item_id=habit_item.id, child_item_id=item.id),
+                FailureStats(user_id=user.id, node_type=NodeType.TASK, node_id=task.id, rolling_fail_count=1),
+            ]
+        )
+    in_memory_db.commit()
+
+    # Bulk deletes skip the registry hooks and leave everything behind.
+    in_memory_db.query(Task).filter(Task.id != tasks[0].id).delete(synchronize_session=False)
+    in_memory_db.commit()
+
+    report = orphans.collect_orphans(in_memory_db, batch_size=1, today=date(2024, 1, 1))
+    assert report == {"edges": 2, "plan_items": 2, "failure_stats": 2, "node_ranks": 0, "nodes": 2}
+    assert in_memory_db.query(Edge).count() == 1
+    assert {item.node_id for item in in_memory_db.query(PlanItem)} == {habit.id, tasks[0].id}
+    assert in_memory_db.query(PlanItemDependency).count() == 1
+    assert in_memory_db.query(Node).count() == 4
+
+    assert set(orphans.collect_orphans(in_memory_db).values()) == {0}
+
+
+def _plan_with_dependency(db, plan_date: date):
+    user = User(tz="UTC")
+    db.add(user)
+    db.flush()
+    parent_task, child_task = Task(user_id=user.id, title="Parent"), Task(user_id=user.id, title="Child")
+    db.add_all([parent_task, child_task])
+    db.flush()
+    plan = DayPlan(user_id=user.id, date=plan_date)
+    db.add(plan)
+    db.flush()
+    parent = PlanItem(dayplan_id=plan.id, node_type=NodeType.TASK, node_id=parent_task.id)
+    child = PlanItem(dayplan_id=plan.id, node_type=NodeType.TASK, node_id=child_task.id, remaining_deps=1)
+    db.add_all([parent, child])
+    db.flush()
+    db.add(PlanItemDependency(dayplan_id=plan.id, parent_item_id=parent.id, child_item_id=child.id))
+    db.commit()
+    db.query(Task).filter(Task.id == parent_task.id).delete(synchronize_session=False)
+    db.commit()
+    return parent.id, child.id
+
+
+def test_removing_an_orphaned_parent_releases_its_children(in_memory_db):
+    parent_id, child_id = _plan_with_dependency(in_memory_db, date(2024, 1, 2))
+    user_id = in_memory_db.query(User.id).scalar()
+    cursor = sync.current_seq(in_memory_db, user_id)
+
+    report = orphans.collect_orphans(in_memory_db, today=date(2024, 1, 2))
+    assert report["plan_items"] == 1
+    in_memory_db.expire_all()
+    assert in_memory_db.get(PlanItem, parent_id) is None
+    child = in_memory_db.get(PlanItem, child_id)
+    assert (child.remaining_deps, child.status) == (0, PlanStatus.READY)
+    assert in_memory_db.query(PlanItemDependency).count() == 0
+
+    # Clients syncing from before the collection learn of both changes.
+    changes = sync.changes_since(in_memory_db, user_id, cursor)
+    assert changes.deleted == {"plan_item": [parent_id]}
+    assert changes.upserted == {"plan_item": [child_id]}
+
+
+def test_orphaned_items_of_past_plans_are_kept(in_memory_db):
+    parent_id, child_id = _plan_with_dependency(in_memory_db, date(2024, 1, 1))
+
+    assert orphans.collect_orphans(in_memory_db, today=date(2024, 1, 2))["plan_items"] == 0
+    assert in_memory_db.get(PlanItem, parent_id) is not None
+    assert in_memory_db.get(PlanItem, child_id).remaining_deps == 1
+
+
+def test_removed_edges_are_reported_to_sync(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.flush()
+    tasks = [Task(user_id=user.id, title=f"Task {idx}") for idx in range(2)]
+    in_memory_db.add_all(tasks)
+    in_memory_db.flush()
+    edge = Edge(
+        user_id=user.id,
+        from_type=NodeType.TASK,
+        from_id=tasks[0].id,
+        to_type=NodeType.TASK,
+        to_id=tasks[1].id,
+        relation=RelationType.FOLLOWS,
+    )
+    in_memory_db.add(edge)
+    in_memory_db.commit()
+    edge_id = edge.id
+    in_memory_db.query(Task).filter(Task.id == tasks[1].id).delete(synchronize_session=False)
+    in_memory_db.commit()
+    cursor = sync.current_seq(in_memory_db, user.id)
+
+    assert orphans.collect_orphans(in_memory_db)["edges"] == 1
+    assert sync.current_seq(in_memory_db, user.id) > cursor
+    assert sync.changes_since(in_memory_db, user.id, cursor).deleted == {"edge": [edge_id]}
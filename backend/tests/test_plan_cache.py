@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+
+from app.models import DayPlan, Goal, Habit, NodeType, System, Task, User
+from app.services import plan_cache, progress, scheduler
+
+TODAY = date(2024, 5, 1)
+TOMORROW = date(2024, 5, 2)
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    plan_cache.clear_cache()
+    yield
+    plan_cache.clear_cache()
+
+
+def _active_user(session) -> tuple[User, Habit]:
+    user = User(tz="UTC")
+    session.add(user)
+    session.flush()
+    goal = Goal(user_id=user.id, title="Goal")
+    session.add(goal)
+    session.flush()
+    system = System(user_id=user.id, goal_id=goal.id, title="System")
+    session.add(system)
+    session.flush()
+    habit = Habit(user_id=user.id, system_id=system.id, name="Stretch")
+    session.add_all([habit, DayPlan(user_id=user.id, date=TODAY)])
+    session.commit()
+    return user, habit
+
+
+def test_prewarmed_plan_is_served_from_cache(in_memory_db):
+    user, _ = _active_user(in_memory_db)
+    idle = User(tz="UTC")
+    in_memory_db.add(idle)
+    in_memory_db.commit()
+
+    assert plan_cache.warm_users(in_memory_db, "UTC", TODAY) == 1
+    assert plan_cache.warm_users(in_memory_db, "UTC", TODAY) == 0
+
+    content = plan_cache.load_plan(in_memory_db, user.id, TOMORROW)
+    assert [item["node_type"] for item in content["items"]] == [NodeType.HABIT]
+    assert plan_cache.generate_plan(in_memory_db, user.id, TOMORROW) is content
+    assert in_memory_db.query(DayPlan.generation).filter(DayPlan.date == TOMORROW).scalar() == 1
+    assert plan_cache.load_plan(in_memory_db, idle.id, TOMORROW) is None
+
+
+def test_library_change_regenerates_untouched_prewarmed_plan(in_memory_db):
+    user, _ = _active_user(in_memory_db)
+    plan_cache.warm_users(in_memory_db, "UTC", TODAY)
+
+    in_memory_db.add(Task(user_id=user.id, title="Late addition"))
+    in_memory_db.commit()
+
+    content = plan_cache.load_plan(in_memory_db, user.id, TOMORROW)
+    assert {item["node_type"] for item in content["items"]} == {NodeType.HABIT, NodeType.TASK}
+    assert in_memory_db.query(DayPlan.prewarmed_seq).filter(DayPlan.date == TOMORROW).scalar() is None
+
+
+def test_plan_in_use_is_not_regenerated(in_memory_db):
+    user, _ = _active_user(in_memory_db)
+    plan_cache.warm_users(in_memory_db, "UTC", TODAY)
+    item_id = plan_cache.load_plan(in_memory_db, user.id, TOMORROW)["items"][0]["id"]
+    progress.complete_item(in_memory_db, user.id, item_id)
+
+    in_memory_db.add(Task(user_id=user.id, title="Late addition"))
+    in_memory_db.commit()
+
+    content = plan_cache.load_plan(in_memory_db, user.id, TOMORROW)
+    assert [item["id"] for item in content["items"]] == [item_id]
+
+
+def test_failed_prewarm_skips_only_that_user(in_memory_db, monkeypatch):
+    broken, _ = _active_user(in_memory_db)
+    healthy, _ = _active_user(in_memory_db)
+    real_generate = scheduler.generate_day_plan
+
+    def generate(db, user_id, target_date):
+        if user_id == broken.id:
+            raise RuntimeError("planner failed")
+        return real_generate(db, user_id=user_id, target_date=target_date)
+
+    monkeypatch.setattr(scheduler, "generate_day_plan", generate)
+    assert plan_cache.warm_users(in_memory_db, "UTC", TODAY) == 1
+    assert plan_cache.load_plan(in_memory_db, broken.id, TOMORROW) is None
+    assert plan_cache.load_plan(in_memory_db, healthy.id, TOMORROW) is not None
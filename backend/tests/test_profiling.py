@@ -0,0 +1,129 @@
+import marshal
+import time
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import profiling
+from app.api.routes import admin
+from app.config import settings
+from app.models import User
+from app.services import scheduler
+
+
+# Depends on monkeypatch so patched service functions are undone after stop_memory.
+@pytest.fixture(autouse=True)
+def reset_profiling(monkeypatch):
+    yield
+    profiling.stop_requests()
+    profiling.stop_memory()
+
+
+def _endpoint(app: FastAPI, path: str):
+    return next(route.dependant.call for route in app.routes if getattr(route, "path", None) == path)
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    def slow() -> dict:
+        time.sleep(0.03)
+        return {"ok": True}
+
+    @app.get("/fast")
+    def fast() -> dict:
+        return {"ok": True}
+
+    profiling.install(app)
+    profiling.install(app)
+    return app
+
+
+def test_only_chosen_routes_are_profiled_and_exported():
+    app = _app()
+    assert _endpoint(app, "/slow")() == {"ok": True}
+    assert profiling.profiles() == []
+
+    profiling.configure_requests(profiling.CPROFILE, 1.0, ["/slow"], keep=2, interval=0.005)
+    for _ in range(3):
+        _endpoint(app, "/slow")()
+    _endpoint(app, "/fast")()
+
+    captured = profiling.profiles()
+    assert [profile.route for profile in captured] == ["/slow", "/slow"]
+    stats = marshal.loads(captured[0].pstats_bytes())
+    assert any(name == "slow" for _, _, name in stats)
+    assert "sleep" in captured[0].collapsed()
+    assert "cumulative" in captured[0].text()
+
+
+def test_sampling_profiles_have_collapsed_stacks_but_no_pstats():
+    app = _app()
+    profiling.configure_requests(profiling.SAMPLING, 1.0, ["/slow"], keep=5, interval=0.002)
+    _endpoint(app, "/slow")()
+
+    (profile,) = profiling.profiles()
+    lines = profile.collapsed().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("slow (" in line for line in lines)
+    with pytest.raises(ValueError):
+        profile.pstats_bytes()
+
+
+def test_memory_captures_wrap_service_functions_until_used_up(in_memory_db):
+    original = scheduler.generate_day_plan
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.commit()
+
+    profiling.configure_memory(["scheduler.generate_day_plan"], captures=1)
+    assert scheduler.generate_day_plan is not original
+    for _ in range(2):
+        scheduler.generate_day_plan(in_memory_db, user.id, date(2024, 5, 1))
+
+    (capture,) = profiling.memory_captures()
+    assert capture.target == "scheduler.generate_day_plan"
+    assert capture.peak_bytes > 0 and capture.top
+
+    profiling.stop_memory()
+    assert scheduler.generate_day_plan is original
+    with pytest.raises(ValueError):
+        profiling.configure_memory(["scheduler.missing"], captures=1)
+
+
+def test_memory_capture_counts_are_per_target(monkeypatch):
+    monkeypatch.setattr(scheduler, "build_plan", lambda: None)
+    monkeypatch.setattr(scheduler, "generate_day_plan", lambda: None)
+    profiling.configure_memory(["scheduler.build_plan", "scheduler.generate_day_plan"], captures=1)
+    for _ in range(3):
+        scheduler.build_plan()
+    scheduler.generate_day_plan()
+
+    assert sorted(capture.target for capture in profiling.memory_captures()) == [
+        "scheduler.build_plan",
+        "scheduler.generate_day_plan",
+    ]
+
+
+def test_stopping_memory_tracing_during_a_capture_drops_it(monkeypatch):
+    monkeypatch.setattr(scheduler, "build_plan", lambda: profiling.stop_memory() or "planned")
+    profiling.configure_memory(["scheduler.build_plan"], captures=1)
+
+    assert scheduler.build_plan() == "planned"
+    assert profiling.memory_captures() == []
+
+
+def test_admin_routes_need_the_configured_token(monkeypatch):
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+    client = TestClient(app)
+
+    monkeypatch.setattr(settings, "admin_token", "")
+    assert client.get("/admin/memory", headers={"X-Admin-Token": "anything"}).status_code == 404
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.get("/admin/memory").status_code == 403
+    assert client.get("/admin/memory", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/memory", headers={"X-Admin-Token": "secret"}).status_code == 200
@@ -0,0 +1,196 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import (
+    DayPlan,
+    Edge,
+    EventLog,
+    FailureStats,
+    Goal,
+    Habit,
+    IdempotencyKey,
+    NodeType,
+    PlanItem,
+    PlanStatus,
+    RelationType,
+    System,
+    Task,
+    User,
+)
+from app.schemas import PlanBatchChange
+from app.services import idempotency, progress, scheduler
+
+
+def _plan(session):
+    plan = DayPlan(user_id=1, date=date(2024, 5, 1))
+    plan.items.append(PlanItem(node_type=NodeType.HABIT, node_id=1, status=PlanStatus.READY, scheduled_order=1))
+    session.add(plan)
+    session.commit()
+    return plan.items[0]
+
+
+def test_retried_skip_with_key_is_counted_once(in_memory_db):
+    item = _plan(in_memory_db)
+    for _ in range(2):
+        assert progress.skip_item(in_memory_db, 1, item.id, idempotency_key="abc") == {"status": "ok"}
+
+    assert in_memory_db.query(FailureStats.rolling_fail_count).scalar() == 1
+    assert in_memory_db.query(EventLog).count() == 1
+    assert in_memory_db.query(IdempotencyKey).count() == 1
+
+
+def test_repeat_completion_is_a_no_op_and_versions_are_checked(in_memory_db):
+    item = _plan(in_memory_db)
+    assert item.version == 1
+    progress.complete_item(in_memory_db, 1, item.id, expected_version=1)
+    progress.complete_item(in_memory_db, 1, item.id)
+    assert in_memory_db.query(EventLog).count() == 1
+
+    in_memory_db.refresh(item)
+    assert item.version == 2
+    with pytest.raises(progress.VersionConflict):
+        progress.skip_item(in_memory_db, 1, item.id, expected_version=1)
+
+
+def test_multi_parent_item_waits_for_all_parents_and_skips_unlock(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.flush()
+    goal = Goal(user_id=user.id, title="Goal")
+    in_memory_db.add(goal)
+    in_memory_db.flush()
+    system = System(user_id=user.id, goal_id=goal.id, title="System")
+    in_memory_db.add(system)
+    in_memory_db.flush()
+    first = Habit(user_id=user.id, system_id=system.id, name="First")
+    second = Habit(user_id=user.id, system_id=system.id, name="Second")
+    task = Task(user_id=user.id, title="Child")
+    in_memory_db.add_all([first, second, task])
+    in_memory_db.flush()
+    for parent in (first, second):
+        in_memory_db.add(
+            Edge(
+                user_id=user.id,
+                from_type=NodeType.HABIT,
+                from_id=parent.id,
+                to_type=NodeType.TASK,
+                to_id=task.id,
+                relation=RelationType.FOLLOWS,
+            )
+        )
+    in_memory_db.commit()
+
+    plan = scheduler.generate_day_plan(in_memory_db, user.id, date(2024, 5, 1))
+    items = {(item.node_type, item.node_id): item for item in plan.items}
+    child = items[(NodeType.TASK, task.id)]
+    assert (child.remaining_deps, child.status) == (2, PlanStatus.PLANNED)
+
+    progress.complete_item(in_memory_db, user.id, items[(NodeType.HABIT, first.id)].id)
+    in_memory_db.refresh(child)
+    assert (child.remaining_deps, child.status) == (1, PlanStatus.PLANNED)
+
+    progress.skip_item(in_memory_db, user.id, items[(NodeType.HABIT, second.id)].id)
+    in_memory_db.refresh(child)
+    assert (child.remaining_deps, child.status) == (0, PlanStatus.READY)
+
+
+def test_batch_applies_queue_in_order_and_releases_once(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.flush()
+    goal = Goal(user_id=user.id, title="Goal")
+    in_memory_db.add(goal)
+    in_memory_db.flush()
+    system = System(user_id=user.id, goal_id=goal.id, title="System")
+    in_memory_db.add(system)
+    in_memory_db.flush()
+    first = Habit(user_id=user.id, system_id=system.id, name="First")
+    second = Habit(user_id=user.id, system_id=system.id, name="Second")
+    task = Task(user_id=user.id, title="Child")
+    in_memory_db.add_all([first, second, task])
+    in_memory_db.flush()
+    for parent in (first, second):
+        in_memory_db.add(
+            Edge(
+                user_id=user.id,
+                from_type=NodeType.HABIT,
+                from_id=parent.id,
+                to_type=NodeType.TASK,
+                to_id=task.id,
+                relation=RelationType.FOLLOWS,
+            )
+        )
+    in_memory_db.commit()
+
+    plan = scheduler.generate_day_plan(in_memory_db, user.id, date(2024, 5, 1))
+    items = {(item.node_type, item.node_id): item.id for item in plan.items}
+    first_id, second_id = items[(NodeType.HABIT, first.id)], items[(NodeType.HABIT, second.id)]
+    child_id = items[(NodeType.TASK, task.id)]
+
+    changes = [
+        PlanBatchChange(plan_item_id=first_id, action="skip", ts=datetime(2024, 5, 1, 8)),
+        PlanBatchChange(plan_item_id=first_id, action="complete", ts=datetime(2024, 5, 1, 9)),
+        PlanBatchChange(plan_item_id=second_id, action="complete", ts=datetime(2024, 5, 1, 10)),
+        PlanBatchChange(plan_item_id=child_id, action="skip", version=99),
+        PlanBatchChange(plan_item_id=12345, action="complete"),
+    ]
+    response = progress.apply_batch(in_memory_db, user.id, changes)
+    assert [result["status"] for result in response["results"]] == ["ok", "ok", "ok", "conflict", "not_found"]
+
+    child = in_memory_db.get(PlanItem, child_id)
+    assert (child.remaining_deps, child.status) == (0, PlanStatus.READY)
+    assert in_memory_db.query(EventLog).count() == 3
+    stats = in_memory_db.query(FailureStats).one()
+    assert stats.rolling_fail_count == 0 and stats.score == 0.0
+    assert in_memory_db.get(DayPlan, plan.id).flow_score > 0
+
+
+def test_batch_reports_a_concurrent_update_as_a_version_conflict(in_memory_db, monkeypatch):
+    item = _plan(in_memory_db)
+    real_record = progress._record_status_event
+
+    def record_status_event(db, *args, **kwargs):
+        # Another request bumps the item after the batch has read it.
+        with db.no_autoflush:
+            db.execute(
+                update(PlanItem)
+                .where(PlanItem.id == item.id)
+                .values(version=PlanItem.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+        return real_record(db, *args, **kwargs)
+
+    monkeypatch.setattr(progress, "_record_status_event", record_status_event)
+    changes = [PlanBatchChange(plan_item_id=item.id, action="complete")]
+    with pytest.raises(progress.VersionConflict):
+        progress.apply_batch(in_memory_db, 1, changes, idempotency_key="batch-1")
+
+    assert in_memory_db.query(IdempotencyKey).count() == 0
+    assert in_memory_db.get(PlanItem, item.id).status == PlanStatus.READY
+
+
+def test_key_committed_by_a_concurrent_retry_is_replayed(tmp_path, monkeypatch):
+    # Two sessions need two connections, which the in-memory fixture cannot give.
+    engine = create_engine(f"sqlite:///{tmp_path / 'progress.db'}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    stored = {"status": "ok", "from": "first retry"}
+
+    real_load_item = progress._load_item
+
+    def load_item_after_retry_commits(db, user_id, plan_item_id):
+        with SessionLocal() as retry:
+            idempotency.remember(retry, user_id, "abc", "plan_skip", stored)
+            retry.commit()
+        return real_load_item(db, user_id, plan_item_id)
+
+    with SessionLocal() as db:
+        item = _plan(db)
+        monkeypatch.setattr(progress, "_load_item", load_item_after_retry_commits)
+        assert progress.skip_item(db, 1, item.id, idempotency_key="abc") == stored
+        assert db.query(EventLog).count() == 0
+        assert db.get(PlanItem, item.id).status == PlanStatus.READY
@@ -1,62 +1,83 @@
+import os
 from datetime import date, time
 
-from app.models import Edge, Goal, Habit, NodeType, RelationType, System, Task, User
-from app.services import scheduler
+from app.config import settings
+from app.models import Habit, NodeType, System, Task
+from app.services import scheduler, workers
 
 
-def _seed_graph(session):
-    user = User(tz="UTC")
-    session.add(user)
-    session.flush()
-
-    goal = Goal(user_id=user.id, title="Learn", description="")
-    session.add(goal)
-    session.flush()
+def test_scheduler_orders_by_dependency(in_memory_db, seeded_user):
+    plan = scheduler.generate_day_plan(in_memory_db, seeded_user.id, date.today())
+    assert len(plan.items) == 2
+    first, second = plan.items
+    assert first.node_type == NodeType.HABIT
+    assert second.node_type == NodeType.TASK
+    assert first.status.name == "READY"
 
-    system = System(user_id=user.id, goal_id=goal.id, title="Study System", description="")
-    session.add(system)
-    session.flush()
 
-    morning = Habit(
-        user_id=user.id,
-        system_id=system.id,
-        name="Morning Review",
-        soft_window_start=time(hour=8),
-        soft_window_end=time(hour=9),
-        recurrence_rule="daily",
+def test_scheduler_orders_roots_by_soft_start_then_priority(in_memory_db, seeded_user):
+    system_id = in_memory_db.query(System).first().id
+    early = Habit(
+        user_id=seeded_user.id,
+        system_id=system_id,
+        name="Early Stretch",
+        soft_window_start=time(hour=6, minute=30),
+        soft_window_end=time(hour=7),
     )
-    session.add(morning)
-    session.flush()
-
-    deep_task = Task(
-        user_id=user.id,
-        habit_id=morning.id,
-        title="Deep Work",
-        difficulty=4,
-        priority=2,
-    )
-    session.add(deep_task)
-    session.flush()
-
-    session.add(
-        Edge(
-            user_id=user.id,
-            from_type=NodeType.HABIT,
-            from_id=morning.id,
-            to_type=NodeType.TASK,
-            to_id=deep_task.id,
-            relation=RelationType.TRIGGERS,
-        )
-    )
-    session.commit()
-    return user
+    low = Task(user_id=seeded_user.id, title="Low Priority", priority=0)
+    high = Task(user_id=seeded_user.id, title="High Priority", priority=5)
+    in_memory_db.add_all([early, low, high])
+    in_memory_db.commit()
+
+    plan = scheduler.generate_day_plan(in_memory_db, seeded_user.id, date.today())
+    labels = [(item.node_type, item.node_id) for item in plan.items]
+    assert labels[0] == (NodeType.HABIT, early.id)
+    assert labels.index((NodeType.TASK, high.id)) < labels.index((NodeType.TASK, low.id))
+    assert plan.items[0].scheduled_window_start == time(hour=6, minute=30)
 
 
-def test_scheduler_orders_by_dependency(in_memory_db):
-    user = _seed_graph(in_memory_db)
-    plan = scheduler.generate_day_plan(in_memory_db, user.id, date.today())
+def test_stale_generation_write_is_a_no_op(in_memory_db, seeded_user):
+    plan = scheduler.generate_day_plan(in_memory_db, seeded_user.id, date.today())
+    assert plan.generation == 1
+
+    snapshot = scheduler.load_graph_snapshot(in_memory_db, seeded_user.id)
+    result = scheduler.build_plan(snapshot)
+    assert not scheduler._write_plan(in_memory_db, seeded_user.id, plan.id, 0, result)
+    in_memory_db.refresh(plan)
+    assert plan.generation == 1
     assert len(plan.items) == 2
-    first, second = plan.items
-    assert first.node_type == NodeType.HABIT
-    assert second.node_type == NodeType.TASK
-    assert first.status.name == "READY"
+
+
+def test_large_graphs_are_planned_in_the_worker_pool(in_memory_db, seeded_user, monkeypatch):
+    plan = scheduler.generate_day_plan(in_memory_db, seeded_user.id, date.today())
+    inline = [(item.node_type, item.node_id) for item in plan.items]
+
+    monkeypatch.setattr(settings, "planning_offload_threshold", 1)
+    submitted = []
+    real_run = workers.run
+    monkeypatch.setattr(workers, "run", lambda fn, *args: submitted.append(fn) or real_run(fn, *args))
+    try:
+        workers.warm_up()
+        plan = scheduler.generate_day_plan(in_memory_db, seeded_user.id, date.today())
+    finally:
+        workers.shutdown()
+
+    assert submitted == [scheduler.build_plan]
+    assert [(item.node_type, item.node_id) for item in plan.items] == inline
+
+
+def _die_once(marker: str) -> int:
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return os.getpid()
+
+
+def test_worker_run_replaces_a_broken_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "simulation_workers", 2)
+    try:
+        broken = workers.get_executor()
+        assert workers.run(_die_once, str(tmp_path / "died")) != os.getpid()
+        assert workers.get_executor() is not broken
+    finally:
+        workers.shutdown()
@@ -0,0 +1,64 @@
+from datetime import date, datetime, time
+
+from app.models import DayPlan, Goal, Habit, NodeType, PlanAnchor, PlanItem, PlanStatus, System, User
+from app.schemas import DayPlan as DayPlanSchema, Habit as HabitSchema
+from app.services import plan_cache
+
+
+def _user_with_plan(session) -> tuple[User, DayPlan]:
+    user = User(tz="UTC")
+    session.add(user)
+    session.flush()
+    goal = Goal(user_id=user.id, title="Goal")
+    session.add(goal)
+    session.flush()
+    system = System(user_id=user.id, goal_id=goal.id, title="System")
+    session.add(system)
+    session.flush()
+    session.add_all(
+        [
+            Habit(user_id=user.id, system_id=system.id, name="Stretch", soft_window_start=time(7, 30)),
+            Habit(user_id=user.id, system_id=system.id, name="Read", energy_tag="evening", recurrence_rule="daily"),
+        ]
+    )
+    plan = DayPlan(user_id=user.id, date=date(2024, 5, 1), generated_at=datetime(2024, 4, 30, 22, 15, 3, 120000))
+    plan.items.extend(
+        [
+            PlanItem(
+                node_type=NodeType.HABIT,
+                node_id=1,
+                status=PlanStatus.DONE,
+                scheduled_order=1,
+                scheduled_window_start=time(7, 30),
+                scheduled_window_end=time(8, 0),
+                anchor=PlanAnchor.TIME,
+            ),
+            PlanItem(node_type=NodeType.TASK, node_id=2, status=PlanStatus.PLANNED),
+        ]
+    )
+    session.add(plan)
+    session.commit()
+    return user, plan
+
+
+def test_plan_fast_path_matches_the_response_model(client, api_session):
+    plan_cache.clear_cache()
+    user, plan = _user_with_plan(api_session)
+
+    response = client.get("/plan", params={"user_id": user.id, "plan_date": "2024-05-01"})
+    assert response.status_code == 200
+    expected = DayPlanSchema.model_validate(plan).model_dump(mode="json")
+    expected["items"].sort(key=lambda item: item["id"])
+    assert response.json() == expected
+    plan_cache.clear_cache()
+
+
+def test_habit_list_fast_path_matches_the_response_model(client, api_session):
+    user, _ = _user_with_plan(api_session)
+
+    response = client.get(f"/habit/{user.id}")
+    assert response.status_code == 200
+    habits = api_session.query(Habit).filter(Habit.user_id == user.id).order_by(Habit.id)
+    assert sorted(response.json(), key=lambda habit: habit["id"]) == [
+        HabitSchema.model_validate(habit).model_dump(mode="json") for habit in habits
+    ]
@@ -0,0 +1,153 @@
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import database, models
+from app.api.router import api_router
+from app.database import Base, bulk_insert
+from app.models import DayPlan, EventLog, Habit, NodeType, PlanItem, PlanStatus, User
+from app.sharding import HashRing, ShardRouter
+
+
+@pytest.fixture()
+def make_router(tmp_path):
+    catalog = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    Base.metadata.create_all(bind=catalog)
+    routers = []
+
+    def make(count: int) -> ShardRouter:
+        urls = [f"sqlite:///{tmp_path / f'shard-{shard}.db'}" for shard in range(count)]
+        router = ShardRouter(catalog, urls, models.Base.metadata)
+        router.create_all()
+        routers.append(router)
+        return router
+
+    yield make
+    for router in routers:
+        router.dispose()
+
+
+def test_ring_growth_only_moves_users_to_the_new_shard():
+    before, after = HashRing(range(4)), HashRing(range(5))
+    moved = [user_id for user_id in range(10_000) if before.shard_for(user_id) != after.shard_for(user_id)]
+    assert all(after.shard_for(user_id) == 4 for user_id in moved)
+    assert 1_000 < len(moved) < 3_000
+
+
+def _add_user_with_plan(router: ShardRouter) -> int:
+    user_id = router.ids.next_id("users")
+    with router.session_for(user_id) as db:
+        db.add(User(id=user_id, tz="UTC"))
+        plan = DayPlan(user_id=user_id, date=date(2024, 5, 1))
+        plan.items.append(PlanItem(node_type=NodeType.HABIT, node_id=1, status=PlanStatus.READY, scheduled_order=1))
+        db.add_all([plan, EventLog(user_id=user_id, event_type="plan_skip", payload_json={})])
+        db.commit()
+    return user_id
+
+
+def test_ids_are_unique_across_shards_and_rows_are_found_by_id(make_router):
+    router = make_router(2)
+    user_ids = [_add_user_with_plan(router) for _ in range(20)]
+    assert {router.shard_for(user_id) for user_id in user_ids} == {0, 1}
+
+    item_ids = []
+    for session_factory in router.sessions:
+        with session_factory() as db:
+            item_ids.extend(item_id for (item_id,) in db.query(PlanItem.id))
+    assert len(item_ids) == len(set(item_ids)) == 20
+    with router.session_for(user_ids[0]) as db:
+        habit = Habit(user_id=user_ids[0], system_id=1, name="Read")
+        db.add(habit)
+        db.commit()
+        assert router.locate("habits", habit.id) == router.shard_for(user_ids[0])
+
+
+def test_core_inserts_get_allocated_ids_and_other_engines_keep_their_own(make_router, tmp_path):
+    router = make_router(2)
+    user_ids = [_add_user_with_plan(router) for _ in range(10)]
+    by_shard = {router.shard_for(user_id): user_id for user_id in user_ids}
+    ids = []
+    for user_id in by_shard.values():
+        with router.session_for(user_id) as db:
+            rows = [{"user_id": user_id, "event_type": "plan_skip", "payload_json": {}} for _ in range(3)]
+            ids.extend(bulk_insert(db, EventLog, rows, return_ids=True))
+            db.commit()
+    assert len(by_shard) == 2 and len(set(ids)) == 6 and min(ids) > len(user_ids)
+
+    plain = create_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+    Base.metadata.create_all(bind=plain)
+    with Session(plain) as db:
+        db.add(User(tz="UTC"))
+        db.commit()
+        assert db.query(User.id).scalar() == 1
+
+
+def test_rebalance_moves_users_with_their_rows_and_ids(make_router):
+    router = make_router(2)
+    user_ids = [_add_user_with_plan(router) for _ in range(30)]
+
+    grown = make_router(3)
+    moved = grown.rebalance()
+    relocated = [user_id for user_id in user_ids if grown.shard_for(user_id) == 2]
+    assert relocated and moved == {2: len(relocated)}
+    assert grown.rebalance() == {}
+
+    for shard, session_factory in enumerate(grown.sessions):
+        with session_factory() as db:
+            assert {user_id for (user_id,) in db.query(User.id)} == {
+                user_id for user_id in user_ids if grown.shard_for(user_id) == shard
+            }
+            plans = db.query(DayPlan).all()
+            assert all(len(plan.items) == 1 for plan in plans)
+            assert db.query(EventLog).count() == len(plans)
+
+
+@pytest.fixture()
+def sharded_client(make_router, monkeypatch):
+    router = make_router(2)
+    monkeypatch.setattr(database, "get_shards", lambda: router)
+    app = FastAPI()
+    app.include_router(api_router)
+    return router, TestClient(app)
+
+
+def _habit_payload(user_id: int, name: str) -> dict:
+    return {"user_id": user_id, "system_id": 1, "name": name}
+
+
+def _users_on_each_shard(router: ShardRouter) -> dict[int, int]:
+    by_shard: dict[int, int] = {}
+    while len(by_shard) < len(router.engines):
+        user_id = _add_user_with_plan(router)
+        by_shard.setdefault(router.shard_for(user_id), user_id)
+    return by_shard
+
+
+def test_requests_use_the_shard_of_their_user_or_row(sharded_client):
+    router, client = sharded_client
+    by_shard = _users_on_each_shard(router)
+    for shard, user_id in by_shard.items():
+        created = client.post("/habit", json=_habit_payload(user_id, "Read"))
+        assert created.status_code == 200
+        habit_id = created.json()["id"]
+        assert router.locate("habits", habit_id) == shard
+
+        updated = client.put(f"/habit/{habit_id}", json=_habit_payload(user_id, "Stretch"))
+        assert updated.status_code == 200 and updated.json()["name"] == "Stretch"
+
+        with router.sessions[shard]() as db:
+            item_id = db.query(PlanItem.id).join(DayPlan).filter(DayPlan.user_id == user_id).scalar()
+        completed = client.post(f"/plan/complete?user_id={user_id}", json={"plan_item_id": item_id})
+        assert completed.status_code == 200
+        with router.sessions[shard]() as db:
+            assert db.get(PlanItem, item_id).status == PlanStatus.DONE
+
+
+def test_unroutable_requests_are_rejected(sharded_client):
+    _, client = sharded_client
+    assert client.put("/habit/999999", json=_habit_payload(1, "Read")).status_code == 404
+    assert client.post("/edges", json={}).status_code == 400
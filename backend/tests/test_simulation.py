@@ -0,0 +1,112 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import time
+
+from app.config import settings
+from app.models import DayPlan, Edge, NodeType, RelationType, Task
+from app.schemas import EdgeBase, EdgeRef, GraphOverlay, NodeOverride
+from app.services import scheduler, simulation, workers
+
+
+def test_simulation_applies_overlays_without_writing(in_memory_db, seeded_user, monkeypatch):
+    monkeypatch.setattr(settings, "simulation_workers", 0)
+    habit_edge = in_memory_db.query(Edge).first()
+    evening = Task(user_id=seeded_user.id, title="Evening Read", priority=1)
+    in_memory_db.add(evening)
+    in_memory_db.commit()
+
+    baseline, moved, cyclic = simulation.simulate_plans(
+        in_memory_db,
+        seeded_user.id,
+        [
+            GraphOverlay(label="baseline"),
+            GraphOverlay(
+                label="move habit",
+                node_overrides=[
+                    NodeOverride(
+                        node_type=NodeType.HABIT,
+                        node_id=habit_edge.from_id,
+                        soft_window_start=time(hour=19),
+                        soft_window_end=time(hour=20),
+                    )
+                ],
+            ),
+            GraphOverlay(
+                label="cycle",
+                add_edges=[
+                    EdgeBase(
+                        from_type=NodeType.TASK,
+                        from_id=habit_edge.to_id,
+                        to_type=NodeType.HABIT,
+                        to_id=habit_edge.from_id,
+                        relation=RelationType.FOLLOWS,
+                    )
+                ],
+            ),
+        ],
+    )
+
+    assert baseline.items[0].node_type == NodeType.HABIT
+    moved_windows = {(item.node_type, item.node_id): item.scheduled_window_start for item in moved.items}
+    assert moved_windows[(NodeType.TASK, habit_edge.to_id)] == time(hour=19)
+    assert moved_windows[(NodeType.TASK, evening.id)] is None
+    assert baseline.projected_flow_score > 0
+    assert cyclic.has_cycle and not baseline.has_cycle
+    assert in_memory_db.query(DayPlan).count() == 0
+
+
+def test_simulation_on_the_worker_pool_matches_inline(in_memory_db, seeded_user, monkeypatch):
+    habit_edge = in_memory_db.query(Edge).first()
+    alternatives = [
+        GraphOverlay(label="baseline"),
+        GraphOverlay(label="no trigger", remove_edges=[EdgeRef.model_validate(habit_edge, from_attributes=True)]),
+    ]
+    monkeypatch.setattr(settings, "simulation_workers", 0)
+    inline = simulation.simulate_plans(in_memory_db, seeded_user.id, alternatives)
+
+    monkeypatch.setattr(settings, "simulation_workers", 2)
+    executors = []
+    real_get_executor = workers.get_executor
+    monkeypatch.setattr(workers, "get_executor", lambda: executors.append(real_get_executor()) or executors[-1])
+    try:
+        pooled = simulation.simulate_plans(in_memory_db, seeded_user.id, alternatives)
+    finally:
+        workers.shutdown()
+
+    assert isinstance(executors[0], ProcessPoolExecutor) and pooled == inline
+    assert [plan.label for plan in pooled] == ["baseline", "no trigger"]
+
+
+def test_energy_override_keeps_windows_and_reaches_inheriting_tasks(in_memory_db, seeded_user):
+    habit_edge = in_memory_db.query(Edge).first()
+    tagged = Task(user_id=seeded_user.id, habit_id=habit_edge.from_id, title="Night Reading", energy_tag="evening")
+    in_memory_db.add(tagged)
+    in_memory_db.commit()
+    snapshot = scheduler.load_graph_snapshot(in_memory_db, seeded_user.id)
+
+    overlay = GraphOverlay(
+        node_overrides=[NodeOverride(node_type=NodeType.HABIT, node_id=habit_edge.from_id, energy_tag="high")]
+    )
+    table = simulation.apply_overlay(snapshot, overlay).table
+    habit, task, own = (
+        table.index[key]
+        for key in [(NodeType.HABIT, habit_edge.from_id), (NodeType.TASK, habit_edge.to_id), (NodeType.TASK, tagged.id)]
+    )
+
+    assert table.soft_start[habit] == table.soft_start[task] == 8 * 60
+    assert table.soft_end[habit] == 9 * 60
+    assert table.energy[habit] == table.energy[task] == scheduler.ENERGY_HIGH
+    assert table.energy[own] == scheduler.ENERGY_EVENING
+    assert snapshot.table.energy[habit] == scheduler.ENERGY_NONE
+
+
+def test_window_override_only_changes_the_given_bound(in_memory_db, seeded_user):
+    habit_edge = in_memory_db.query(Edge).first()
+    snapshot = scheduler.load_graph_snapshot(in_memory_db, seeded_user.id)
+    overlay = GraphOverlay(
+        node_overrides=[
+            NodeOverride(node_type=NodeType.HABIT, node_id=habit_edge.from_id, soft_window_end=time(hour=10))
+        ]
+    )
+    table = simulation.apply_overlay(snapshot, overlay).table
+    task = table.index[(NodeType.TASK, habit_edge.to_id)]
+    assert (table.soft_start[task], table.soft_end[task]) == (8 * 60, 10 * 60)
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+from app.models import DayPlan, Gamification, NodeType, PlanItem, PlanStatus
+from app.services import flow, streaks
+
+
+def _plan(session, day, status):
+    plan = DayPlan(user_id=1, date=day)
+    plan.items.append(PlanItem(node_type=NodeType.HABIT, node_id=1, status=status, scheduled_order=1))
+    session.add(plan)
+    session.commit()
+    return plan
+
+
+def _streak(session, day):
+    return (
+        session.query(Gamification.streak_days)
+        .filter(Gamification.user_id == 1, Gamification.date == day)
+        .scalar()
+    )
+
+
+def test_streak_extends_from_yesterday_once_per_day(in_memory_db):
+    today = date(2024, 5, 3)
+    flow.update_flow_score(in_memory_db, _plan(in_memory_db, today - timedelta(days=1), PlanStatus.DONE))
+    plan = _plan(in_memory_db, today, PlanStatus.DONE)
+    flow.update_flow_score(in_memory_db, plan)
+    flow.update_flow_score(in_memory_db, plan)
+    assert _streak(in_memory_db, today) == 2
+
+
+def test_backfill_recomputes_consecutive_days(in_memory_db):
+    start = date(2024, 5, 1)
+    for offset, status in enumerate(
+        [PlanStatus.DONE, PlanStatus.DONE, PlanStatus.SKIPPED, PlanStatus.DONE, PlanStatus.DONE]
+    ):
+        _plan(in_memory_db, start + timedelta(days=offset), status)
+    in_memory_db.add(Gamification(user_id=1, date=start, streak_days=9, xp=4, flow_streak=0))
+    in_memory_db.commit()
+
+    assert streaks.backfill_streaks(in_memory_db) == 4
+    assert [_streak(in_memory_db, start + timedelta(days=offset)) for offset in range(5)] == [1, 2, None, 1, 2]
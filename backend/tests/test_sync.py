@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+from app.models import ChangeLog, Edge, Goal, Habit, NodeType, RelationType, System, Task, User
+from app.config import settings
+from app.services import sync
+
+
+def test_changes_since_collapses_to_latest_operation(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.flush()
+    goal = Goal(user_id=user.id, title="Goal")
+    in_memory_db.add(goal)
+    in_memory_db.flush()
+    system = System(user_id=user.id, goal_id=goal.id, title="System")
+    in_memory_db.add(system)
+    in_memory_db.flush()
+    habit = Habit(user_id=user.id, system_id=system.id, name="Stretch")
+    task = Task(user_id=user.id, title="Write")
+    in_memory_db.add_all([habit, task])
+    in_memory_db.commit()
+    cursor = sync.current_seq(in_memory_db, user.id)
+    assert cursor == 1
+
+    edge = Edge(
+        user_id=user.id,
+        from_type=NodeType.HABIT,
+        from_id=habit.id,
+        to_type=NodeType.TASK,
+        to_id=task.id,
+        relation=RelationType.TRIGGERS,
+    )
+    in_memory_db.add(edge)
+    in_memory_db.commit()
+    task.title = "Write more"
+    in_memory_db.commit()
+
+    changes = sync.changes_since(in_memory_db, user.id, cursor)
+    assert changes.seq == 3
+    assert not changes.reset
+    assert changes.upserted == {"edge": [edge.id], "task": [task.id]}
+    assert changes.deleted == {}
+
+    # Deleting the habit also removes its edge through the registry hook.
+    edge_id, habit_id = edge.id, habit.id
+    in_memory_db.delete(habit)
+    in_memory_db.commit()
+    changes = sync.changes_since(in_memory_db, user.id, cursor)
+    assert changes.upserted == {"task": [task.id]}
+    assert changes.deleted == {"edge": [edge_id], "habit": [habit_id]}
+
+    assert sync.changes_since(in_memory_db, user.id, changes.seq).upserted == {}
+
+
+def test_cursor_older_than_retained_log_requests_reset(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.commit()
+    for title in ("one", "two", "three"):
+        in_memory_db.add(Task(user_id=user.id, title=title))
+        in_memory_db.commit()
+
+    in_memory_db.query(ChangeLog).filter(ChangeLog.seq == 1).delete()
+    in_memory_db.commit()
+
+    assert sync.changes_since(in_memory_db, user.id, 0).reset
+    assert not sync.changes_since(in_memory_db, user.id, 1).reset
+    assert sync.changes_since(in_memory_db, user.id, 99).reset
+
+
+def test_sync_route_returns_rows_changed_after_the_cursor(client, api_session):
+    user = User(tz="UTC")
+    api_session.add(user)
+    api_session.commit()
+    keep = client.post("/task", json={"user_id": user.id, "title": "Keep"}).json()
+    drop = client.post("/task", json={"user_id": user.id, "title": "Drop"}).json()
+
+    first = client.get("/sync", params={"user_id": user.id}).json()
+    assert first["seq"] == 2 and not first["reset"]
+    assert [row["title"] for row in first["upserted"]["task"]] == ["Keep", "Drop"]
+
+    client.put(f"/task/{keep['id']}", json={"title": "Kept"})
+    client.delete(f"/task/{drop['id']}")
+    body = client.get("/sync", params={"user_id": user.id, "since": first["seq"]}).json()
+    assert body["seq"] == 4 and not body["reset"]
+    assert body["upserted"] == {"task": [client.get(f"/task/{user.id}").json()[0]]}
+    assert body["upserted"]["task"][0]["title"] == "Kept"
+    assert body["deleted"] == {"task": [drop["id"]]}
+
+    assert client.get("/sync", params={"user_id": user.id, "since": body["seq"]}).json() == {
+        "seq": 4,
+        "reset": False,
+        "upserted": {},
+        "deleted": {},
+    }
+
+
+def test_sync_route_resets_expired_and_unknown_cursors(client, api_session):
+    user = User(tz="UTC")
+    api_session.add(user)
+    api_session.commit()
+    for title in ("one", "two"):
+        client.post("/task", json={"user_id": user.id, "title": title})
+    cutoff = datetime.utcnow() - timedelta(days=settings.change_log_retention_days + 1)
+    api_session.query(ChangeLog).filter(ChangeLog.seq == 1).update({"created_at": cutoff})
+    api_session.commit()
+    assert sync.purge_expired(api_session) == 1
+
+    expired = client.get("/sync", params={"user_id": user.id, "since": 0}).json()
+    assert expired == {"seq": 2, "reset": True, "upserted": {}, "deleted": {}}
+    ahead = client.get("/sync", params={"user_id": user.id, "since": 7}).json()
+    assert ahead["reset"] and ahead["seq"] == 2
+    recent = client.get("/sync", params={"user_id": user.id, "since": 1}).json()
+    assert not recent["reset"] and [row["title"] for row in recent["upserted"]["task"]] == ["two"]
+
+    assert client.get("/sync", params={"user_id": user.id + 1}).status_code == 404
@@ -0,0 +1,70 @@
+from datetime import date, datetime
+
+import pytest
+
+from app.models import DayPlan, Goal, Habit, NodeType, PlanItem, PlanStatus, System, Task, User
+from app.services import failures, gamification
+
+TODAY = date(2024, 5, 1)
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    gamification.clear_cache()
+    yield
+    gamification.clear_cache()
+
+
+def _plan_with_skip(session) -> tuple[User, Habit, Task]:
+    user = User(tz="UTC")
+    session.add(user)
+    session.flush()
+    goal = Goal(user_id=user.id, title="Goal")
+    session.add(goal)
+    session.flush()
+    system = System(user_id=user.id, goal_id=goal.id, title="System")
+    session.add(system)
+    session.flush()
+    habit = Habit(user_id=user.id, system_id=system.id, name="Stretch")
+    task = Task(user_id=user.id, title="Write report")
+    session.add_all([habit, task])
+    session.flush()
+    plan = DayPlan(user_id=user.id, date=TODAY)
+    plan.items.extend(
+        [
+            PlanItem(node_type=NodeType.HABIT, node_id=habit.id, status=PlanStatus.DONE, scheduled_order=1),
+            PlanItem(node_type=NodeType.TASK, node_id=task.id, status=PlanStatus.SKIPPED, scheduled_order=2),
+        ]
+    )
+    session.add(plan)
+    for _ in range(5):
+        failures.record_skip(session, user.id, NodeType.TASK, task.id, ts=datetime.utcnow())
+    session.commit()
+    return user, habit, task
+
+
+def test_today_bundles_labelled_plan_default_gamification_and_suggestions(client, api_session):
+    user, _, task = _plan_with_skip(api_session)
+
+    response = client.get("/today", params={"user_id": user.id, "target_date": TODAY.isoformat()})
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["date"] == "2024-05-01"
+    assert body["gamification"] == {"date": "2024-05-01", "streak_days": 0, "xp": 0, "flow_streak": 0}
+    items = body["plan"]["items"]
+    assert [(item["node_type"], item["label"]) for item in items] == [("habit", "Stretch"), ("task", "Write report")]
+    assert [item["status"] for item in items] == ["done", "skipped"]
+    (suggestion,) = body["suggestions"]
+    assert (suggestion["node_type"], suggestion["node_id"]) == ("task", task.id)
+    assert suggestion["actions"] and any("Write report" in action["description"] for action in suggestion["actions"])
+
+
+def test_today_without_a_plan_still_has_gamification(client, api_session):
+    user = User(tz="UTC")
+    api_session.add(user)
+    api_session.commit()
+
+    body = client.get("/today", params={"user_id": user.id, "target_date": TODAY.isoformat()}).json()
+    assert body["plan"] is None and body["suggestions"] == []
+    assert body["gamification"]["xp"] == 0
@@ -0,0 +1,59 @@
+import pytest
+
+from app.models import Edge, NodeRank, NodeType, RelationType, User
+from app.services import topology
+
+A, B, C, D = ((NodeType.HABIT, idx) for idx in range(1, 5))
+
+
+def _add(session, user_id, source, target):
+    topology.link(session, user_id, source, target)
+    session.add(
+        Edge(
+            user_id=user_id,
+            from_type=source[0],
+            from_id=source[1],
+            to_type=target[0],
+            to_id=target[1],
+            relation=RelationType.FOLLOWS,
+        )
+    )
+    session.commit()
+
+
+def _ranks(session):
+    return {(row.node_type, row.node_id): row.rank for row in session.query(NodeRank)}
+
+
+def test_back_edge_reorders_ranks_and_cycles_are_rejected(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.commit()
+
+    _add(in_memory_db, user.id, A, B)
+    _add(in_memory_db, user.id, C, D)
+    # D is ranked after B, so D -> A is a back edge that needs a local repair.
+    _add(in_memory_db, user.id, D, A)
+    ranks = _ranks(in_memory_db)
+    assert ranks[C] < ranks[D] < ranks[A] < ranks[B]
+
+    with pytest.raises(topology.CycleError) as excinfo:
+        topology.link(in_memory_db, user.id, B, C)
+    assert excinfo.value.path == [B, C, D, A, B]
+    assert _ranks(in_memory_db) == ranks
+
+    with pytest.raises(topology.CycleError):
+        topology.link(in_memory_db, user.id, A, A)
+
+
+def test_existing_edges_are_ranked_on_first_link(in_memory_db):
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.flush()
+    in_memory_db.add(
+        Edge(user_id=user.id, from_type=A[0], from_id=A[1], to_type=B[0], to_id=B[1], relation=RelationType.TRIGGERS)
+    )
+    in_memory_db.commit()
+
+    with pytest.raises(topology.CycleError):
+        topology.link(in_memory_db, user.id, B, A)
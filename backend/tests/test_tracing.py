@@ -0,0 +1,65 @@
+import json
+from datetime import date
+
+import pytest
+
+from app import tracing
+from app.models import User
+from app.services import scheduler
+
+
+@pytest.fixture(autouse=True)
+def reset_tracing():
+    yield
+    tracing.configure(False)
+
+
+def test_nothing_is_recorded_while_disabled(in_memory_db):
+    tracing.configure(False)
+    with tracing.span("outer") as outer:
+        assert outer is None
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.commit()
+    scheduler.generate_day_plan(in_memory_db, user.id, date(2024, 5, 1))
+    assert tracing.traces() == []
+
+
+def test_service_and_sql_spans_nest_under_the_open_span(in_memory_db, tmp_path):
+    path = tmp_path / "traces.ndjson"
+    tracing.configure(True, str(path))
+    user = User(tz="UTC")
+    in_memory_db.add(user)
+    in_memory_db.commit()
+
+    with tracing.span("POST /plan/generate", user_id=user.id):
+        scheduler.generate_day_plan(in_memory_db, user.id, date(2024, 5, 1))
+
+    (spans,) = tracing.traces()
+    root = spans[0]
+    assert root.name == "POST /plan/generate" and root.parent_id is None
+    by_id = {span.span_id: span for span in spans}
+    (service,) = [span for span in spans if span.name == "scheduler.generate_day_plan"]
+    assert service.parent_id == root.span_id
+    sql = [span for span in spans if span.name.startswith("sql ")]
+    assert sql and all(span.trace_id == root.trace_id for span in sql)
+    assert all(by_id[span.parent_id] is service for span in sql)
+    assert root.duration_ms >= service.duration_ms
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["span_id"] for line in lines] == [span.span_id for span in spans]
+    assert tracing.get_trace(root.trace_id) == spans
+
+
+def test_failed_spans_are_marked_and_short_traces_can_be_dropped():
+    tracing.configure(True, min_duration_ms=0)
+    with pytest.raises(KeyError):
+        with tracing.span("job"):
+            raise KeyError("x")
+    (spans,) = tracing.traces()
+    assert spans[0].status == "error" and spans[0].attributes["error"] == "KeyError"
+
+    tracing.configure(True, min_duration_ms=60_000)
+    with tracing.span("quick"):
+        pass
+    assert tracing.traces() == []